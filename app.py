@@ -1,45 +1,125 @@
-from flask import Flask, render_template, request, jsonify, session
-from flask_socketio import SocketIO, emit
-import json
+# O modo assíncrono (eventlet/gevent) exige o monkey patching antes dos demais imports
+from async_support import monkey_patch
+ASYNC_MODE = monkey_patch()
+
+from flask import Flask, render_template, request, jsonify, session, g, Response, has_request_context
+from flask_socketio import SocketIO, emit, join_room, leave_room
+import io
 import os
 import threading
 import time
 from datetime import datetime
 import logging
-from chat_downloader import ChatDownloader
-import random
-import re
+import atexit
+from broadcast import BroadcastAggregator
+from votes import ACCEPTED, VoteRound
+from leaderboard import Leaderboard
+from storage import create_storage
+from state import StateTracker
+from scheduler import PhaseClock
+from chat_history import ChatHistory
+from ingest import ChatPipeline
+from vote_parser import VoteClassifier
+from chat_replay import ChatRecorder, ReplayClock, parse_speed
+from chat_sources import SIMULATOR_URL, open_chat_source, orphaned_pumps
+from chat_supervisor import ChatSupervisor
+from response_cache import ResponseCache
+from question_bank import QuestionBank, QuestionError, WindowedQuestionBank, parse_fields
+from question_import import IMPORT_FORMATS, QuestionImporter, detect_format, iter_items
+from cluster import Cluster, cluster_enabled
+from metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from log_setup import setup_logging, RateLimiter
+from sessions import NAMESPACE as SESSIONS_NAMESPACE, SessionError, SessionManager
+from topics import event_room, parse_topics, topic_room
+from socket_transport import (EncodeOnceManager, compact_events_enabled, compact_payload,
+                              encode_once_enabled, transport_options)
 
-# Configuração de logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configuração de logging (fila + thread de escrita; QUIZ_LOG_LEVEL e QUIZ_LOG_FORMAT)
+setup_logging()
 logger = logging.getLogger(__name__)
+# Erros repetidos por mensagem do chat: no máximo um log a cada 10s por tipo
+error_log_limiter = RateLimiter(interval=10.0)
+# Logs internos do Socket.IO/Engine.IO (um por pacote), só para depuração
+SOCKETIO_DEBUG_LOGS = os.environ.get('QUIZ_SOCKETIO_DEBUG', '').lower() in ('1', 'true', 'yes')
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'quiz-youtube-live-secret-key'
-socketio = SocketIO(
-    app, 
-    cors_allowed_origins="*", 
-    ping_timeout=120,               # Aumentado para 2 minutos
-    ping_interval=5,                # Reduzido para 5 segundos para manter a conexão ativa
-    max_http_buffer_size=10*1024*1024,  # Aumentado para 10MB
-    always_connect=True,            # Sempre conectar, mesmo com erros
-    engineio_logger=True,           # Ativar logs do engineio para debug
-    logger=True,                    # Ativar logs do socketio para debug
-    websocket=False,                # Desativar WebSocket, usar apenas polling
-    path='/socket.io',              # Caminho explícito
-    allow_upgrades=False            # Não permitir upgrades de protocolo
+# Métricas expostas em /metrics
+metrics_registry = Registry()
+CHAT_MESSAGES = metrics_registry.counter('quiz_chat_messages_total', 'Mensagens do chat processadas')
+VOTES = metrics_registry.counter('quiz_votes_total', 'Votos recebidos por resultado', ('result',))
+EMIT_SECONDS = metrics_registry.histogram('quiz_socketio_emit_seconds', 'Duração dos emits Socket.IO por evento', ('event',))
+RANKING_UPDATE_SECONDS = metrics_registry.histogram('quiz_update_ranking_seconds', 'Duração de update_ranking por pergunta')
+RANKING_SAVE_SECONDS = metrics_registry.histogram('quiz_save_ranking_seconds', 'Duração da gravação do ranking', ('mode',))
+PHASE_OVERRUN_SECONDS = metrics_registry.histogram(
+    'quiz_phase_overrun_seconds', 'Atraso no fim de cada fase em relação ao tempo configurado', ('phase',),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
 )
+SOCKETIO_CLIENTS = metrics_registry.gauge('quiz_socketio_clients', 'Clientes Socket.IO conectados')
+HTTP_REQUESTS = metrics_registry.counter('quiz_http_requests_total', 'Requisições HTTP por endpoint', ('endpoint', 'method', 'status'))
+HTTP_REQUEST_SECONDS = metrics_registry.histogram('quiz_http_request_seconds', 'Duração das requisições HTTP por endpoint', ('endpoint',))
 
 # Diretório para armazenar dados
 DATA_DIR = 'data'
-QUESTIONS_FILE = os.path.join(DATA_DIR, 'questions.json')
-RANKING_FILE = os.path.join(DATA_DIR, 'ranking.json')
-CONFIG_FILE = os.path.join(DATA_DIR, 'config.json')
+OPTION_COUNT = 4  # Alternativas por pergunta (A-D)
+RANKING_SNAPSHOT_EVERY = 50  # Perguntas entre snapshots compactados do ranking
+CHAT_QUEUE_SIZE = 10000  # Mensagens do chat aguardando processamento
+# Com QUIZ_QUESTION_WINDOW=N (e QUIZ_STORAGE=sqlite) só N perguntas ficam em memória
+QUESTION_WINDOW = int(os.environ.get('QUIZ_QUESTION_WINDOW', '0') or 0)
+
+# Gravação/reprodução do chat (ver chat_replay.py)
+CHAT_REPLAY_PATH = os.environ.get('QUIZ_CHAT_REPLAY')  # Reproduzir esta gravação em vez do YouTube
+CHAT_REPLAY_SPEED = parse_speed(os.environ.get('QUIZ_REPLAY_SPEED', '1'))  # 1, 10... ou 'max'
+CHAT_RECORD_PATH = os.environ.get('QUIZ_CHAT_RECORD')  # Gravar o chat ao vivo neste arquivo
+# Simulador usado quando enable_chat_simulator está ativo (ex.: simulator://?rate=100000&seed=1)
+CHAT_SIMULATOR_URL = os.environ.get('QUIZ_CHAT_SIMULATOR', SIMULATOR_URL)
+# Segundos sem mensagens até a conexão com o chat ao vivo ser refeita
+CHAT_INACTIVITY_TIMEOUT = float(os.environ.get('QUIZ_CHAT_INACTIVITY_TIMEOUT', '120') or 120)
 
 # Criar diretório de dados se não existir
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+# Modo multi-processo: um líder executa o quiz, os demais workers só servem leituras
+cluster = Cluster(DATA_DIR) if cluster_enabled() else None
+# Transporte (WebSocket com fallback para polling), ping e compressão: ver socket_transport.py
+socketio_options = transport_options(ASYNC_MODE)
+if cluster:
+    # Eventos Socket.IO distribuídos entre os workers pela fila de mensagens
+    socketio_options['client_manager'] = cluster.create_client_manager()
+elif encode_once_enabled():
+    # Cada evento é serializado uma vez por emissão, não uma vez por cliente
+    socketio_options['client_manager'] = EncodeOnceManager()
+COMPACT_EVENTS = compact_events_enabled()  # Votos, chat e ranking no formato curto
+
+# SocketIO com contagem e duração dos emits por evento
+class MeteredSocketIO(SocketIO):
+    def emit(self, event, *args, **kwargs):
+        # Sem destino explícito, o evento vai apenas para quem assina o seu tópico
+        if 'to' not in kwargs and 'room' not in kwargs and kwargs.get('namespace') in (None, '/'):
+            kwargs['to'] = event_room(event)
+        if COMPACT_EVENTS and args:
+            args = (compact_payload(event, args[0]),) + args[1:]
+        started = time.perf_counter()
+        try:
+            return super().emit(event, *args, **kwargs)
+        finally:
+            EMIT_SECONDS.observe(time.perf_counter() - started, event)
+
+app = Flask(__name__)
+app.config['SECRET_KEY'] = 'quiz-youtube-live-secret-key'
+socketio = MeteredSocketIO(
+    app, 
+    async_mode=ASYNC_MODE,          # threading, eventlet ou gevent (QUIZ_ASYNC_MODE)
+    cors_allowed_origins="*", 
+    always_connect=True,            # Sempre conectar, mesmo com erros
+    engineio_logger=SOCKETIO_DEBUG_LOGS,  # Logs do engineio (QUIZ_SOCKETIO_DEBUG=1)
+    logger=SOCKETIO_DEBUG_LOGS,           # Logs do socketio (QUIZ_SOCKETIO_DEBUG=1)
+    path='/socket.io',              # Caminho explícito
+    **socketio_options
+)
+
+# Backend de armazenamento (JSON ou SQLite, definido por QUIZ_STORAGE)
+storage = create_storage(DATA_DIR, ranking_snapshot_every=RANKING_SNAPSHOT_EVERY)
+
 # Configurações padrão do quiz
 quiz_config = {
     'youtube_url': '',
@@ -48,19 +128,23 @@ quiz_config = {
     'result_display_time': 5,
     'primary_color': '#f39c12',
     'secondary_color': '#8e44ad',
-    'enable_chat_simulator': True
+    'enable_chat_simulator': True,
+    'broadcast_interval': 200,  # Intervalo (ms) entre lotes de votos/chat
+    'chat_history_size': 100,  # Mensagens do chat mantidas para clientes HTTP
+    'chat_overload_policy': 'sample',  # 'drop' ou 'sample' para mensagens comuns com a fila cheia
+    'vote_aliases': {},  # Comandos extras de voto, ex.: {"!sim": "A", "!nao": "B"}
+    'accept_bare_letters': False  # Aceitar "A", "B"... sem o "!" como voto
 }
 
-# Carregar configurações do arquivo JSON
+# Carregar configurações do armazenamento
 def load_config():
-    """Carrega as configurações do arquivo config.json."""
+    """Carrega as configurações do backend de armazenamento."""
     global quiz_config
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                loaded_config = json.load(f)
-                # Atualizar configuração com os valores carregados
-                quiz_config.update(loaded_config)
+        loaded_config = storage.load_config()
+        if loaded_config is not None:
+            # Atualizar configuração com os valores carregados
+            quiz_config.update(loaded_config)
         else:
             # Configuração padrão
             quiz_config = {
@@ -70,7 +154,12 @@ def load_config():
                 'result_display_time': 5,
                 'primary_color': '#f39c12',
                 'secondary_color': '#8e44ad',
-                'enable_chat_simulator': True
+                'enable_chat_simulator': True,
+                'broadcast_interval': 200,
+                'chat_history_size': 100,
+                'chat_overload_policy': 'sample',
+                'vote_aliases': {},
+                'accept_bare_letters': False
             }
             save_config()
     except Exception as e:
@@ -83,62 +172,127 @@ def load_config():
             'result_display_time': 5,
             'primary_color': '#f39c12',
             'secondary_color': '#8e44ad',
-            'enable_chat_simulator': True
+            'enable_chat_simulator': True,
+            'broadcast_interval': 200,
+            'chat_history_size': 100,
+            'chat_overload_policy': 'sample',
+            'vote_aliases': {},
+            'accept_bare_letters': False
         }
 
-# Salvar configurações em arquivo JSON
+# Salvar configurações no armazenamento
 def save_config():
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(quiz_config, f, ensure_ascii=False, indent=4)
+        storage.save_config(quiz_config)
+        state_tracker.bump('config')
         logger.info("Configurações salvas com sucesso")
     except Exception as e:
         logger.error(f"Erro ao salvar configurações: {e}")
 
 current_question_index = 0
-current_question = None
+current_question = None  # PreparedQuestion em exibição
 quiz_running = False
-chat_thread = None
 quiz_thread = None
-user_votes = {}  # Armazena votos por usuário para a pergunta atual
-voted_users = set()  # Armazena usuários que já votaram na pergunta atual
-questions = []
-ranking = {}
-current_votes = [0, 0, 0, 0]
+question_bank = QuestionBank()  # Perguntas normalizadas (em memória ou em janela)
+questions_lock = threading.Lock()  # Serializa as alterações no banco de perguntas
+ranking = Leaderboard()  # Pontuações com índice ordenado para top-N
+current_round = VoteRound()  # Votos da pergunta atual (contagem, usuários e respostas)
 
 # Variáveis globais para o chat
-chat_messages = []  # Lista para armazenar mensagens do chat
-is_chat_running = False  # Controla se o chat está em execução
-is_simulator_running = False  # Controla especificamente se o simulador está em execução
+chat_history = ChatHistory(quiz_config['chat_history_size'])  # Buffer circular das últimas mensagens
+chat_recorder = None  # Gravação do chat ao vivo (QUIZ_CHAT_RECORD)
+
+# Versões do estado para o long-polling HTTP
+state_tracker = StateTracker()
+response_cache = ResponseCache()  # Corpos JSON pré-serializados com ETag
+LONG_POLL_TIMEOUT = 20  # Tempo máximo (s) que uma requisição de estado fica aguardando
+quiz_phase = 'idle'  # 'question', 'counting' ou 'results'
+last_results = None  # Resultado da última pergunta (para clientes HTTP)
+# Na reprodução de um chat gravado as fases seguem o relógio da gravação
+replay_clock = ReplayClock(CHAT_REPLAY_SPEED, sleep=socketio.sleep) if CHAT_REPLAY_PATH else None
+if replay_clock:
+    phase_clock = PhaseClock(clock=replay_clock.now, sleep=replay_clock.sleep)
+else:
+    phase_clock = PhaseClock(sleep=socketio.sleep)  # Prazo absoluto da fase atual
+phase_clock.on_overrun = lambda phase, seconds: PHASE_OVERRUN_SECONDS.observe(seconds, phase)
+
+# Agregador que emite votos e mensagens do chat em lotes periódicos
+broadcaster = BroadcastAggregator(
+    socketio,
+    lambda: count_votes(),
+    on_flush=lambda sections: state_tracker.bump(*sections),
+    chat_epoch=lambda: chat_history.epoch
+)
+
+# Montar o classificador de votos a partir da configuração
+def build_vote_classifier():
+    try:
+        return VoteClassifier(
+            OPTION_COUNT,
+            aliases=quiz_config.get('vote_aliases') or {},
+            accept_bare_letters=quiz_config.get('accept_bare_letters', False)
+        )
+    except Exception as e:
+        logger.error(f"Configuração de votos inválida, usando o padrão: {e}")
+        return VoteClassifier(OPTION_COUNT)
+
+vote_classifier = build_vote_classifier()
+
+# Aplicar as configurações que afetam componentes em execução
+def apply_runtime_config():
+    global vote_classifier
+    vote_classifier = build_vote_classifier()
+    broadcaster.set_interval(quiz_config.get('broadcast_interval', 200))
+    chat_history.resize(quiz_config.get('chat_history_size', 100))
+    chat_pipeline.set_policy(quiz_config.get('chat_overload_policy', 'sample'))
 
 # Função para adicionar uma mensagem ao chat
 def add_chat_message(author, message):
-    global chat_messages
-    timestamp = time.time()
-    chat_messages.append({
-        'author': author,
-        'message': message,
-        'timestamp': timestamp
-    })
-    # Limitar o número de mensagens armazenadas (manter apenas as 100 últimas)
-    if len(chat_messages) > 100:
-        chat_messages = chat_messages[-100:]
-    return timestamp
+    # O buffer circular descarta as mensagens mais antigas sem copiar a lista
+    return chat_history.append(author, message)
 
-# Carregar perguntas do arquivo JSON
+# Avisar sobre perguntas salvas inválidas (elas não entram no quiz)
+def log_invalid_question(position, error):
+    logger.warning(f"Pergunta {position + 1} ignorada: {error}")
+
+# Substituir as perguntas, normalizando-as uma única vez (QuestionError se houver inválidas)
+def set_questions(new_questions, skip_invalid=False):
+    global question_bank
+    question_bank = QuestionBank.from_raw(new_questions, skip_invalid=skip_invalid, on_invalid=log_invalid_question)
+
+# Ler as perguntas do armazenamento por páginas em vez de manter o banco inteiro
+def use_question_window():
+    return QUESTION_WINDOW > 0 and hasattr(storage, 'search_questions_page')
+
+# Carregar perguntas do armazenamento
 def load_questions():
-    global questions
-    if os.path.exists(QUESTIONS_FILE):
+    global question_bank
+    if use_question_window():
         try:
-            with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-                questions = json.load(f)
-            logger.info(f"Carregadas {len(questions)} perguntas do arquivo")
+            windowed_bank = WindowedQuestionBank(storage, QUESTION_WINDOW, on_invalid=log_invalid_question)
+            if len(windowed_bank):
+                question_bank = windowed_bank
+                logger.info(f"{len(question_bank)} perguntas no armazenamento ({storage.name}), "
+                            f"janela de {QUESTION_WINDOW} em memória")
+                return
         except Exception as e:
             logger.error(f"Erro ao carregar perguntas: {e}")
-            questions = []
+    try:
+        loaded_questions = storage.load_questions()
+    except Exception as e:
+        logger.error(f"Erro ao carregar perguntas: {e}")
+        loaded_questions = []
+    if loaded_questions is not None:
+        try:
+            # Perguntas já salvas com problemas são ignoradas, sem derrubar o quiz
+            set_questions(loaded_questions, skip_invalid=True)
+        except QuestionError as e:
+            logger.error(f"Erro ao carregar perguntas: {e}")
+            set_questions([])
+        logger.info(f"Carregadas {len(question_bank)} perguntas do armazenamento ({storage.name})")
     else:
-        # Perguntas de exemplo se o arquivo não existir
-        questions = [
+        # Perguntas de exemplo se ainda não houver perguntas salvas
+        set_questions([
             {
                 "question": "Qual é a capital do Brasil?",
                 "options": ["Rio de Janeiro", "São Paulo", "Brasília", "Salvador"],
@@ -151,351 +305,402 @@ def load_questions():
                 "correct": 1,
                 "explanation": "Machado de Assis escreveu 'Dom Casmurro', publicado em 1899."
             }
-        ]
+        ])
         save_questions()
 
-# Salvar perguntas em arquivo JSON
+# Salvar perguntas no armazenamento
 def save_questions():
     try:
-        with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(questions, f, ensure_ascii=False, indent=4)
-        logger.info(f"Salvas {len(questions)} perguntas no arquivo")
+        storage.save_questions(question_bank.all_raw())
+        logger.info(f"Salvas {len(question_bank)} perguntas ({storage.name})")
+        # Com a janela ativa, o banco completo não fica em memória depois de salvo
+        if use_question_window() and not question_bank.windowed:
+            load_questions()
+        state_tracker.bump('questions')
     except Exception as e:
         logger.error(f"Erro ao salvar perguntas: {e}")
 
-# Carregar ranking do arquivo JSON
+# Carregar ranking do armazenamento (no JSON: snapshot + journal)
 def load_ranking():
     global ranking
-    if os.path.exists(RANKING_FILE):
-        try:
-            with open(RANKING_FILE, 'r', encoding='utf-8') as f:
-                ranking = json.load(f)
-            logger.info(f"Ranking carregado com {len(ranking)} usuários")
-        except Exception as e:
-            logger.error(f"Erro ao carregar ranking: {e}")
-            ranking = {}
+    try:
+        scores = storage.load_ranking()
+    except Exception as e:
+        logger.error(f"Erro ao carregar ranking: {e}")
+        ranking = Leaderboard()
+        return
+    if scores is not None:
+        ranking = Leaderboard(scores)
+        logger.info(f"Ranking carregado com {len(ranking)} usuários")
     else:
-        ranking = {}
+        ranking = Leaderboard()
         save_ranking()
 
-# Salvar ranking em arquivo JSON
+# Salvar ranking completo (no JSON: snapshot que compacta o journal)
 def save_ranking():
     try:
-        with open(RANKING_FILE, 'w', encoding='utf-8') as f:
-            json.dump(ranking, f, ensure_ascii=False, indent=4)
+        with RANKING_SAVE_SECONDS.time('full'):
+            storage.save_ranking(ranking.to_dict())
         logger.info("Ranking salvo com sucesso")
     except Exception as e:
         logger.error(f"Erro ao salvar ranking: {e}")
 
-# Processar mensagem do chat
-def process_chat_message(author, message):
-    global current_votes, voted_users
-    
+# Persistir pendências do ranking ao encerrar
+def flush_ranking_journal():
+    # Seguidores do cluster nunca gravam o ranking; apenas o líder compacta
+    if is_follower():
+        return
     try:
-        # Verificar se é um voto
-        vote_match = re.match(r'!([a-dA-D])', message)
-        if vote_match and quiz_running and current_question:
-            # Extrair a opção votada (A, B, C ou D)
-            vote_option = vote_match.group(1).upper()
-            
-            # Verificar se o usuário já votou nesta pergunta
-            if author in voted_users:
-                logger.info(f"Usuário {author} já votou nesta pergunta")
+        storage.checkpoint(ranking.to_dict)
+    except Exception as e:
+        logger.error(f"Erro ao finalizar armazenamento do ranking: {e}")
+
+# Gravar apenas os pontos alterados em uma pergunta
+def save_ranking_deltas(deltas):
+    try:
+        # No JSON a compactação ocorre em segundo plano; no SQLite é um upsert em lote
+        with RANKING_SAVE_SECONDS.time('delta'):
+            storage.append_ranking_deltas(deltas, ranking.to_dict)
+    except Exception as e:
+        logger.error(f"Erro ao gravar pontos do ranking: {e}")
+
+# Classificar um lote lido do chat (uma vez, antes da fila; os votos têm prioridade nela)
+def classify_chat_batch(messages):
+    return vote_classifier.classify_batch(messages)
+
+# Processar mensagem do chat já classificada (vote_index é None se não for voto)
+def handle_chat_message(author, message, vote_index):
+    try:
+        if vote_index is not None and quiz_running and current_question:
+            # Registrar voto na rodada atual (rejeita votos repetidos, fora do prazo ou inválidos)
+            result = current_round.register(author, vote_index)
+            VOTES.inc(result)
+            if result != ACCEPTED:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Voto de {author} recusado: {result}")
                 return
             
-            # Registrar voto
-            voted_users.add(author)
-            user_votes[author] = vote_option
-            
-            # Incrementar contador de votos
-            vote_index = ord(vote_option) - ord('A')  # Converter A->0, B->1, etc.
-            current_votes[vote_index] += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Voto registrado: {author} votou na opção !{vote_classifier.letter(vote_index)}")
             
-            logger.info(f"Voto registrado: {author} votou na opção !{vote_option}")
-            
-            # Emitir atualização de votos para o frontend
-            socketio.emit('update_votes', {
-                'votes': {
-                    'A': current_votes[0],
-                    'B': current_votes[1],
-                    'C': current_votes[2],
-                    'D': current_votes[3]
-                }
-            })
-        
-        # Enviar a mensagem para o frontend
-        socketio.emit('chat_message', {
-            'author': author,
-            'message': message
-        })
+            # A atualização de votos é enviada no próximo lote do broadcaster
+            broadcaster.add_vote(vote_index)
         
-        # Adicionar mensagem ao histórico do chat
-        add_chat_message(author, message)
+        # Adicionar mensagem ao histórico do chat e ao próximo lote
+        CHAT_MESSAGES.inc()
+        record = add_chat_message(author, message)
+        broadcaster.add_chat(author, message, record['timestamp'], record['id'])
     except Exception as e:
-        logger.error(f"Erro ao processar mensagem do chat: {e}")
+        error_log_limiter.log(logger, logging.ERROR, 'chat_message', f"Erro ao processar mensagem do chat: {e}")
+
+# Processar um lote de mensagens já classificadas (executado pelos workers do pipeline de ingestão)
+def process_chat_batch(messages):
+    for author, message, vote_index in messages:
+        handle_chat_message(author, message, vote_index)
+
+# Pipeline entre a leitura do chat e o processamento de votos/mensagens
+chat_pipeline = ChatPipeline(
+    handle_chat_message,
+    classify_chat_batch,
+    maxsize=CHAT_QUEUE_SIZE,
+    overload_policy=quiz_config.get('chat_overload_policy', 'sample'),
+    batch_handler=process_chat_batch
+)
+metrics_registry.gauge('quiz_chat_queue_depth', 'Mensagens aguardando na fila de ingestão',
+                       function=lambda: chat_pipeline.stats()['depth'])
+metrics_registry.counter(
+    'quiz_chat_pipeline_messages_total', 'Mensagens da fila de ingestão por destino', ('status',),
+    function=lambda: {status: value for status, value in chat_pipeline.stats().items()
+                      if status in ('enqueued', 'processed', 'errors', 'duplicates',
+                                    'dropped_chatter', 'sampled_out', 'dropped_votes')}
+)
 
-# Função para monitorar o chat do YouTube
-def monitor_youtube_chat():
-    """Monitora o chat do YouTube para capturar votos."""
-    global chat_thread, is_chat_running, is_simulator_running
+# Na reprodução mais rápida possível, segurar as mensagens até o quiz passar do prazo da fase atual
+def replay_must_wait(offset):
+    return quiz_running and phase_clock.deadline is not None and offset >= phase_clock.deadline
+
+# Abrir a fonte do chat correspondente ao link (veja chat_sources.py)
+def open_live_chat_source(url):
+    return open_chat_source(
+        url,
+        inactivity_timeout=CHAT_INACTIVITY_TIMEOUT,
+        sleep=socketio.sleep,
+        replay_clock=replay_clock,
+        replay_hold=replay_must_wait,
+        simulator_active=lambda: quiz_running  # O simulador só conversa com o quiz rodando
+    )
+
+# Entregar um lote do chat à fila de ingestão (chamado pelo leitor supervisionado)
+def submit_chat_batch(batch, source):
+    # Apenas enfileirar: votos, histórico e broadcast ficam com os workers.
+    # Na reprodução a fila aplica backpressure ao leitor em vez de descartar
+    chat_pipeline.submit_batch(batch, block=source.lossless)
+    if chat_recorder:
+        for message_id, author, text in batch:
+            chat_recorder.record(author, text, message_id)
+
+# Avisar no chat quando a conexão for estabelecida, perdida ou a reprodução terminar
+def notify_chat_state(state, detail):
+    kind = chat_supervisor.kind
+    if state == 'connected' and kind == 'replay':
+        speed = 'máxima' if CHAT_REPLAY_SPEED is None else f'{CHAT_REPLAY_SPEED:g}x'
+        message = f'Reproduzindo chat gravado ({speed})'
+    elif state == 'connected' and kind != 'simulator':
+        logger.info("Conexão com chat estabelecida com sucesso")
+        message = 'Conexão com chat estabelecida com sucesso!'
+    elif state == 'reconnecting' and detail:
+        message = f'Chat desconectado: {detail}'
+    elif state == 'finished':
+        message = 'Reprodução do chat encerrada'
+    else:
+        return
+    socketio.emit('chat_message', {
+        'author': 'Sistema',
+        'message': message
+    })
+
+# Leitor do chat: no máximo um ativo, com reconexão e relatório de saúde
+chat_supervisor = ChatSupervisor(
+    open_live_chat_source,
+    submit_chat_batch,
+    name='chat',
+    on_state=notify_chat_state
+)
+metrics_registry.gauge('quiz_chat_connected', 'Leitor do chat conectado (1) ou não (0)',
+                       function=lambda: 1 if chat_supervisor.state == 'connected' else 0)
+metrics_registry.counter('quiz_chat_reconnects_total', 'Reconexões do chat',
+                         function=lambda: chat_supervisor.reconnects)
+metrics_registry.gauge('quiz_chat_orphaned_readers', 'Leitores do chat cancelados ainda bloqueados',
+                       function=lambda: chat_supervisor.health()['orphaned_readers'] + orphaned_pumps())
+
+# Passar a ler o chat de um link (o leitor anterior é cancelado)
+def start_live_chat(url):
+    global chat_recorder
     
-    try:
-        # Verificar se o simulador de chat está ativado
-        if quiz_config.get('enable_chat_simulator', True):
-            logger.info("Simulador de chat ativado. Iniciando simulação de mensagens.")
-            is_chat_running = True
-            is_simulator_running = True
-            chat_thread = threading.Thread(target=simulate_chat_messages)
-            chat_thread.daemon = True
-            chat_thread.start()
-            return
-        
-        # Se o simulador estiver desativado, conectar ao chat real do YouTube
-        url = quiz_config.get('youtube_url', '')
-        if not url:
-            logger.error("URL do YouTube não configurada")
-            socketio.emit('chat_message', {
-                'author': 'Sistema',
-                'message': 'Erro: URL do YouTube não configurada'
-            })
-            # Fallback para simulação
-            logger.info("Iniciando simulação de chat como fallback (URL não configurada)")
-            is_chat_running = True
-            is_simulator_running = True
-            chat_thread = threading.Thread(target=simulate_chat_messages)
-            chat_thread.daemon = True
-            chat_thread.start()
-            return
-        
-        # Normalizar a URL do YouTube
-        normalized_url = normalize_youtube_url(url)
-        if not normalized_url:
-            logger.error(f"URL inválida: {url}")
-            socketio.emit('chat_message', {
-                'author': 'Sistema',
-                'message': f'Erro: URL do YouTube inválida: {url}'
-            })
-            # Fallback para simulação
-            logger.info("Iniciando simulação de chat como fallback (URL inválida)")
-            is_chat_running = True
-            is_simulator_running = True
-            chat_thread = threading.Thread(target=simulate_chat_messages)
-            chat_thread.daemon = True
-            chat_thread.start()
-            return
-        
-        logger.info(f"Conectando ao chat do YouTube: {normalized_url}")
-        socketio.emit('chat_message', {
-            'author': 'Sistema',
-            'message': f'Tentando conectar ao chat do YouTube: {normalized_url}'
-        })
-        
-        # Desativar o simulador e ativar o chat real
-        is_simulator_running = False
-        is_chat_running = True
-        
-        try:
-            # Configurar o chat downloader
-            chat_downloader = ChatDownloader()
-            logger.info("ChatDownloader inicializado")
-            socketio.emit('chat_message', {
-                'author': 'Sistema',
-                'message': 'Inicializando conexão com o chat...'
-            })
-            
-            # Adicionar mais logs para diagnóstico
-            logger.info(f"Tentando obter chat para URL: {normalized_url}")
-            chat = chat_downloader.get_chat(normalized_url, timeout=60, max_attempts=5)
-            logger.info("Conexão com chat estabelecida com sucesso")
-            socketio.emit('chat_message', {
-                'author': 'Sistema',
-                'message': 'Conexão com chat estabelecida com sucesso!'
-            })
-            
-            # Processar mensagens do chat
-            for message in chat:
-                if not is_chat_running:
-                    break
-                    
-                try:
-                    author = message.get('author', {}).get('name', 'Anônimo')
-                    text = message.get('message', '')
-                    
-                    # Verificar se é um voto válido
-                    if text.startswith('!'):
-                        vote = text.lower().strip()
-                        if vote in ['!a', '!b', '!c', '!d']:
-                            option_index = {'!a': 0, '!b': 1, '!c': 2, '!d': 3}[vote]
-                            register_vote(author, option_index)
-                    
-                    # Emitir mensagem para o cliente
-                    socketio.emit('chat_message', {
-                        'author': author,
-                        'message': text
-                    })
-                    
-                    logger.debug(f"Mensagem do chat: {author} -> {text}")
-                except Exception as e:
-                    logger.error(f"Erro ao processar mensagem do chat: {str(e)}")
-        except Exception as e:
-            error_msg = f"Erro ao conectar ao chat do YouTube: {str(e)}"
-            logger.error(error_msg)
-            socketio.emit('chat_message', {
-                'author': 'Sistema',
-                'message': f'Erro ao conectar ao chat: {str(e)}'
-            })
-            # Fallback para simulação em caso de erro de conexão
-            logger.info("Iniciando simulação de chat como fallback (erro de conexão)")
-            is_chat_running = True
-            is_simulator_running = True
-            chat_thread = threading.Thread(target=simulate_chat_messages)
-            chat_thread.daemon = True
-            chat_thread.start()
+    # O mesmo link já está sendo lido: manter o leitor atual
+    if chat_supervisor.running and chat_supervisor.url == url:
+        return
+    if chat_recorder:
+        chat_recorder.close()
+    # Gravar o chat ao vivo para reprodução posterior, se configurado
+    recordable = CHAT_RECORD_PATH and not url.startswith(('simulator:', 'replay:'))
+    chat_recorder = ChatRecorder(CHAT_RECORD_PATH, source=url) if recordable else None
+    chat_supervisor.start(url)
+
+# Parar a leitura do chat
+def stop_live_chat():
+    global chat_recorder
     
-    except Exception as e:
-        error_msg = f"Erro ao monitorar chat do YouTube: {str(e)}"
+    if chat_supervisor.stop():
+        logger.info("Leitura do chat encerrada")
+    if chat_recorder:
+        chat_recorder.close()
+        logger.info(f"Chat gravado em {CHAT_RECORD_PATH} ({chat_recorder.count} mensagens)")
+        chat_recorder = None
+
+# Normalizar o link do chat (feeds tcp:// locais são aceitos como estão)
+def normalize_chat_url(url):
+    if url and url.startswith('tcp://'):
+        return url
+    return normalize_youtube_url(url)
+
+# Iniciar a leitura do chat conforme a configuração: gravação, simulador ou YouTube
+def start_chat_source():
+    # Reproduzir um chat gravado no lugar do simulador e do YouTube
+    if CHAT_REPLAY_PATH:
+        start_live_chat(f'replay:{CHAT_REPLAY_PATH}')
+        return
+    
+    # Verificar se o simulador de chat está ativado
+    if quiz_config.get('enable_chat_simulator', True):
+        logger.info("Simulador de chat ativado. Iniciando simulação de mensagens.")
+        start_live_chat(CHAT_SIMULATOR_URL)
+        return
+    
+    # Se o simulador estiver desativado, conectar ao chat real do YouTube
+    url = quiz_config.get('youtube_url', '')
+    normalized_url = normalize_chat_url(url) if url else None
+    if not normalized_url:
+        error_msg = f'Erro: URL do YouTube inválida: {url}' if url else 'Erro: URL do YouTube não configurada'
         logger.error(error_msg)
         socketio.emit('chat_message', {
             'author': 'Sistema',
             'message': error_msg
         })
-        # Fallback para simulação em caso de erro
-        if not is_chat_running and not is_simulator_running:
-            logger.info("Iniciando simulação de chat como fallback (erro geral)")
-            is_chat_running = True
-            is_simulator_running = True
-            chat_thread = threading.Thread(target=simulate_chat_messages)
-            chat_thread.daemon = True
-            chat_thread.start()
+        # Fallback para simulação (só para configuração inválida; quedas são reconectadas)
+        logger.info("Iniciando simulação de chat como fallback (URL não configurada ou inválida)")
+        start_live_chat(CHAT_SIMULATOR_URL)
+        return
+    
+    if chat_supervisor.running and chat_supervisor.url == normalized_url:
+        return
+    logger.info(f"Conectando ao chat do YouTube: {normalized_url}")
+    socketio.emit('chat_message', {
+        'author': 'Sistema',
+        'message': f'Tentando conectar ao chat do YouTube: {normalized_url}'
+    })
+    start_live_chat(normalized_url)
 
 # Função para executar o loop do quiz
 def quiz_loop():
-    global quiz_running, current_question_index, current_question, current_votes, voted_users, user_votes
+    global quiz_running, current_question_index, current_question, current_round, quiz_phase, last_results
     
     while True:
-        if quiz_running and questions:
-            # Selecionar pergunta atual
-            current_question_index = current_question_index % len(questions)
-            current_question = questions[current_question_index]
-            current_votes = [0, 0, 0, 0]
-            voted_users = set()  # Limpar usuários que votaram
-            user_votes = {}  # Limpar votos para a nova pergunta
-            
-            # Verificar formato da pergunta e obter a resposta correta
-            correct_answer = 0  # Valor padrão
-            if 'correct' in current_question:
-                correct_answer = current_question['correct']
-            elif 'correct_answer' in current_question:
-                correct_answer = current_question['correct_answer']
-            
-            # Preparar dados da pergunta para o frontend
-            question_data = {
-                'question': current_question['question'],
-                'options': {
-                    'A': current_question['options'][0],
-                    'B': current_question['options'][1],
-                    'C': current_question['options'][2],
-                    'D': current_question['options'][3]
-                },
-                'correct': correct_answer
-            }
+        bank = question_bank  # O banco pode ser trocado por uma importação a qualquer momento
+        if quiz_running and bank:
+            # Selecionar pergunta atual (já normalizada, com os payloads prontos),
+            # pulando as perguntas salvas inválidas (modo janela) no máximo uma volta
+            for _ in range(len(bank)):
+                current_question_index = current_question_index % len(bank)
+                current_question = bank[current_question_index]
+                if current_question is not None:
+                    break
+                current_question_index += 1
+            else:
+                # Nenhuma pergunta válida: aguardar uma importação ou correção
+                error_log_limiter.log(logger, logging.WARNING, 'no_valid_questions',
+                                      "Nenhuma pergunta válida no banco; aguardando")
+                phase_clock.reset()
+                socketio.sleep(5)
+                continue
+            # Nova rodada de votos (a troca da referência é atômica)
+            current_round = VoteRound(current_question_index)
+            broadcaster.reset_votes()
+            # A fase começa no prazo da anterior: o trabalho entre as fases não a estende
+            phase_clock.begin('question', quiz_config['answer_time'])
+            quiz_phase = 'question'
+            last_results = None
             
             # Enviar pergunta para o frontend
-            logger.info(f"Enviando pergunta: {question_data}")
-            logger.info(f"Pergunta {current_question_index + 1}: {current_question['question']}")
+            logger.info(f"Pergunta {current_question_index + 1}/{len(question_bank)}: {current_question.text}",
+                        extra={'question_num': current_question_index + 1})
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Enviando pergunta: {current_question.socket_question}")
             
-            socketio.emit('next_question', {
-                'question': question_data,
-                'question_num': current_question_index + 1,
-                'total_questions': len(questions),
-                'answer_time': quiz_config['answer_time']
-            })
+            socketio.emit('next_question', build_next_question_event())
+            state_tracker.bump('question', 'votes')
             
-            # Aguardar o tempo de resposta
-            time.sleep(quiz_config['answer_time'])
+            # Aguardar o prazo da resposta
+            phase_clock.wait()
             
             # Enviar mensagem de contabilização de votos
-            logger.info("Enviando mensagem de contabilização de votos")
+            phase_clock.begin('counting', quiz_config['vote_count_time'])
+            logger.debug("Enviando mensagem de contabilização de votos")
             socketio.emit('show_counting_votes', {
-                'time': quiz_config['vote_count_time']
+                'time': quiz_config['vote_count_time'],
+                **get_phase_timing()
             })
+            quiz_phase = 'counting'
+            state_tracker.bump('question')
             
-            # Aguardar tempo para contabilizar votos
-            time.sleep(quiz_config['vote_count_time'])
-            
-            # Calcular resultado
-            explanation = current_question.get('explanation', 'Sem explicação disponível.')
+            # Aguardar o prazo da contabilização
+            phase_clock.wait()
             
-            # Converter índice numérico para letra (0=A, 1=B, 2=C, 3=D)
-            correct_letter = chr(65 + correct_answer)  # ASCII: A=65, B=66, etc.
+            # Calcular resultado (o tempo gasto aqui sai da fase de resultados)
+            phase_clock.begin('results', quiz_config['result_display_time'])
+            correct_letter = current_question.correct_letter
             
-            # Atualizar ranking
-            update_ranking(correct_answer)
+            # Fechar a rodada e atualizar o ranking com o snapshot dos votos
+            vote_snapshot = current_round.close()
+            with RANKING_UPDATE_SECONDS.time():
+                update_ranking(current_question.correct, vote_snapshot)
             
             # Enviar resultado para o frontend
-            logger.info(f"Enviando resultados: resposta correta={correct_letter}, votos={count_votes()}")
-            socketio.emit('show_results', {
+            votes = count_votes()
+            logger.info(f"Resultados: resposta correta={correct_letter}, votos={votes}",
+                        extra={'question_num': current_question_index + 1, 'correct': correct_letter,
+                               'votes': votes, 'voters': len(vote_snapshot.user_votes)})
+            last_results = {
                 'correct_answer': correct_letter,
-                'explanation': explanation,
-                'votes': count_votes()
-            })
+                'explanation': current_question.explanation,
+                'votes': votes
+            }
+            socketio.emit('show_results', {**last_results, **get_phase_timing()})
+            quiz_phase = 'results'
             
             # Enviar ranking atualizado
             top_ranking = get_top_ranking(10)
-            logger.info(f"Enviando ranking atualizado: {top_ranking}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Enviando ranking atualizado: {top_ranking}")
             socketio.emit('update_ranking', {
                 'ranking': top_ranking
             })
+            state_tracker.bump('question', 'ranking')
             
-            # Aguardar antes de passar para a próxima pergunta
-            time.sleep(quiz_config['result_display_time'])
+            # Aguardar o prazo dos resultados antes de passar para a próxima pergunta
+            phase_clock.wait()
             
             # Avançar para a próxima pergunta
             current_question_index += 1
         else:
             # Se o quiz não estiver rodando, aguardar um pouco antes de verificar novamente
-            time.sleep(1)
+            phase_clock.reset()
+            socketio.sleep(1)
+
+# Evento next_question da pergunta atual (o corpo da pergunta vem pronto)
+def build_next_question_event():
+    return {
+        'question': current_question.socket_question,
+        'question_num': current_question_index + 1,
+        'total_questions': len(question_bank),
+        'answer_time': quiz_config['answer_time'],
+        **get_phase_timing()
+    }
+
+# Tempo restante e prazo da fase atual (incluídos em todos os payloads)
+def get_phase_timing():
+    return {
+        'remaining_time': phase_clock.remaining_seconds(),
+        'deadline': phase_clock.deadline_epoch()
+    }
 
 # Obter os top N usuários do ranking
 def get_top_ranking(n=10):
-    sorted_ranking = sorted(ranking.items(), key=lambda x: x[1], reverse=True)
-    return [{"name": name, "score": score} for name, score in sorted_ranking[:n]]
+    return ranking.top(n)
 
 # Contar votos
 def count_votes():
-    global current_votes
+    votes = current_round.counts()
     return {
-        'A': current_votes[0],
-        'B': current_votes[1],
-        'C': current_votes[2],
-        'D': current_votes[3]
+        'A': votes[0],
+        'B': votes[1],
+        'C': votes[2],
+        'D': votes[3]
     }
 
 # Atualizar ranking com base nos votos
-def update_ranking(correct_answer):
-    global ranking, user_votes
+def update_ranking(correct_answer, vote_snapshot=None):
+    global ranking
+    
+    # Sem snapshot explícito, fechar a rodada atual
+    if vote_snapshot is None:
+        vote_snapshot = current_round.close()
     
     # Converter índice numérico para letra (0=A, 1=B, 2=C, 3=D)
     correct_letter = chr(65 + correct_answer)  # ASCII: A=65, B=66, etc.
     
-    logger.info(f"Atualizando ranking. Resposta correta: {correct_letter}")
+    logger.debug(f"Atualizando ranking. Resposta correta: {correct_letter}")
     
     # Atualizar ranking com usuários que acertaram
-    for user, vote in user_votes.items():
-        if user not in ranking:
-            ranking[user] = 0
-        
-        # Comparar voto (que é uma letra) com a resposta correta
-        if vote == correct_letter:
-            ranking[user] += 1
-            logger.info(f"Usuário {user} acertou e ganhou 1 ponto. Total: {ranking[user]}")
+    deltas = {}
+    for user, vote in vote_snapshot.user_votes.items():
+        # Comparar voto (índice da opção) com a resposta correta
+        if vote == correct_answer:
+            ranking.add_points(user, 1)
+            deltas[user] = 1
+        elif user not in ranking:
+            ranking.add_points(user, 0)
+            deltas[user] = 0
     
-    # Salvar ranking atualizado
-    save_ranking()
+    # Gravar no journal apenas o que mudou nesta pergunta
+    save_ranking_deltas(deltas)
     
-    # Log do ranking atual
-    logger.info(f"Ranking atual: {ranking}")
-    logger.info(f"Top 10: {get_top_ranking(10)}")
+    # Resumo da pergunta (o top 10 completo só em DEBUG)
+    correct_count = sum(deltas.values())
+    logger.info(f"Ranking atualizado: {correct_count} acerto(s), {len(ranking)} usuários",
+                extra={'correct_users': correct_count, 'ranking_size': len(ranking)})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Top 10: {get_top_ranking(10)}")
 
 # Função para normalizar URL do YouTube
 def normalize_youtube_url(url):
@@ -530,19 +735,6 @@ def normalize_youtube_url(url):
         logger.error(f"Erro ao normalizar URL do YouTube: {e}")
         return None
 
-# Função para reiniciar o monitoramento do chat
-def restart_chat_monitoring(url):
-    global chat_thread
-    
-    # Parar a thread atual
-    if chat_thread and chat_thread.is_alive():
-        logger.info("Parando thread de monitoramento do chat")
-    
-    # Iniciar nova thread
-    chat_thread = threading.Thread(target=monitor_youtube_chat)
-    chat_thread.daemon = True
-    chat_thread.start()
-
 # Rotas da aplicação
 @app.route('/')
 def home():
@@ -586,70 +778,316 @@ def quiz():
 @app.route('/api/config', methods=['GET'])
 def api_get_config():
     """Retorna as configurações atuais."""
-    return jsonify(quiz_config)
+    return response_cache.response('config', state_tracker.section_version('config'), lambda: quiz_config)
 
 @app.route('/api/config', methods=['POST'])
 def api_save_config():
     """Salva as configurações enviadas pelo cliente."""
-    global quiz_config, is_chat_running, chat_thread
+    global quiz_config
     
     try:
         # Obter dados do cliente
         data = request.json
         
+        # Rejeitar apelidos de voto inválidos antes de gravar
+        if 'vote_aliases' in data:
+            try:
+                if not isinstance(data['vote_aliases'] or {}, dict):
+                    raise ValueError("vote_aliases deve ser um objeto")
+                VoteClassifier(OPTION_COUNT, aliases=data['vote_aliases'] or {})
+            except ValueError as e:
+                return jsonify({'success': False, 'message': f"Configuração de votos inválida: {e}"}), 400
+        
         # Verificar se houve mudança na configuração do simulador de chat
         old_simulator_setting = quiz_config.get('enable_chat_simulator', True)
         new_simulator_setting = data.get('enable_chat_simulator', True)
         
         # Atualizar configuração
         quiz_config.update(data)
+        apply_runtime_config()
         
         # Salvar configuração
         save_config()
         
+        # No cluster, o líder recarrega a configuração e reinicia o chat se preciso
+        if is_follower():
+            cluster.send_command('reload_config', old_simulator_setting=old_simulator_setting)
+            return jsonify({'success': True})
+        
         # Se a configuração do simulador mudou e o chat está rodando, reiniciar o chat
-        if old_simulator_setting != new_simulator_setting and is_chat_running:
-            # Parar o chat atual
-            is_chat_running = False
-            if chat_thread and chat_thread.is_alive():
-                # Esperar o thread terminar (com timeout)
-                chat_thread.join(timeout=1.0)
-            
-            # Iniciar novo chat com a nova configuração
-            is_chat_running = True
-            chat_thread = threading.Thread(target=monitor_youtube_chat)
-            chat_thread.daemon = True
-            chat_thread.start()
+        # em segundo plano para não prender a requisição
+        socketio.start_background_task(restart_chat_if_simulator_changed, old_simulator_setting, new_simulator_setting)
         
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f"Erro ao salvar configurações: {str(e)}")
         return jsonify({'success': False, 'message': str(e)})
 
+# Reiniciar o chat quando a opção do simulador mudar
+def restart_chat_if_simulator_changed(old_simulator_setting, new_simulator_setting):
+    if old_simulator_setting != new_simulator_setting and chat_supervisor.running:
+        # A nova fonte substitui a atual (o leitor anterior é cancelado sem esperar)
+        start_chat_source()
+
 # API para perguntas
 @app.route('/api/questions', methods=['GET', 'POST'])
 def api_questions():
-    global questions
-    
     if request.method == 'POST':
         data = request.json
         if 'questions' in data:
-            questions = data['questions']
-            save_questions()
-            return jsonify({'success': True, 'count': len(questions)})
+            with questions_lock:
+                try:
+                    set_questions(data['questions'])
+                except QuestionError as e:
+                    return jsonify({'success': False, 'message': f"Pergunta inválida: {e}"}), 400
+                save_questions()
+            if is_follower():
+                cluster.send_command('reload_questions')
+            return jsonify({'success': True, 'count': len(question_bank)})
+    
+    # Listagem paginada: ?limit=&cursor=&q=&correct=&fields=
+    if any(key in request.args for key in ('limit', 'cursor', 'q', 'correct', 'fields')):
+        try:
+            return jsonify(question_bank.page(
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', type=int),
+                query=request.args.get('q'),
+                correct=request.args.get('correct'),
+                fields=parse_fields(request.args.get('fields'))
+            ))
+        except QuestionError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+    
+    # Sem parâmetros: o banco inteiro (exportação e clientes antigos)
+    return response_cache.response('questions', state_tracker.section_version('questions'),
+                                   lambda: question_bank.all_raw())
+
+# Aplicar alterações no banco de perguntas já gravadas (bank é o novo banco)
+def replace_question_bank(bank):
+    global question_bank
+    # A troca da referência é atômica: o quiz continua com o banco anterior até aqui
+    question_bank = bank
+    state_tracker.bump('questions')
+    if is_follower():
+        cluster.send_command('reload_questions')
+
+# Importação em massa (NDJSON, CSV ou array JSON), lida em streaming
+@app.route('/api/questions/import', methods=['POST'])
+def api_import_questions():
+    """Importa perguntas validando linha a linha (?mode=replace|append|upsert)."""
+    import_format = request.args.get('format') or detect_format(request.content_type, request.args.get('filename'))
+    if import_format not in IMPORT_FORMATS:
+        return jsonify({'success': False, 'message': f"Formato inválido: {import_format}"}), 400
     
-    return jsonify(questions)
+    # Alterações concorrentes são serializadas; o quiz continua lendo o banco anterior
+    with questions_lock:
+        try:
+            importer = QuestionImporter(question_bank, request.args.get('mode', 'append'))
+            stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+            importer.run(iter_items(stream, import_format))
+        except QuestionError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except ValueError as e:
+            return jsonify({'success': False, 'message': f"Arquivo inválido: {e}"}), 400
+        
+        result = importer.summary()
+        if importer.imported:
+            try:
+                replace_question_bank(question_bank.apply_import(importer, storage))
+            except Exception as e:
+                logger.error(f"Erro ao salvar perguntas importadas: {e}")
+                return jsonify({**result, 'success': False, 'message': f"Erro ao salvar: {e}"}), 500
+    
+    logger.info(f"Importação de perguntas ({importer.mode}, {import_format}): {result['added']} novas, "
+                f"{result['updated']} atualizadas, {result['error_count']} com erro")
+    return jsonify(result)
+
+# Ler, editar ou excluir uma pergunta pela posição (editor com listagem paginada)
+@app.route('/api/questions/<int:position>', methods=['GET', 'PUT', 'DELETE'])
+def api_question(position):
+    if request.method == 'GET':
+        try:
+            return jsonify({'position': position, **question_bank.raw(position)})
+        except IndexError:
+            return jsonify({'success': False, 'message': 'Pergunta não encontrada'}), 404
+    
+    with questions_lock:
+        if not 0 <= position < len(question_bank):
+            return jsonify({'success': False, 'message': 'Pergunta não encontrada'}), 404
+        try:
+            if request.method == 'DELETE':
+                replace_question_bank(question_bank.delete(position, storage))
+                return jsonify({'success': True, 'total': len(question_bank)})
+            
+            importer = QuestionImporter(question_bank)
+            if not importer.add(1, request.get_json(silent=True), position=position):
+                return jsonify({'success': False, 'message': f"Pergunta inválida: {importer.errors[0]['message']}"}), 400
+            replace_question_bank(question_bank.apply_import(importer, storage))
+            return jsonify({'success': True, 'question': {'position': position, **importer.changes[position][0]}})
+        except Exception as e:
+            logger.error(f"Erro ao alterar pergunta {position}: {e}")
+            return jsonify({'success': False, 'message': str(e)}), 500
 
 # API para ranking
 @app.route('/api/ranking', methods=['GET'])
 def api_ranking():
     """Retorna o ranking atual dos 10 melhores participantes."""
     try:
-        return jsonify(get_top_ranking(10))
+        return response_cache.response('ranking', state_tracker.section_version('ranking'),
+                                       lambda: get_top_ranking(10))
     except Exception as e:
         logger.error(f"Erro ao obter ranking: {e}")
         return jsonify({'error': str(e)}), 500
 
+# API para consultar a posição de um usuário no ranking
+@app.route('/api/ranking/<path:name>', methods=['GET'])
+def api_ranking_user(name):
+    """Retorna a posição e a pontuação de um participante."""
+    position = ranking.rank(name)
+    if position is None:
+        return jsonify({'success': False, 'message': 'Usuário não encontrado no ranking'}), 404
+    return jsonify({
+        'success': True,
+        'name': name,
+        'score': ranking.get(name),
+        'rank': position
+    })
+
+# Sessões de quiz simultâneas (cada uma com configuração, chat e ranking próprios)
+session_manager = SessionManager(
+    socketio,
+    DATA_DIR,
+    lambda: question_bank,
+    open_source=lambda url: open_chat_source(url, inactivity_timeout=CHAT_INACTIVITY_TIMEOUT, sleep=socketio.sleep),
+    normalize_url=normalize_chat_url
+)
+metrics_registry.gauge('quiz_sessions_running', 'Sessões de quiz em execução',
+                       function=session_manager.active_count)
+atexit.register(session_manager.shutdown)
+
+# As sessões rodam em um único processo; no cluster, apenas no líder
+def sessions_unavailable():
+    if is_follower():
+        return jsonify({'success': False, 'message': 'Sessões são atendidas apenas pelo processo líder'}), 409
+    return None
+
+# Buscar a sessão ou responder 404
+def find_session(session_id):
+    session_obj = session_manager.get(session_id)
+    if session_obj is None:
+        return None, (jsonify({'success': False, 'message': 'Sessão não encontrada'}), 404)
+    return session_obj, None
+
+# API de sessões
+@app.route('/api/sessions', methods=['GET', 'POST'])
+def api_sessions():
+    """Lista as sessões ou cria uma nova ({"id": ..., "config": {...}})."""
+    unavailable = sessions_unavailable()
+    if unavailable:
+        return unavailable
+    if request.method == 'GET':
+        return jsonify({'success': True, 'sessions': session_manager.list()})
+    data = request.get_json(silent=True) or {}
+    try:
+        session_obj = session_manager.create(data.get('id'), data.get('config') or {})
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'session': session_obj.summary()}), 201
+
+@app.route('/api/sessions/<session_id>', methods=['GET', 'DELETE'])
+def api_session(session_id):
+    """Consulta ou remove uma sessão."""
+    unavailable = sessions_unavailable()
+    if unavailable:
+        return unavailable
+    session_obj, error = find_session(session_id)
+    if error:
+        return error
+    if request.method == 'DELETE':
+        session_manager.delete(session_obj)
+        return jsonify({'success': True})
+    return jsonify({'success': True, 'session': session_obj.summary(), 'votes': session_obj.votes()})
+
+@app.route('/api/sessions/<session_id>/config', methods=['POST'])
+def api_session_config(session_id):
+    """Atualiza as configurações da sessão (aplicadas também com o quiz rodando)."""
+    unavailable = sessions_unavailable()
+    if unavailable:
+        return unavailable
+    session_obj, error = find_session(session_id)
+    if error:
+        return error
+    try:
+        session_manager.update_config(session_obj, request.get_json(silent=True) or {})
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'session': session_obj.summary()})
+
+@app.route('/api/sessions/<session_id>/start', methods=['POST'])
+def api_session_start(session_id):
+    """Inicia o quiz da sessão."""
+    unavailable = sessions_unavailable()
+    if unavailable:
+        return unavailable
+    session_obj, error = find_session(session_id)
+    if error:
+        return error
+    try:
+        session_manager.start(session_obj)
+    except SessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    return jsonify({'success': True, 'session': session_obj.summary()})
+
+@app.route('/api/sessions/<session_id>/stop', methods=['POST'])
+def api_session_stop(session_id):
+    """Para o quiz da sessão e grava o ranking."""
+    unavailable = sessions_unavailable()
+    if unavailable:
+        return unavailable
+    session_obj, error = find_session(session_id)
+    if error:
+        return error
+    if not session_manager.stop(session_obj):
+        return jsonify({'success': False, 'message': 'Quiz não está em execução'}), 409
+    return jsonify({'success': True, 'session': session_obj.summary()})
+
+@app.route('/api/sessions/<session_id>/ranking', methods=['GET'])
+def api_session_ranking(session_id):
+    """Retorna os melhores participantes da sessão (?limit=10)."""
+    unavailable = sessions_unavailable()
+    if unavailable:
+        return unavailable
+    session_obj, error = find_session(session_id)
+    if error:
+        return error
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    return jsonify({'success': True, 'ranking': session_obj.top_ranking(limit)})
+
+# Medir taxa e duração das requisições HTTP por endpoint
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'desconhecido'
+        HTTP_REQUESTS.inc(endpoint, request.method, str(response.status_code))
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+    return response
+
+# Métricas no formato do Prometheus
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+# Métricas do pipeline de ingestão do chat
+@app.route('/api/ingest/stats', methods=['GET'])
+def api_ingest_stats():
+    """Retorna a profundidade da fila e os contadores de descarte do chat."""
+    return jsonify({'success': True, 'stats': chat_pipeline.stats()})
+
 # API para testar conexão com YouTube
 @app.route('/api/test-connection', methods=['POST'])
 def test_connection():
@@ -753,6 +1191,57 @@ def api_quiz_status_http():
             'message': str(e)
         }), 500
 
+# Montar o estado da pergunta atual para clientes HTTP
+def build_question_state():
+    """Retorna a pergunta atual no formato usado pelos endpoints HTTP."""
+    question = current_question
+    if question is None:
+        return None
+    
+    return {
+        'success': True,
+        'question': {
+            'id': question.id,
+            'text': question.text,
+            'options': list(question.options),
+            'time': quiz_config.get('answer_time', 20)
+        },
+        **get_question_phase_state()
+    }
+
+# Parte da pergunta atual que muda durante a rodada (tempo, fase e resultado)
+def get_question_phase_state():
+    return {
+        **get_phase_timing(),
+        'question_num': current_question_index + 1,
+        'total_questions': len(question_bank),
+        'phase': quiz_phase,
+        'results': last_results if quiz_phase == 'results' else None
+    }
+
+# Montar a contagem de votos para clientes HTTP
+def build_votes_state():
+    current_votes = current_round.counts()
+    total_votes = sum(current_votes)
+    correct_index = current_question.correct if current_question else 0
+    correct_votes = current_votes[correct_index] if 0 <= correct_index < len(current_votes) else 0
+    correct_percentage = int((correct_votes / total_votes) * 100) if total_votes > 0 else 0
+    
+    return {
+        'a': current_votes[0] if len(current_votes) > 0 else 0,
+        'b': current_votes[1] if len(current_votes) > 1 else 0,
+        'c': current_votes[2] if len(current_votes) > 2 else 0,
+        'd': current_votes[3] if len(current_votes) > 3 else 0,
+        'correct_percentage': correct_percentage
+    }
+
+# Mensagens do chat posteriores ao id (ou, para clientes antigos, ao timestamp) fornecido;
+# com a epoch de outro histórico (servidor reiniciado) o id não vale e vem o buffer inteiro
+def get_chat_messages_since(since=0, after_id=None, epoch=None):
+    if after_id is not None:
+        return chat_history.since(after_id, epoch=epoch)
+    return chat_history.since_timestamp(since)
+
 @app.route('/api/quiz/current-question-http', methods=['GET'])
 def api_current_question_http():
     try:
@@ -762,35 +1251,13 @@ def api_current_question_http():
                 'message': 'Quiz não está em execução ou não há pergunta atual'
             }), 404
         
-        # Obter opções da pergunta de forma segura
-        options = []
-        if 'options' in current_question:
-            if isinstance(current_question['options'], list):
-                options = current_question['options'][:4]  # Garantir que temos 4 opções
-                # Preencher com vazios se não tiver 4 opções
-                while len(options) < 4:
-                    options.append("")
-            else:
-                # Formato de dicionário
-                options = [
-                    current_question['options'].get('A', ''),
-                    current_question['options'].get('B', ''),
-                    current_question['options'].get('C', ''),
-                    current_question['options'].get('D', '')
-                ]
-        
-        return jsonify({
-            'success': True,
-            'question': {
-                'id': current_question.get('id', current_question_index),
-                'text': current_question.get('question', ''),
-                'options': options,
-                'time': quiz_config.get('answer_time', 20)
-            },
-            'remaining_time': quiz_config.get('answer_time', 20),
-            'question_num': current_question_index + 1,
-            'total_questions': len(questions)
-        })
+        # O tempo restante muda a cada segundo e faz parte da geração do cache;
+        # a pergunta já está serializada, só a parte da fase é montada aqui
+        question = current_question
+        generation = (state_tracker.section_version('question'), state_tracker.section_version('config'),
+                      phase_clock.remaining_seconds())
+        return response_cache.response('current-question', generation, lambda: question.http_body(
+            quiz_config.get('answer_time', 20), get_question_phase_state()))
     except Exception as e:
         logger.error(f"Erro ao obter pergunta atual: {e}")
         return jsonify({
@@ -807,21 +1274,9 @@ def api_votes_http():
                 'message': 'Quiz não está em execução'
             }), 404
         
-        # Calcular porcentagem de acertos
-        total_votes = sum(current_votes)
-        correct_index = current_question.get('correct', 0) if current_question else 0
-        correct_votes = current_votes[correct_index] if 0 <= correct_index < len(current_votes) else 0
-        correct_percentage = int((correct_votes / total_votes) * 100) if total_votes > 0 else 0
-        
         return jsonify({
             'success': True,
-            'votes': {
-                'a': current_votes[0] if len(current_votes) > 0 else 0,
-                'b': current_votes[1] if len(current_votes) > 1 else 0,
-                'c': current_votes[2] if len(current_votes) > 2 else 0,
-                'd': current_votes[3] if len(current_votes) > 3 else 0,
-                'correct_percentage': correct_percentage
-            }
+            'votes': build_votes_state()
         })
     except Exception as e:
         logger.error(f"Erro ao obter votos: {e}")
@@ -834,20 +1289,14 @@ def api_votes_http():
 def api_chat_http():
     try:
         since = request.args.get('since', 0, type=float)
-        
-        # Filtrar mensagens mais recentes que o timestamp fornecido
-        recent_messages = []
-        
-        # Verificar se chat_messages existe e é uma lista
-        if 'chat_messages' in globals() and isinstance(chat_messages, list):
-            recent_messages = [
-                msg for msg in chat_messages 
-                if msg.get('timestamp', 0) > since
-            ]
+        after_id = request.args.get('after_id', None, type=int)
+        epoch = request.args.get('epoch') or None
         
         return jsonify({
             'success': True,
-            'messages': recent_messages
+            'messages': get_chat_messages_since(since, after_id, epoch),
+            'last_id': chat_history.last_id,
+            'epoch': chat_history.epoch
         })
     except Exception as e:
         logger.error(f"Erro ao obter mensagens do chat: {e}")
@@ -856,9 +1305,67 @@ def api_chat_http():
             'message': str(e)
         }), 500
 
+# Estado versionado com long-polling: substitui o polling de status/pergunta/votos/chat/ranking
+@app.route('/api/quiz/state-http', methods=['GET'])
+def api_quiz_state_http():
+    """Retorna apenas as partes do estado que mudaram desde a versão informada.
+
+    Parâmetros: ``since`` (última versão vista), ``chat_after`` e
+    ``chat_epoch`` (id da última mensagem recebida e epoch do histórico em que
+    ela foi numerada; ``chat_since`` com o timestamp ainda é aceito) e
+    ``timeout`` (espera máxima em segundos). A resposta traz a ``chat_epoch``
+    atual; se ela mudou, o chat vem inteiro e o cliente recomeça a contagem.
+    """
+    try:
+        since = request.args.get('since', 0, type=int)
+        chat_since = request.args.get('chat_since', 0, type=float)
+        chat_after = request.args.get('chat_after', None, type=int)
+        chat_epoch = request.args.get('chat_epoch') or None
+        timeout = request.args.get('timeout', LONG_POLL_TIMEOUT, type=float)
+        timeout = min(max(timeout, 0), LONG_POLL_TIMEOUT)
+        # Histórico de outro boot: responder já, com o chat atual
+        epoch_changed = chat_epoch is not None and chat_epoch != chat_history.epoch
+        if epoch_changed:
+            timeout = 0
+        
+        version, sections = state_tracker.wait_for_change(since, timeout)
+        if epoch_changed and 'chat' not in sections:
+            sections = list(sections) + ['chat']
+        
+        changes = {}
+        for section in sections:
+            if section == 'status':
+                changes['status'] = {'quiz_running': quiz_running}
+            elif section == 'question':
+                changes['question'] = build_question_state() if quiz_running else None
+            elif section == 'votes':
+                changes['votes'] = build_votes_state()
+            elif section == 'chat':
+                changes['chat'] = get_chat_messages_since(chat_since, chat_after, chat_epoch)
+            elif section == 'ranking':
+                changes['ranking'] = get_ranking()
+        
+        return jsonify({
+            'success': True,
+            'version': version,
+            'chat_epoch': chat_history.epoch,
+            'changes': changes
+        })
+    except Exception as e:
+        logger.error(f"Erro ao obter estado do quiz: {e}")
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
 @app.route('/api/quiz/start-http', methods=['POST'])
 def api_start_quiz_http():
-    global quiz_running, current_question, current_question_index, current_votes
+    global quiz_running, current_question, current_question_index, current_round
+    
+    if is_follower():
+        # Apenas o líder executa o quiz: encaminhar o comando
+        cluster.send_command('start_quiz')
+        return jsonify({'success': True, 'message': 'Comando de início enviado ao líder'})
     
     if quiz_running:
         return jsonify({
@@ -868,12 +1375,13 @@ def api_start_quiz_http():
     
     # Iniciar o quiz
     quiz_running = True
+    state_tracker.bump('status', 'question')
     current_question_index = 0
-    current_votes = [0, 0, 0, 0]
+    current_round = VoteRound()
     
-    # Iniciar a thread de monitoramento do chat se não estiver rodando
-    if 'chat_thread' in globals() and (not chat_thread or not chat_thread.is_alive()):
-        start_chat_monitoring()
+    # Iniciar a leitura do chat se não estiver rodando
+    if not chat_supervisor.running:
+        start_chat_source()
     
     # Avançar para a primeira pergunta
     next_question()
@@ -887,6 +1395,10 @@ def api_start_quiz_http():
 def api_stop_quiz_http():
     global quiz_running
     
+    if is_follower():
+        cluster.send_command('stop_quiz')
+        return jsonify({'success': True, 'message': 'Comando de parada enviado ao líder'})
+    
     if not quiz_running:
         return jsonify({
             'success': False,
@@ -895,6 +1407,7 @@ def api_stop_quiz_http():
     
     # Parar o quiz
     quiz_running = False
+    state_tracker.bump('status', 'question')
     
     return jsonify({
         'success': True,
@@ -904,13 +1417,9 @@ def api_stop_quiz_http():
 @app.route('/api/ranking-http', methods=['GET'])
 def api_ranking_http():
     try:
-        # Obter o ranking atual
-        ranking_list = get_ranking()
-        
-        return jsonify({
-            'success': True,
-            'ranking': ranking_list
-        })
+        # Corpo pré-serializado enquanto o ranking não mudar
+        return response_cache.response('ranking-http', state_tracker.section_version('ranking'),
+                                       lambda: {'success': True, 'ranking': get_ranking()})
     except Exception as e:
         logger.error(f"Erro ao obter ranking via HTTP: {e}")
         return jsonify({
@@ -918,11 +1427,26 @@ def api_ranking_http():
             'message': str(e)
         }), 500
 
+# Reiniciar a leitura do chat conectando ao YouTube
+def reconnect_youtube_chat(normalized_url):
+    # Parar o chat atual; o novo leitor substitui o anterior sem esperar por ele
+    stop_live_chat()
+    
+    # Limpar o chat container no cliente
+    socketio.emit('clear_chat', {
+        'message': 'Chat reiniciado para conexão com YouTube'
+    })
+    
+    # Iniciar novo chat com a nova configuração (o link já foi salvo em quiz_config)
+    start_chat_source()
+    
+    logger.info(f"Leitura do chat reiniciada para o link: {normalized_url}")
+
 # API para conectar diretamente ao chat do YouTube
 @app.route('/api/connect-youtube', methods=['POST'])
 def api_connect_youtube():
     """Conecta diretamente ao chat do YouTube a partir da página do quiz."""
-    global quiz_config, is_chat_running, is_simulator_running, chat_thread
+    global quiz_config
     
     try:
         # Obter URL do cliente
@@ -934,7 +1458,7 @@ def api_connect_youtube():
             return jsonify({'success': False, 'message': 'URL não fornecida'}), 400
         
         # Normalizar a URL do YouTube
-        normalized_url = normalize_youtube_url(url)
+        normalized_url = normalize_chat_url(url)
         if not normalized_url:
             logger.error(f"URL do YouTube inválida: {url}")
             return jsonify({'success': False, 'message': 'URL do YouTube inválida'}), 400
@@ -946,37 +1470,12 @@ def api_connect_youtube():
         # Salvar configuração
         save_config()
         
-        # Parar o chat atual
-        is_chat_running = False
-        is_simulator_running = False  # Garantir que o simulador seja desativado
-        
-        if chat_thread and chat_thread.is_alive():
-            logger.info("Parando thread de chat atual...")
-            # Esperar o thread terminar (com timeout)
-            chat_thread.join(timeout=1.0)
-        
-        # Limpar o chat container no cliente
-        socketio.emit('clear_chat', {
-            'message': 'Chat reiniciado para conexão com YouTube'
-        })
-        
-        # Enviar mensagem de sistema
-        socketio.emit('chat_message', {
-            'author': 'Sistema',
-            'message': f'Tentando conectar ao chat do YouTube: {normalized_url}'
-        })
-        
-        # Aguardar um momento para garantir que o thread anterior parou
-        time.sleep(1)
-        
-        # Iniciar novo chat com a nova configuração
-        is_chat_running = True
-        is_simulator_running = False  # Garantir novamente que o simulador esteja desativado
-        chat_thread = threading.Thread(target=monitor_youtube_chat)
-        chat_thread.daemon = True
-        chat_thread.start()
-        
-        logger.info(f"Iniciado thread para conectar ao chat do YouTube: {normalized_url}")
+        # No cluster, a conexão com o chat é feita pelo líder
+        if is_follower():
+            cluster.send_command('connect_youtube', url=normalized_url)
+        else:
+            # Reconectar em segundo plano: a requisição não espera o chat anterior parar
+            socketio.start_background_task(reconnect_youtube_chat, normalized_url)
         
         # Retornar sucesso imediatamente, mesmo que a conexão real ainda esteja em andamento
         # O feedback real será enviado via Socket.IO diretamente para o cliente
@@ -995,11 +1494,7 @@ def api_connect_youtube():
         save_config()
         
         # Iniciar simulador
-        is_chat_running = True
-        is_simulator_running = True
-        chat_thread = threading.Thread(target=simulate_chat_messages)
-        chat_thread.daemon = True
-        chat_thread.start()
+        start_live_chat(CHAT_SIMULATOR_URL)
         
         # Notificar o cliente sobre o erro e o fallback
         socketio.emit('chat_message', {
@@ -1013,23 +1508,23 @@ def api_connect_youtube():
             'fallback': True
         }), 500
 
+# Estado da leitura do chat ao vivo (conexão, reconexões, última mensagem)
+@app.route('/api/chat/health', methods=['GET'])
+def api_chat_health():
+    if is_follower():
+        return jsonify({'success': False, 'message': 'O chat é lido apenas pelo processo líder'}), 409
+    return jsonify({
+        'success': True,
+        **chat_supervisor.health(),
+        'orphaned_pumps': orphaned_pumps()
+    })
+
 # Função para obter o ranking atual
 def get_ranking():
     """Retorna o ranking atual ordenado por pontuação."""
     try:
-        # Converter o dicionário de ranking em uma lista de dicionários
-        ranking_list = []
-        for name, score in ranking.items():
-            ranking_list.append({
-                'name': name,
-                'score': score
-            })
-        
-        # Ordenar por pontuação (maior para menor)
-        ranking_list.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Retornar os 10 primeiros
-        return ranking_list[:10]
+        # O índice do ranking já está ordenado; retornar os 10 primeiros
+        return ranking.top(10)
     except Exception as e:
         logger.error(f"Erro ao obter ranking: {e}")
         return []
@@ -1044,73 +1539,55 @@ def handle_connect():
     
     # Se o quiz estiver rodando, enviar a pergunta atual
     if current_question and quiz_running:
-        # Verificar formato da pergunta e obter a resposta correta
-        correct_answer = 0  # Valor padrão
-        if 'correct' in current_question:
-            correct_answer = current_question['correct']
-        elif 'correct_answer' in current_question:
-            correct_answer = current_question['correct_answer']
-        
-        # Preparar dados da pergunta para o frontend
-        question_data = {
-            'question': current_question['question'],
-            'options': {
-                'A': current_question['options'][0],
-                'B': current_question['options'][1],
-                'C': current_question['options'][2],
-                'D': current_question['options'][3]
-            },
-            'correct': correct_answer
-        }
-        
-        emit('next_question', {
-            'question': question_data,
-            'question_num': current_question_index + 1,
-            'total_questions': len(questions),
-            'answer_time': quiz_config['answer_time']
-        })
+        emit('next_question', build_next_question_event())
 
 @socketio.on('get_ranking')
 def handle_get_ranking(data=None):
     """Manipulador para solicitação de ranking via Socket.IO."""
     emit('ranking_update', {'success': True, 'ranking': get_ranking()})
 
+# Responder só ao cliente que pediu (comandos do cluster não têm cliente: vão para o tópico status)
+def reply_quiz_status(payload):
+    if has_request_context() and getattr(request, 'sid', None):
+        emit('quiz_status', payload)
+    else:
+        socketio.emit('quiz_status', payload)
+
 @socketio.on('start_quiz')
 def handle_start_quiz(data=None):
-    global quiz_running, chat_thread, quiz_thread, current_question_index
+    global quiz_running, quiz_thread, current_question_index
+    
+    if is_follower():
+        # Apenas o líder executa o quiz; o status chega pela fila de mensagens
+        cluster.send_command('start_quiz')
+        return
     
     if quiz_running:
-        socketio.emit('quiz_status', {'success': False, 'message': 'Quiz já está em execução', 'quiz_running': quiz_running})
+        reply_quiz_status({'success': False, 'message': 'Quiz já está em execução', 'quiz_running': quiz_running})
         return
     
     if not quiz_config['youtube_url']:
-        socketio.emit('quiz_status', {'success': False, 'message': 'URL do YouTube não configurada', 'quiz_running': quiz_running})
+        reply_quiz_status({'success': False, 'message': 'URL do YouTube não configurada', 'quiz_running': quiz_running})
         return
     
-    if not questions:
-        socketio.emit('quiz_status', {'success': False, 'message': 'Nenhuma pergunta cadastrada', 'quiz_running': quiz_running})
+    if not question_bank:
+        reply_quiz_status({'success': False, 'message': 'Nenhuma pergunta cadastrada', 'quiz_running': quiz_running})
         return
     
     try:
         quiz_running = True
+        state_tracker.bump('status', 'question')
         current_question_index = 0
         
-        # Iniciar thread para monitorar chat
-        chat_thread = threading.Thread(target=monitor_youtube_chat)
-        chat_thread.daemon = True
-        chat_thread.start()
+        # Iniciar a leitura do chat (gravação, simulador ou YouTube, conforme a configuração)
+        start_chat_source()
         
         # Iniciar thread para o loop do quiz
         quiz_thread = threading.Thread(target=quiz_loop)
         quiz_thread.daemon = True
         quiz_thread.start()
         
-        # Iniciar thread para simular mensagens de chat (apenas para testes)
-        sim_thread = threading.Thread(target=simulate_chat_messages)
-        sim_thread.daemon = True
-        sim_thread.start()
-        
-        # Emitir status atualizado para todos os clientes
+        # Emitir status atualizado para os assinantes do tópico status
         socketio.emit('quiz_status', {
             'success': True, 
             'message': 'Quiz iniciado com sucesso',
@@ -1118,8 +1595,9 @@ def handle_start_quiz(data=None):
         })
     except Exception as e:
         quiz_running = False
+        state_tracker.bump('status', 'question')
         logger.error(f"Erro ao iniciar quiz: {e}")
-        socketio.emit('quiz_status', {
+        reply_quiz_status({
             'success': False, 
             'message': f'Erro ao iniciar quiz: {str(e)}',
             'quiz_running': quiz_running
@@ -1129,133 +1607,255 @@ def handle_start_quiz(data=None):
 def handle_stop_quiz(data=None):
     global quiz_running
     
+    if is_follower():
+        cluster.send_command('stop_quiz')
+        return
+    
     if not quiz_running:
-        socketio.emit('quiz_status', {'success': False, 'message': 'Quiz não está em execução', 'quiz_running': quiz_running})
+        reply_quiz_status({'success': False, 'message': 'Quiz não está em execução', 'quiz_running': quiz_running})
         return
     
     quiz_running = False
+    state_tracker.bump('status', 'question')
     socketio.emit('quiz_status', {'success': True, 'message': 'Quiz interrompido com sucesso', 'quiz_running': quiz_running})
 
+# Assinar tópicos do quiz principal ({"topics": [...]} e/ou {"role": "overlay"})
+@socketio.on('subscribe')
+def handle_subscribe(data=None):
+    data = data or {}
+    topics = parse_topics(data.get('topics'), data.get('role'))
+    for topic in topics:
+        join_room(topic_room(topic))
+    emit('subscribed', {'topics': list(topics)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data=None):
+    data = data or {}
+    # Pedido sem nenhum tópico válido não cancela nada
+    topics = parse_topics(data.get('topics'), data.get('role'), fallback=())
+    for topic in topics:
+        leave_room(topic_room(topic))
+    emit('unsubscribed', {'topics': list(topics)})
+
+# Entrar nas salas de uma sessão (por tópico) e receber o estado atual dela
+@socketio.on('join_session', namespace=SESSIONS_NAMESPACE)
+def handle_join_session(data=None):
+    data = data or {}
+    session_obj = session_manager.get(data.get('session'))
+    if session_obj is None:
+        emit('error', {'message': 'Sessão não encontrada'})
+        return
+    topics = parse_topics(data.get('topics'), data.get('role'))
+    for room in session_manager.rooms(session_obj, topics):
+        join_room(room)
+    for event, payload in session_manager.initial_events(session_obj, topics):
+        emit(event, payload)
+
+@socketio.on('leave_session', namespace=SESSIONS_NAMESPACE)
+def handle_leave_session(data=None):
+    session_obj = session_manager.get((data or {}).get('session'))
+    if session_obj is not None:
+        for room in session_manager.rooms(session_obj):
+            leave_room(room)
+
+@socketio.on('get_ranking', namespace=SESSIONS_NAMESPACE)
+def handle_get_session_ranking(data=None):
+    session_obj = session_manager.get((data or {}).get('session'))
+    if session_obj is not None:
+        emit('update_ranking', {'ranking': session_obj.top_ranking(10)})
+
+# Iniciar ou parar o quiz de uma sessão pelo Socket.IO (o resultado vai para a sala)
+@socketio.on('start_quiz', namespace=SESSIONS_NAMESPACE)
+def handle_start_session_quiz(data=None):
+    session_obj = session_manager.get((data or {}).get('session'))
+    if session_obj is None or is_follower():
+        emit('error', {'message': 'Sessão não encontrada'})
+        return
+    try:
+        session_manager.start(session_obj)
+    except SessionError as e:
+        emit('error', {'message': str(e)})
+
+@socketio.on('stop_quiz', namespace=SESSIONS_NAMESPACE)
+def handle_stop_session_quiz(data=None):
+    session_obj = session_manager.get((data or {}).get('session'))
+    if session_obj is not None and not is_follower():
+        session_manager.stop(session_obj)
+
 # Handler para conexão de cliente
 @socketio.on('connect')
 def handle_connect(data=None):
+    # Contar antes de qualquer trabalho: a conexão é aceita mesmo se algo abaixo falhar,
+    # e o disconnect sempre decrementa
+    SOCKETIO_CLIENTS.inc()
     try:
-        socketio.emit('quiz_status', {
+        # Tópicos escolhidos na conexão (?topics=quiz,votes ou ?role=overlay; padrão: todos)
+        for topic in parse_topics(request.args.get('topics'), request.args.get('role')):
+            join_room(topic_room(topic))
+        # Status apenas para o cliente que conectou
+        emit('quiz_status', {
             'success': True,
             'quiz_running': quiz_running,
             'message': 'Conectado ao servidor'
         })
-        logger.info("Cliente conectado")
+        logger.debug("Cliente conectado")
     except Exception as e:
         logger.error(f"Erro ao processar conexão: {e}")
 
+# Handler para desconexão de cliente
+@socketio.on('disconnect')
+def handle_disconnect():
+    SOCKETIO_CLIENTS.dec()
+
 # Inicialização
 load_config()
 load_questions()
 load_ranking()
-
-# Função para simular mensagens de chat (apenas para testes)
-def simulate_chat_messages():
-    """Simula mensagens de chat para testes."""
-    global is_simulator_running
-    
-    logger.info("Iniciando simulação de mensagens de chat")
-    is_simulator_running = True
-    time.sleep(2)  # Aguardar um pouco para o quiz iniciar
-    
-    # Lista de nomes de usuários fictícios
-    usernames = ["João123", "MariaGamer", "PedroYT", "Ana_Live", "Carlos_Fan", 
-                "Lucia_Games", "Roberto_TV", "Patricia_Stream", "FelipeZ", "JuliaQuiz"]
-    
-    # Mensagens genéricas
-    messages = [
-        "Olá pessoal!", "Esse quiz é muito legal!", "Adoro participar!", 
-        "Qual é a próxima pergunta?", "Estou ganhando!", "Difícil essa!",
-        "Vamos lá!", "Quase acertei!", "Essa eu sei!", "Quem está ganhando?"
-    ]
-    
-    # Comandos de resposta
-    commands = ["!a", "!b", "!c", "!d", "!A", "!B", "!C", "!D"]
-    
-    # Loop para simular mensagens enquanto o quiz estiver rodando
-    while quiz_running and is_simulator_running:
-        try:
-            # Verificar se o simulador ainda deve estar rodando
-            if not is_simulator_running:
-                logger.info("Simulador de chat desativado. Parando simulação.")
-                break
-                
-            # Simular uma mensagem normal ou um comando
-            username = random.choice(usernames)
-            
-            # 50% de chance de ser um comando de resposta
-            if random.random() > 0.5 and current_question is not None:
-                msg = random.choice(commands)
-                logger.info(f"Simulando voto: {username} -> {msg}")
-            else:
-                msg = random.choice(messages)
-                logger.info(f"Simulando mensagem: {username} -> {msg}")
-            
-            # Criar uma mensagem simulada no formato que o chat-downloader usaria
-            fake_message = {
-                'author': {'name': username},
-                'message': msg
-            }
-            
-            # Processar a mensagem simulada
-            if isinstance(fake_message, dict):
-                if 'author' in fake_message and isinstance(fake_message['author'], dict):
-                    author = fake_message['author'].get('name', 'Anônimo')
-                else:
-                    author = fake_message.get('author', 'Anônimo')
-                
-                if 'message' in fake_message:
-                    message_text = fake_message.get('message', '').strip()
-                elif 'text' in fake_message:
-                    message_text = fake_message.get('text', '').strip()
-                else:
-                    message_text = str(fake_message).strip()
-            else:
-                author = 'Anônimo'
-                message_text = str(fake_message).strip()
-            
-            process_chat_message(author, message_text)
-            
-            # Aguardar um tempo aleatório entre mensagens (0.5 a 3 segundos)
-            time.sleep(random.uniform(0.5, 3))
-        except Exception as e:
-            logger.error(f"Erro na simulação de chat: {e}")
-            time.sleep(1)
-    
-    logger.info("Simulação de chat encerrada")
-    is_simulator_running = False
+atexit.register(flush_ranking_journal)
+atexit.register(stop_live_chat)  # Fecha a gravação do chat, se houver
+apply_runtime_config()
 
 # Iniciar o quiz automaticamente quando o servidor é iniciado
-def auto_start_quiz():
-    global quiz_running, chat_thread, quiz_thread, current_question_index
+def auto_start_quiz(start_index=0):
+    global quiz_running, quiz_thread, current_question_index
     
     # Verificar se há perguntas 
-    if questions:
+    if question_bank:
         quiz_running = True
-        current_question_index = 0
+        state_tracker.bump('status', 'question')
+        current_question_index = start_index
         
-        # Iniciar thread para monitorar chat
-        chat_thread = threading.Thread(target=monitor_youtube_chat)
-        chat_thread.daemon = True
-        chat_thread.start()
+        # Iniciar a leitura do chat (gravação, simulador ou YouTube, conforme a configuração)
+        start_chat_source()
         
         # Iniciar thread para o loop do quiz
         quiz_thread = threading.Thread(target=quiz_loop)
         quiz_thread.daemon = True
         quiz_thread.start()
         
-        # Iniciar thread para simular mensagens de chat (apenas para testes)
-        sim_thread = threading.Thread(target=simulate_chat_messages)
-        sim_thread.daemon = True
-        sim_thread.start()
-        
         logger.info("Quiz iniciado automaticamente")
 
+# Indica se este processo é um seguidor no modo multi-processo
+def is_follower():
+    return cluster is not None and not cluster.is_leader
+
+# Estado publicado pelo líder para os demais workers
+def build_shared_state():
+    return {
+        'sections': state_tracker.section_versions(),
+        'quiz_running': quiz_running,
+        'current_question_index': current_question_index,
+        'quiz_phase': quiz_phase,
+        'phase_remaining': phase_clock.remaining(),
+        'phase_duration': phase_clock.duration,
+        'last_results': last_results,
+        'votes': current_round.counts(),
+        'chat': chat_history.latest(100),
+        'chat_epoch': chat_history.epoch
+    }
+
+# Publicar o estado sempre que algo mudar (líder)
+def publish_shared_state_loop():
+    version = 0
+    while True:
+        try:
+            version, sections = state_tracker.wait_for_change(version, 5)
+            if sections:
+                cluster.state.publish(build_shared_state())
+        except Exception as e:
+            logger.error(f"Erro ao publicar estado compartilhado: {e}")
+            socketio.sleep(1)
+
+# Versões das seções já aplicadas a partir do líder (seguidores)
+leader_section_versions = {}
+
+# Aplicar o estado publicado pelo líder (seguidores)
+def apply_shared_state(state):
+    global quiz_running, current_question_index, current_question, current_round, quiz_phase, last_results
+    
+    changed = [section for section, version in state['sections'].items()
+               if leader_section_versions.get(section) != version]
+    leader_section_versions.update(state['sections'])
+    
+    # Recarregar do armazenamento apenas o que o líder alterou
+    if 'config' in changed:
+        load_config()
+        apply_runtime_config()
+    if 'questions' in changed:
+        load_questions()
+    if 'ranking' in changed:
+        load_ranking()
+    
+    quiz_running = state['quiz_running']
+    current_question_index = state['current_question_index']
+    current_question = (question_bank[current_question_index]
+                        if 0 <= current_question_index < len(question_bank) else None)
+    quiz_phase = state['quiz_phase']
+    phase_clock.sync(quiz_phase, state.get('phase_remaining', 0), state.get('phase_duration'))
+    last_results = state['last_results']
+    current_round = VoteRound.from_counts(current_question_index, state['votes'])
+    chat_history.load(state['chat'], state.get('chat_epoch'))
+    
+    if changed:
+        state_tracker.bump(*changed)
+
+# Executar comandos encaminhados pelos seguidores (líder)
+def handle_cluster_command(command, params):
+    logger.info(f"Comando do cluster recebido: {command}")
+    if command == 'start_quiz':
+        handle_start_quiz()
+    elif command == 'stop_quiz':
+        handle_stop_quiz()
+    elif command == 'reload_config':
+        old_simulator_setting = params.get('old_simulator_setting', True)
+        load_config()
+        apply_runtime_config()
+        restart_chat_if_simulator_changed(old_simulator_setting, quiz_config.get('enable_chat_simulator', True))
+    elif command == 'reload_questions':
+        load_questions()
+    elif command == 'connect_youtube':
+        load_config()
+        reconnect_youtube_chat(params['url'])
+
+# Assumir o papel de líder: executar o quiz e o chat
+def become_leader(delay=0):
+    # Retomar a partir do último estado publicado pelo líder anterior
+    previous_state = cluster.state.read()
+    load_config()
+    load_questions()
+    load_ranking()
+    
+    cluster.serve_commands(handle_cluster_command)
+    publisher_thread = threading.Thread(target=publish_shared_state_loop)
+    publisher_thread.daemon = True
+    publisher_thread.start()
+    
+    start_index = 0
+    if previous_state and previous_state.get('quiz_running'):
+        start_index = previous_state.get('current_question_index', 0)
+    threading.Timer(delay, auto_start_quiz, kwargs={'start_index': start_index}).start()
+
+# Iniciar o quiz (processo único) ou participar da eleição de líder (cluster)
+def start_server_role(delay=2.0):
+    """Inicia o quiz neste processo ou, no modo cluster, apenas no líder."""
+    if cluster is None:
+        threading.Timer(delay, auto_start_quiz).start()
+        return
+    
+    if cluster.election.try_acquire():
+        become_leader(delay)
+        return
+    
+    logger.info(f"Processo {os.getpid()} atuando como seguidor (somente leitura)")
+    follower_thread = threading.Thread(
+        target=cluster.state.follow,
+        args=(apply_shared_state, lambda: cluster.is_leader)
+    )
+    follower_thread.daemon = True
+    follower_thread.start()
+    # Se o líder cair, este processo pode assumir
+    cluster.election.wait_for_leadership(become_leader)
+
 # Iniciar o quiz automaticamente após 2 segundos (para dar tempo de carregar tudo)
 if __name__ == '__main__':
     # Configurar uma URL de exemplo para testes se não houver uma configurada
@@ -1263,8 +1863,8 @@ if __name__ == '__main__':
         quiz_config['youtube_url'] = 'https://www.youtube.com/watch?v=exemplo'
         logger.info("URL de exemplo configurada para testes")
     
-    # Iniciar o quiz automaticamente após 2 segundos
-    threading.Timer(2.0, auto_start_quiz).start()
+    # Iniciar o quiz automaticamente após 2 segundos (no cluster, apenas no líder)
+    start_server_role(2.0)
     
     # Usar porta definida pelo ambiente ou 5000 como padrão
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,36 @@
+"""Seleção do modo assíncrono do servidor.
+
+O modo é definido pela variável de ambiente ``QUIZ_ASYNC_MODE``:
+
+- ``threading`` (padrão): uma thread do sistema por conexão/tarefa;
+- ``eventlet`` ou ``gevent``: tarefas cooperativas (green threads). O
+  ``monkey_patch`` precisa rodar antes de qualquer outro import para que
+  ``threading``, ``time.sleep`` e os sockets da biblioteca padrão passem a
+  ceder o controle em vez de bloquear o processo.
+"""
+import os
+
+ASYNC_MODES = ('threading', 'eventlet', 'gevent')
+
+
+def get_async_mode():
+    """Retorna o modo assíncrono configurado."""
+    mode = os.environ.get('QUIZ_ASYNC_MODE', 'threading').strip().lower()
+    if mode not in ASYNC_MODES:
+        raise ValueError(f"QUIZ_ASYNC_MODE inválido: {mode} (use {', '.join(ASYNC_MODES)})")
+    return mode
+
+
+def monkey_patch(mode=None):
+    """Aplica o monkey patching do modo escolhido e retorna o nome do modo."""
+    mode = mode or get_async_mode()
+    try:
+        if mode == 'eventlet':
+            import eventlet
+            eventlet.monkey_patch()
+        elif mode == 'gevent':
+            from gevent import monkey
+            monkey.patch_all()
+    except ImportError as e:
+        raise RuntimeError(f"QUIZ_ASYNC_MODE={mode} requer o pacote '{mode}' instalado") from e
+    return mode
@@ -0,0 +1,404 @@
+"""Benchmark de ponta a ponta do quiz com chat sintético.
+
+Gera chat sintético (mensagens por segundo, autores únicos e proporção de
+votos configuráveis) e o envia pelo mesmo caminho do chat real
+(``chat_pipeline.submit_batch``), com o ``quiz_loop`` rodando de verdade e clientes
+Socket.IO e HTTP (long-polling) simulados. Tudo roda offline, em um diretório
+de dados temporário, sem tocar em ``data/``.
+
+Uso:
+
+    python benchmark.py --rate 5000 --authors 50000 --duration 30
+    python benchmark.py --rate 5000 --compare benchmarks/base.json
+
+Relata votos/s ingeridos, percentis de latência do broadcast, tempo de
+``update_ranking`` por pergunta, bytes e CPU do Socket.IO por cliente e
+crescimento de memória. O resultado é salvo em JSON para comparação com
+execuções anteriores. Para medir o ganho da codificação compacta e da
+serialização única por evento, compare com uma execução ``--legacy-encoding``:
+
+    python benchmark.py --legacy-encoding --output benchmarks/legacy.json
+    python benchmark.py --compare benchmarks/legacy.json
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_PREFIX = 'bench#'  # Mensagens comuns carregam um número para medir a latência
+
+# Métricas comparadas com --compare: (nome, True se maior é melhor)
+COMPARED_METRICS = (
+    ('votes_per_second', True),
+    ('messages_per_second', True),
+    ('broadcast_latency_ms.p50', False),
+    ('broadcast_latency_ms.p99', False),
+    ('update_ranking_ms.mean', False),
+    ('http_poll_ms.p99', False),
+    ('socketio.bytes_per_client_per_second', False),
+    ('socketio.cpu_us_per_delivery', False),
+    ('memory_growth_mb', False),
+)
+
+
+class SyntheticChat:
+    """Gerador de mensagens de chat em ritmo constante."""
+
+    def __init__(self, rate, authors, vote_ratio, option_count=4, seed=None):
+        self.rate = rate
+        self.authors = [f"viewer{i}" for i in range(authors)]
+        self.vote_ratio = vote_ratio
+        self.option_count = option_count
+        self.random = random.Random(seed)
+        self.sent = 0
+        self.sent_votes = 0
+        self.submit_times = {}  # número da mensagem comum -> instante do envio
+
+    def next_message(self):
+        self.sent += 1
+        author = self.random.choice(self.authors)
+        if self.random.random() < self.vote_ratio:
+            self.sent_votes += 1
+            return f"m{self.sent}", author, f"!{chr(97 + self.random.randrange(self.option_count))}"
+        self.submit_times[self.sent] = time.perf_counter()
+        return f"m{self.sent}", author, f"{BENCH_PREFIX}{self.sent}"
+
+    def run(self, submit_batch, duration, stop):
+        """Envia ``rate`` mensagens por segundo durante ``duration`` segundos."""
+        started = time.perf_counter()
+        while not stop.is_set():
+            elapsed = time.perf_counter() - started
+            if elapsed >= duration:
+                break
+            # Enviar o atraso acumulado de uma vez (lotes a cada ~5 ms)
+            due = int(elapsed * self.rate) - self.sent
+            if due > 0:
+                submit_batch([self.next_message() for _ in range(due)])
+            time.sleep(0.005)
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    if not samples:
+        return {f"p{p}": None for p in points} | {'count': 0}
+    ordered = sorted(samples)
+    result = {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2) for p in points}
+    result['max'] = round(ordered[-1], 2)
+    result['count'] = len(ordered)
+    return result
+
+
+def rss_mb():
+    """Memória residente atual do processo em MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        # Fora do Linux: usar o pico (ru_maxrss em KB no Linux, bytes no macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def prepare_data_dir(source_dir):
+    """Copia perguntas e configurações para um diretório temporário."""
+    work_dir = tempfile.mkdtemp(prefix='quiz-bench-')
+    os.makedirs(os.path.join(work_dir, 'data'))
+    for name in ('questions.json', 'config.json'):
+        path = os.path.join(source_dir, name)
+        if os.path.exists(path):
+            shutil.copy(path, os.path.join(work_dir, 'data', name))
+    return work_dir
+
+
+def socketio_client_loop(client, chat, latencies, stop):
+    """Coleta os eventos de um cliente Socket.IO de teste e mede a latência do chat."""
+    while not stop.is_set():
+        received_at = time.perf_counter()
+        for event in client.get_received():
+            if event['name'] != 'chat_batch':
+                continue
+            payload = event['args'][0]
+            # Formato curto: {'m': [[id, autor, mensagem, timestamp], ...]}
+            messages = payload['m'] if 'm' in payload else payload['messages']
+            for message in messages:
+                text = (message[2] if isinstance(message, list) else message.get('message')) or ''
+                if text.startswith(BENCH_PREFIX):
+                    sent_at = chat.submit_times.get(int(text[len(BENCH_PREFIX):]))
+                    if sent_at is not None:
+                        latencies.append((received_at - sent_at) * 1000)
+        time.sleep(0.005)
+
+
+class SocketIOStats:
+    """Bytes e CPU gastos pelo servidor para entregar eventos Socket.IO."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deliveries = 0
+        self.bytes = 0
+        self.emit_cpu = 0.0  # CPU dentro de socketio.emit (thread_time)
+        self.delivery_cpu = 0.0  # Parte gasta pelo cliente de teste ao receber
+
+    def summary(self, clients, elapsed):
+        server_cpu = max(0.0, self.emit_cpu - self.delivery_cpu)
+        return {
+            'deliveries': self.deliveries,
+            'bytes': self.bytes,
+            'bytes_per_client_per_second': round(self.bytes / max(clients, 1) / elapsed, 1),
+            'cpu_us_per_delivery': round(server_cpu * 1e6 / self.deliveries, 2) if self.deliveries else None
+        }
+
+
+class _Encoded:
+    __slots__ = ('encoded',)
+
+    def __init__(self, encoded):
+        self.encoded = encoded
+
+    def encode(self):
+        return self.encoded
+
+
+def measure_socketio(socketio):
+    """Instrumenta emit e o envio de pacotes (depois de criar os clientes de teste)."""
+    stats = SocketIOStats()
+    server = socketio.server
+    deliver = server._send_packet  # Entrega do cliente de teste
+    emit = socketio.emit
+
+    def counting_send_packet(eio_sid, pkt):
+        encoded = pkt.encode()
+        size = sum(len(part) for part in encoded) if isinstance(encoded, list) else len(encoded.encode('utf-8'))
+        started = time.thread_time()
+        deliver(eio_sid, _Encoded(encoded))
+        spent = time.thread_time() - started
+        with stats.lock:
+            stats.deliveries += 1
+            stats.bytes += size
+            stats.delivery_cpu += spent
+
+    def timed_emit(*a, **kw):
+        started = time.thread_time()
+        try:
+            return emit(*a, **kw)
+        finally:
+            spent = time.thread_time() - started
+            with stats.lock:
+                stats.emit_cpu += spent
+
+    server._send_packet = counting_send_packet
+    socketio.emit = timed_emit
+    return stats
+
+
+def http_client_loop(client, durations, stop):
+    """Cliente de fallback HTTP fazendo long-polling em /api/quiz/state-http."""
+    version = 0
+    chat_after = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.get(f'/api/quiz/state-http?since={version}&chat_after={chat_after}&timeout=1')
+        durations.append((time.perf_counter() - started) * 1000)
+        data = response.get_json() or {}
+        version = data.get('version', version)
+        for message in (data.get('changes') or {}).get('chat') or []:
+            chat_after = max(chat_after, message.get('id') or 0)
+
+
+def run_benchmark(args):
+    source_dir = os.path.abspath(args.data_dir)
+    work_dir = prepare_data_dir(source_dir)
+    previous_cwd = os.getcwd()
+    os.chdir(work_dir)
+    os.environ.pop('QUIZ_CLUSTER', None)
+    os.environ['QUIZ_STORAGE'] = 'json'
+    if args.legacy_encoding:
+        # Payloads com chaves completas e serialização por cliente (comportamento anterior)
+        os.environ['QUIZ_COMPACT_EVENTS'] = '0'
+        os.environ['QUIZ_SOCKETIO_ENCODE_ONCE'] = '0'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        import app as quiz_app
+        logging.getLogger().setLevel(getattr(logging, args.log_level))
+        for name in ('socketio', 'engineio', 'werkzeug'):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+        if not quiz_app.question_bank:
+            quiz_app.set_questions([{
+                'question': f'Pergunta {i}', 'options': ['A', 'B', 'C', 'D'], 'correct': i % 4
+            } for i in range(20)])
+        quiz_app.quiz_config.update({
+            'answer_time': args.question_seconds,
+            'vote_count_time': 0.5,
+            'result_display_time': 0.5
+        })
+        quiz_app.apply_runtime_config()
+
+        # Medir update_ranking e votos registrados sem alterar o app
+        ranking_times = []
+        votes_ingested = [0]
+        original_update_ranking = quiz_app.update_ranking
+        original_handle = quiz_app.handle_chat_message
+
+        def timed_update_ranking(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return original_update_ranking(*a, **kw)
+            finally:
+                ranking_times.append((time.perf_counter() - started) * 1000)
+
+        def counting_handle(author, message, vote_index):
+            if vote_index is not None:
+                votes_ingested[0] += 1
+            return original_handle(author, message, vote_index)
+
+        quiz_app.update_ranking = timed_update_ranking
+        quiz_app.handle_chat_message = counting_handle
+
+        stop = threading.Event()
+        chat = SyntheticChat(args.rate, args.authors, args.vote_ratio, seed=args.seed)
+        latencies = []
+        poll_durations = []
+        threads = []
+
+        for _ in range(args.socketio_clients):
+            client = quiz_app.socketio.test_client(quiz_app.app)
+            threads.append(threading.Thread(target=socketio_client_loop, args=(client, chat, latencies, stop)))
+        for _ in range(args.http_clients):
+            threads.append(threading.Thread(target=http_client_loop,
+                                            args=(quiz_app.app.test_client(), poll_durations, stop)))
+
+        socketio_stats = measure_socketio(quiz_app.socketio)
+
+        memory_start = rss_mb()
+        quiz_app.quiz_running = True
+        quiz_thread = threading.Thread(target=quiz_app.quiz_loop)
+        threads.append(quiz_thread)
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        started = time.perf_counter()
+        chat.run(quiz_app.chat_pipeline.submit_batch, args.duration, stop)
+        # Dar tempo para a fila esvaziar antes de medir
+        drain_deadline = time.perf_counter() + 5
+        while quiz_app.chat_pipeline.stats()['depth'] and time.perf_counter() < drain_deadline:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        quiz_app.quiz_running = False
+        memory_end = rss_mb()
+
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'params': {
+                'rate': args.rate,
+                'authors': args.authors,
+                'vote_ratio': args.vote_ratio,
+                'duration': args.duration,
+                'socketio_clients': args.socketio_clients,
+                'http_clients': args.http_clients,
+                'question_seconds': args.question_seconds,
+                'storage': quiz_app.storage.name,
+                'legacy_encoding': args.legacy_encoding
+            },
+            'messages_sent': chat.sent,
+            'votes_sent': chat.sent_votes,
+            'votes_ingested': votes_ingested[0],
+            'messages_per_second': round(quiz_app.chat_pipeline.stats()['processed'] / elapsed, 1),
+            'votes_per_second': round(votes_ingested[0] / elapsed, 1),
+            'broadcast_latency_ms': percentiles(latencies),
+            'update_ranking_ms': {
+                'mean': round(sum(ranking_times) / len(ranking_times), 2) if ranking_times else None,
+                **percentiles(ranking_times, (50, 99))
+            },
+            'http_poll_ms': percentiles(poll_durations),
+            'socketio': socketio_stats.summary(args.socketio_clients, elapsed),
+            'pipeline': quiz_app.chat_pipeline.stats(),
+            'memory_start_mb': round(memory_start, 1),
+            'memory_end_mb': round(memory_end, 1),
+            'memory_growth_mb': round(memory_end - memory_start, 1)
+        }
+    finally:
+        # O app usa caminhos relativos: não deixar o atexit gravar o ranking em data/ do projeto
+        if 'app' in sys.modules:
+            atexit.unregister(sys.modules['app'].flush_ranking_journal)
+        os.chdir(previous_cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def metric(result, path):
+    value = result
+    for key in path.split('.'):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(result, baseline, tolerance):
+    """Compara com um resultado anterior; retorna a lista de regressões."""
+    regressions = []
+    print(f"\nComparação com {baseline.get('timestamp', 'baseline')} (tolerância {tolerance:.0%}):")
+    if baseline.get('params') != result.get('params'):
+        print("  Aviso: parâmetros diferentes da execução anterior; a comparação pode não ser válida")
+    for path, higher_is_better in COMPARED_METRICS:
+        current, previous = metric(result, path), metric(baseline, path)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / abs(previous)
+        worse = -change if higher_is_better else change
+        flag = 'REGRESSÃO' if worse > tolerance else 'ok'
+        print(f"  {path:28} {previous:>10} -> {current:>10} ({change:+.1%}) {flag}")
+        if worse > tolerance:
+            regressions.append(path)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de ponta a ponta do quiz com chat sintético')
+    parser.add_argument('--rate', type=int, default=2000, help='Mensagens de chat por segundo')
+    parser.add_argument('--authors', type=int, default=50000, help='Autores únicos no chat')
+    parser.add_argument('--vote-ratio', type=float, default=0.3, help='Fração das mensagens que são votos')
+    parser.add_argument('--duration', type=float, default=20, help='Duração do envio em segundos')
+    parser.add_argument('--socketio-clients', type=int, default=20)
+    parser.add_argument('--http-clients', type=int, default=20)
+    parser.add_argument('--legacy-encoding', action='store_true',
+                        help='Payloads completos e serialização por cliente, para comparação')
+    parser.add_argument('--question-seconds', type=float, default=3, help='Tempo de resposta de cada pergunta')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default='data', help='De onde copiar perguntas e configurações')
+    parser.add_argument('--output', default=None, help='Arquivo de saída (padrão: benchmarks/<data>.json)')
+    parser.add_argument('--compare', default=None, help='Resultado anterior para detectar regressões')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Piora relativa aceita na comparação')
+    parser.add_argument('--log-level', default='WARNING', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'))
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output or os.path.join(
+        'benchmarks', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'))
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    result = run_benchmark(args)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em {output}")
+
+    if baseline is not None and compare(result, baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
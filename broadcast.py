@@ -0,0 +1,151 @@
+"""Agregação de votos e mensagens do chat para broadcast em lotes.
+
+Em vez de emitir um evento Socket.IO para cada voto e cada linha do chat,
+os eventos são acumulados e enviados de uma só vez a cada tick. O custo do
+broadcast passa a depender da taxa de ticks e não do volume do chat.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OPTION_LETTERS = ('A', 'B', 'C', 'D')
+
+
+class BroadcastAggregator:
+    """Acumula votos e mensagens e emite um único lote por tick."""
+
+    def __init__(self, socketio, vote_totals, interval=0.2, max_chat_batch=200, on_flush=None,
+                 room_for=None, namespace=None, autostart=True, chat_epoch=None):
+        self.socketio = socketio
+        self.vote_totals = vote_totals  # Função que retorna a contagem total atual
+        self.on_flush = on_flush  # Chamada com as seções alteradas ('votes', 'chat') a cada lote
+        self.chat_epoch = chat_epoch  # Função que retorna a epoch do histórico que numera as mensagens
+        # Destino dos lotes: room_for(evento) -> sala e o namespace (None = padrão do socketio)
+        self.room_for = room_for
+        self.namespace = namespace
+        # Sem autostart quem chama flush() é o dono do agregador (ex.: o agendador de sessões)
+        self.autostart = autostart
+        self.interval = interval
+        self.max_chat_batch = max_chat_batch
+        self._lock = threading.Lock()
+        self._vote_delta = [0] * len(OPTION_LETTERS)
+        self._votes_dirty = False
+        self._chat_batch = []
+        self._thread = None
+        self._running = False
+
+    def set_interval(self, interval_ms):
+        """Atualiza o intervalo entre ticks (em milissegundos)."""
+        try:
+            interval_ms = float(interval_ms)
+        except (TypeError, ValueError):
+            return
+        # Limitar entre 50 ms e 2 s para não inundar nem atrasar demais
+        self.interval = min(max(interval_ms, 50), 2000) / 1000.0
+
+    def add_vote(self, option_index):
+        """Registra um voto para ser incluído no próximo lote."""
+        with self._lock:
+            self._vote_delta[option_index] += 1
+            self._votes_dirty = True
+        self._ensure_started()
+
+    def add_chat(self, author, message, timestamp=None, message_id=None):
+        """Adiciona uma mensagem do chat ao próximo lote."""
+        with self._lock:
+            self._chat_batch.append({
+                'id': message_id,
+                'author': author,
+                'message': message,
+                'timestamp': timestamp
+            })
+            # Se o chat estiver muito rápido, manter apenas as mais recentes
+            if len(self._chat_batch) > self.max_chat_batch:
+                del self._chat_batch[:len(self._chat_batch) - self.max_chat_batch]
+        self._ensure_started()
+
+    def reset_votes(self):
+        """Descarta o delta pendente (usado ao trocar de pergunta)."""
+        with self._lock:
+            self._vote_delta = [0] * len(OPTION_LETTERS)
+            self._votes_dirty = False
+
+    def flush(self):
+        """Emite o lote acumulado, se houver algo pendente."""
+        with self._lock:
+            votes_dirty = self._votes_dirty
+            vote_delta = self._vote_delta
+            chat_batch = self._chat_batch
+            if votes_dirty:
+                self._vote_delta = [0] * len(OPTION_LETTERS)
+                self._votes_dirty = False
+            if chat_batch:
+                self._chat_batch = []
+
+        # Emitir fora do lock para não bloquear quem está produzindo eventos
+        if votes_dirty:
+            totals = self.vote_totals()
+            self._emit('update_votes', {
+                'votes': totals,
+                'delta': {
+                    letter: vote_delta[i]
+                    for i, letter in enumerate(OPTION_LETTERS) if vote_delta[i]
+                }
+            })
+        if chat_batch:
+            payload = {'messages': chat_batch}
+            if self.chat_epoch is not None:
+                payload['epoch'] = self.chat_epoch()
+            self._emit('chat_batch', payload)
+        if self.on_flush and (votes_dirty or chat_batch):
+            sections = []
+            if votes_dirty:
+                sections.append('votes')
+            if chat_batch:
+                sections.append('chat')
+            self.on_flush(sections)
+
+    def _emit(self, event, data):
+        if self.room_for is None and self.namespace is None:
+            self.socketio.emit(event, data)
+        else:
+            room = self.room_for(event) if self.room_for is not None else None
+            self.socketio.emit(event, data, to=room, namespace=self.namespace)
+
+    def start(self):
+        """Inicia a tarefa que emite os lotes periodicamente."""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        # Com eventlet/gevent o threading é substituído por green threads (monkey patching)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Para a tarefa de broadcast e emite o que estiver pendente."""
+        self._running = False
+        self.flush()
+
+    def _ensure_started(self):
+        if self.autostart and not self._running:
+            self.start()
+
+    def _run(self):
+        logger.info(f"Broadcast em lotes iniciado (intervalo {self.interval * 1000:.0f} ms)")
+        next_tick = time.monotonic()
+        while self._running:
+            next_tick += self.interval
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao emitir lote de eventos: {e}")
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self.socketio.sleep(delay)
+            else:
+                # Tick atrasado: recomeçar a contagem a partir de agora
+                next_tick = time.monotonic()
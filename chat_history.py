@@ -0,0 +1,137 @@
+"""Histórico do chat em buffer circular de capacidade fixa.
+
+Cada mensagem recebe um id sequencial crescente e ocupa a posição
+``id % capacidade`` do buffer, então inserir não copia nenhuma lista e
+``since(id)`` encontra o ponto de partida em O(1). Ao contrário do timestamp
+(float, que pode repetir), o id identifica cada mensagem de forma única, e o
+cliente não perde nem duplica mensagens com o mesmo horário.
+
+Os ids recomeçam em 1 a cada novo histórico (servidor reiniciado, sessão
+recarregada), então cada histórico tem uma ``epoch`` aleatória. O cliente a
+envia junto com o último id recebido; se ela não for a atual, o id é de outro
+histórico e ``since`` devolve o buffer inteiro. A reinicialização nunca é
+deduzida da ordem dos ids.
+"""
+import bisect
+import threading
+import time
+import uuid
+
+DEFAULT_CAPACITY = 100
+
+
+class ChatHistory:
+    """Últimas ``capacity`` mensagens do chat, indexadas por id sequencial."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._lock = threading.Lock()
+        self._capacity = max(1, int(capacity))
+        self._slots = [None] * self._capacity
+        self._next_id = 1  # Id da próxima mensagem
+        self._count = 0  # Mensagens válidas no buffer
+        self.epoch = uuid.uuid4().hex[:12]  # Identifica este histórico (os ids recomeçam em outro)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def last_id(self):
+        """Id da mensagem mais recente (0 se ainda não houve mensagens)."""
+        return self._next_id - 1
+
+    def __len__(self):
+        return self._count
+
+    def append(self, author, message, timestamp=None):
+        """Adiciona uma mensagem e retorna o registro com ``id`` e ``timestamp``."""
+        with self._lock:
+            record = {
+                'id': self._next_id,
+                'author': author,
+                'message': message,
+                'timestamp': time.time() if timestamp is None else timestamp
+            }
+            self._slots[self._next_id % self._capacity] = record
+            self._next_id += 1
+            if self._count < self._capacity:
+                self._count += 1
+            return record
+
+    def since(self, after_id, limit=None, epoch=None):
+        """Mensagens com id maior que ``after_id``, da mais antiga para a mais nova.
+
+        Se ``after_id`` já saiu do buffer, retorna tudo o que ainda está nele.
+        Com ``epoch`` diferente da atual o id é de outro histórico e também
+        vem o buffer inteiro.
+        """
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                after_id = 0
+            first_id = max(after_id + 1, self._next_id - self._count)
+            if limit is not None:
+                first_id = max(first_id, self._next_id - limit)
+            return [self._slots[i % self._capacity] for i in range(first_id, self._next_id)]
+
+    def since_timestamp(self, timestamp):
+        """Mensagens posteriores a ``timestamp`` (clientes antigos), por busca binária."""
+        with self._lock:
+            oldest_id = self._next_id - self._count
+            ids = range(oldest_id, self._next_id)
+            # Ids são crescentes e os timestamps acompanham a ordem de chegada
+            timestamps = _SlotTimestamps(self._slots, self._capacity, oldest_id)
+            start = bisect.bisect_right(timestamps, timestamp, 0, len(ids))
+            return [self._slots[i % self._capacity] for i in ids[start:]]
+
+    def latest(self, n=None):
+        """As ``n`` mensagens mais recentes (todas se ``n`` for None)."""
+        return self.since(0, limit=n)
+
+    def resize(self, capacity):
+        """Altera a capacidade mantendo as mensagens mais recentes que couberem."""
+        capacity = max(1, int(capacity))
+        with self._lock:
+            if capacity == self._capacity:
+                return
+            keep = min(self._count, capacity)
+            records = [self._slots[i % self._capacity] for i in range(self._next_id - keep, self._next_id)]
+            self._capacity = capacity
+            self._slots = [None] * capacity
+            for record in records:
+                self._slots[record['id'] % capacity] = record
+            self._count = keep
+
+    def load(self, records, epoch=None):
+        """Substitui o conteúdo por registros já numerados (ex.: réplica do líder).
+
+        ``epoch`` é a do histórico de origem, para que os ids continuem válidos.
+        """
+        records = list(records)[-self._capacity:]
+        # Manter apenas a sequência contínua de ids mais recente
+        start = len(records) - 1
+        while start > 0 and records[start - 1]['id'] == records[start]['id'] - 1:
+            start -= 1
+        records = records[max(start, 0):]
+        with self._lock:
+            self._slots = [None] * self._capacity
+            for record in records:
+                self._slots[record['id'] % self._capacity] = record
+            self._count = len(records)
+            if records:
+                self._next_id = records[-1]['id'] + 1
+            if epoch is not None:
+                self.epoch = epoch
+
+
+class _SlotTimestamps:
+    """Visão indexável dos timestamps do buffer, para uso com ``bisect``."""
+
+    __slots__ = ('slots', 'capacity', 'oldest_id')
+
+    def __init__(self, slots, capacity, oldest_id):
+        self.slots = slots
+        self.capacity = capacity
+        self.oldest_id = oldest_id
+
+    def __getitem__(self, index):
+        return self.slots[(self.oldest_id + index) % self.capacity]['timestamp']
@@ -0,0 +1,233 @@
+"""Gravação e reprodução de chats ao vivo.
+
+Formato da gravação (``.jsonl.gz``): a primeira linha é um cabeçalho
+``{"format": "chat-recording/1", "source": ..., "started": epoch}`` e cada
+linha seguinte é a lista compacta ``[offset, autor, texto, id]``, com o
+offset em segundos desde o início da gravação.
+
+Na reprodução as mensagens entram pelo mesmo caminho do chat real, a 1x, 10x
+ou o mais rápido possível (``speed=None``). O ``ReplayClock`` é o relógio da
+gravação: injetado no ``PhaseClock`` do quiz, faz as fases (pergunta,
+contagem e resultados) andarem na mesma escala das mensagens. No modo mais
+rápido possível o relógio só avança conforme as mensagens são entregues. O
+tempo restante mostrado aos clientes também fica no tempo da gravação.
+
+Uso:
+
+    python chat_replay.py record https://www.youtube.com/watch?v=... --output live.jsonl.gz
+    python chat_replay.py info live.jsonl.gz
+    QUIZ_CHAT_REPLAY=live.jsonl.gz QUIZ_REPLAY_SPEED=10 python app.py
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RECORDING_FORMAT = 'chat-recording/1'
+
+
+def parse_speed(value):
+    """Converte '1', '10', '0.5' ou 'max' na velocidade (None = o mais rápido possível)."""
+    if value is None or str(value).strip().lower() in ('max', 'fast', '0', ''):
+        return None
+    speed = float(value)
+    if speed <= 0:
+        return None
+    return speed
+
+
+class ChatRecorder:
+    """Grava mensagens do chat no formato compacto de reprodução."""
+
+    def __init__(self, path, source=None):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._started = time.monotonic()
+        self.count = 0
+        self._write({'format': RECORDING_FORMAT, 'source': source, 'started': time.time()})
+
+    def _write(self, obj):
+        self._file.write(json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def record(self, author, text, message_id=None):
+        offset = round(time.monotonic() - self._started, 3)
+        with self._lock:
+            if self._file is None:
+                return
+            self._write([offset, author, text, message_id])
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_recording(path):
+    """Retorna (cabeçalho, gerador de (offset, autor, texto, id))."""
+    f = gzip.open(path, 'rt', encoding='utf-8')
+    header = json.loads(f.readline() or '{}')
+    if header.get('format') != RECORDING_FORMAT:
+        f.close()
+        raise ValueError(f"{path} não é uma gravação de chat ({RECORDING_FORMAT})")
+
+    def entries():
+        with f:
+            for line in f:
+                if line.strip():
+                    offset, author, text, message_id = json.loads(line)
+                    yield offset, author, text, message_id
+
+    return header, entries()
+
+
+class ReplayClock:
+    """Relógio no tempo da gravação, para o ``PhaseClock`` do quiz.
+
+    Com ``speed`` o tempo da gravação corre ``speed`` vezes mais rápido que o
+    real; com ``speed=None`` ele acompanha a última mensagem entregue. Ao fim
+    da reprodução volta a correr em tempo real a partir do último offset.
+    """
+
+    def __init__(self, speed=1.0, sleep=time.sleep, poll_interval=0.005):
+        self.speed = speed
+        self._sleep = sleep
+        self.poll_interval = poll_interval
+        self._base_offset = 0.0
+        self._base_real = time.monotonic()
+        self._offset = 0.0  # Último offset entregue (modo mais rápido possível)
+        self._finished = False
+
+    def start(self):
+        self._base_offset = self.now()
+        self._base_real = time.monotonic()
+
+    def advance(self, offset):
+        if offset > self._offset:
+            self._offset = offset
+
+    def finish(self):
+        self._base_offset = self.now()
+        self._base_real = time.monotonic()
+        self._finished = True
+
+    def now(self):
+        if self.speed is None and not self._finished:
+            return self._offset
+        speed = 1.0 if self.speed is None else self.speed
+        return self._base_offset + (time.monotonic() - self._base_real) * speed
+
+    def sleep(self, seconds):
+        """Dorme ``seconds`` do tempo da gravação."""
+        if self.speed is None and not self._finished:
+            self._sleep(self.poll_interval)
+        else:
+            speed = 1.0 if self.speed is None else self.speed
+            self._sleep(max(0.0, seconds) / speed)
+
+
+class ChatReplayer:
+    """Entrega as mensagens de uma gravação na velocidade escolhida."""
+
+    def __init__(self, path, submit, clock=None, sleep=time.sleep, before_deliver=None):
+        self.path = path
+        self.submit = submit  # submit(author, text, message_id)
+        # before_deliver(offset): no modo mais rápido possível, segura a mensagem até o
+        # quiz alcançar o offset (ex.: esperar a próxima fase começar)
+        self.before_deliver = before_deliver
+        self.clock = clock or ReplayClock(sleep=sleep)
+        self._sleep = sleep
+        self.delivered = 0
+
+    def run(self, should_continue=lambda: True):
+        """Reproduz a gravação inteira (ou até ``should_continue()`` retornar False)."""
+        header, entries = read_recording(self.path)
+        speed = self.clock.speed
+        logger.info(f"Reproduzindo chat gravado de {header.get('source') or self.path} "
+                    f"({'máxima' if speed is None else f'{speed:g}x'})")
+        self.clock.start()
+        started_real = time.monotonic()
+        first_offset = None
+        try:
+            for offset, author, text, message_id in entries:
+                if not should_continue():
+                    break
+                if first_offset is None:
+                    first_offset = offset
+                if speed is not None:
+                    # Prazo absoluto de cada mensagem: atrasos não se acumulam
+                    delay = started_real + (offset - first_offset) / speed - time.monotonic()
+                    if delay > 0:
+                        self._sleep(delay)
+                self.clock.advance(offset)
+                if speed is None and self.before_deliver is not None:
+                    self.before_deliver(offset)
+                self.submit(author, text, message_id)
+                self.delivered += 1
+        finally:
+            self.clock.finish()
+        logger.info(f"Reprodução encerrada: {self.delivered} mensagens em {time.monotonic() - started_real:.1f}s")
+        return self.delivered
+
+
+def record_live_chat(url, output, duration=None, max_messages=None):
+    """Grava o chat ao vivo de uma URL com o ChatDownloader."""
+    from chat_downloader import ChatDownloader
+
+    chat = ChatDownloader().get_chat(url, timeout=duration, max_messages=max_messages)
+    with ChatRecorder(output, source=url) as recorder:
+        for message in chat:
+            recorder.record(
+                message.get('author', {}).get('name', 'Anônimo'),
+                message.get('message', ''),
+                message.get('message_id')
+            )
+    return recorder.count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gravação e reprodução do chat ao vivo')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record = subparsers.add_parser('record', help='Grava o chat ao vivo de uma URL do YouTube')
+    record.add_argument('url')
+    record.add_argument('--output', required=True)
+    record.add_argument('--duration', type=float, default=None, help='Segundos de gravação')
+    record.add_argument('--max-messages', type=int, default=None)
+    info = subparsers.add_parser('info', help='Resumo de uma gravação')
+    info.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        count = record_live_chat(args.url, args.output, args.duration, args.max_messages)
+        print(f"{count} mensagens gravadas em {args.output}")
+    elif args.command == 'info':
+        header, entries = read_recording(args.path)
+        count = 0
+        authors = set()
+        last_offset = 0.0
+        for offset, author, _, _ in entries:
+            count += 1
+            authors.add(author)
+            last_offset = offset
+        print(f"Fonte: {header.get('source')}")
+        print(f"Mensagens: {count} de {len(authors)} autores em {last_offset:.1f}s "
+              f"({count / last_offset if last_offset else 0:.1f} msg/s)")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,524 @@
+"""Fontes de chat com interface única.
+
+Toda fonte (``ChatSource``) entrega lotes de mensagens já normalizadas: listas
+de tuplas ``(message_id, autor, texto)``. O leitor (``ChatSupervisor``) só
+conhece essa interface, e a ingestão consome os lotes por um único caminho
+(``ChatPipeline.submit_batch``), sem dicionários por mensagem.
+
+Fontes disponíveis, escolhidas pelo link do chat em ``open_chat_source``:
+
+- ``YouTubeChatSource``: chat ao vivo pelo chat-downloader (qualquer outro link);
+- ``SimulatedChatSource``: chat sintético determinístico (``simulator://``),
+  no ritmo de uma live pequena ou a uma taxa fixa de até 100 mil mensagens/s;
+- ``ReplayChatSource``: reprodução de uma gravação (``replay:arquivo.jsonl.gz``);
+- ``SocketChatSource``: feed NDJSON local por TCP (``tcp://host:porta``).
+
+Uma fonte ``live`` que termina (queda da conexão, fim da transmissão) é
+reconectada pelo supervisor; as demais (reprodução) terminam de vez. Lotes
+vazios são permitidos: eles apenas devolvem o controle ao leitor, que assim
+percebe um cancelamento mesmo sem mensagens chegando.
+
+Ferramentas de teste::
+
+    python chat_sources.py fake-server --port 9999 --rate 50 --drop-every 200
+    python chat_sources.py bench --rate 100000 --seconds 5
+    python chat_sources.py watch tcp://127.0.0.1:9999
+"""
+import argparse
+import json
+import logging
+import queue
+import random
+import socket
+import socketserver
+import threading
+import time
+from itertools import accumulate, repeat
+from urllib.parse import parse_qsl, urlsplit
+
+from chat_replay import ReplayClock, read_recording
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500  # Mensagens por lote nas fontes sem ritmo próprio
+POLL_INTERVAL = 1.0  # Espera máxima (s) entre lotes, mesmo vazios
+SIMULATOR_URL = 'simulator://'
+
+# Conteúdo do simulador no ritmo de uma live pequena
+SIMULATOR_USERNAMES = ("João123", "MariaGamer", "PedroYT", "Ana_Live", "Carlos_Fan",
+                       "Lucia_Games", "Roberto_TV", "Patricia_Stream", "FelipeZ", "JuliaQuiz")
+SIMULATOR_MESSAGES = ("Olá pessoal!", "Esse quiz é muito legal!", "Adoro participar!",
+                      "Qual é a próxima pergunta?", "Estou ganhando!", "Difícil essa!",
+                      "Vamos lá!", "Quase acertei!", "Essa eu sei!", "Quem está ganhando?")
+SIMULATOR_COMMANDS = ("!a", "!b", "!c", "!d", "!A", "!B", "!C", "!D")
+
+
+class ChatSource:
+    """Interface das fontes de chat."""
+
+    kind = 'source'
+    live = True  # Reconectar quando a fonte terminar
+    lossless = False  # A ingestão deve esperar por espaço na fila em vez de descartar
+
+    def __init__(self):
+        self.closed = False
+
+    def batches(self, last_message_id=None):
+        """Gera lotes ``[(message_id, autor, texto), ...]``.
+
+        ``last_message_id`` é o id da última mensagem entregue antes de uma
+        reconexão; fontes que sabem retomar continuam a partir dele.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Encerra a fonte; pode ser chamado de outra thread."""
+        self.closed = True
+
+
+class YouTubeChatSource(ChatSource):
+    """Chat ao vivo do YouTube pelo chat-downloader.
+
+    O gerador do chat-downloader bloqueia até a próxima mensagem, então ele é
+    lido por uma thread auxiliar que normaliza as mensagens em uma fila; os
+    lotes são o que tiver chegado junto. O YouTube não retoma a partir de um
+    id: as mensagens repetidas após reconectar são descartadas pelo supervisor.
+
+    Os ``timeout``/``inactivity_timeout`` do chat-downloader não são usados:
+    eles disparam ``_thread.interrupt_main`` e derrubariam o processo. A
+    inatividade é medida aqui, na espera pela fila. A thread auxiliar de uma
+    fonte fechada não pode ser interrompida: ela sai na próxima mensagem (ou
+    no fim do chat) e, enquanto isso, é contada em ``orphaned_pumps()``.
+    """
+
+    kind = 'youtube'
+
+    def __init__(self, url, inactivity_timeout=120.0, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__()
+        self.url = url
+        self.inactivity_timeout = inactivity_timeout
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._error = None
+        self._pump_thread = None
+
+    def batches(self, last_message_id=None):
+        from chat_downloader import ChatDownloader
+
+        # Uma tentativa por conexão: as novas tentativas, com espera, ficam com o supervisor
+        chat = ChatDownloader().get_chat(self.url, max_attempts=1)
+        reader = threading.Thread(target=self._pump, args=(chat,), name='youtube-chat-pump')
+        reader.daemon = True
+        self._pump_thread = reader
+        reader.start()
+        last_data = time.monotonic()
+        finished = False
+        while not finished and not self.closed:
+            try:
+                item = self._queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if self.inactivity_timeout and time.monotonic() - last_data >= self.inactivity_timeout:
+                    raise TimeoutError(f'nenhuma mensagem em {self.inactivity_timeout:g}s')
+                yield []
+                continue
+            last_data = time.monotonic()
+            batch = []
+            try:
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+                else:
+                    finished = True
+            except queue.Empty:
+                pass
+            if batch:
+                yield batch
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        super().close()
+        pump = self._pump_thread
+        if pump is not None and pump.is_alive():
+            with _orphaned_lock:
+                _orphaned_pumps.append(pump)
+
+    def _pump(self, chat):
+        try:
+            for message in chat:
+                if self.closed:
+                    break
+                author = message.get('author')
+                self._queue.put((message.get('message_id'),
+                                 author.get('name', 'Anônimo') if author else 'Anônimo',
+                                 message.get('message') or ''))
+        except Exception as e:
+            self._error = e
+        finally:
+            self._queue.put(None)  # Fim do chat
+
+
+# Threads auxiliares de fontes fechadas ainda bloqueadas no chat-downloader
+_orphaned_pumps = []
+_orphaned_lock = threading.Lock()
+
+
+def orphaned_pumps():
+    """Quantas threads de fontes do YouTube fechadas ainda estão bloqueadas."""
+    with _orphaned_lock:
+        _orphaned_pumps[:] = [thread for thread in _orphaned_pumps if thread.is_alive()]
+        return len(_orphaned_pumps)
+
+
+class SocketChatSource(ChatSource):
+    """Feed NDJSON de chat por TCP (``tcp://host:porta``).
+
+    Ao conectar envia ``{"after": <último id>}``; cada linha recebida é um
+    objeto com ``id``, ``author`` e ``message``. Sem mensagens por
+    ``inactivity_timeout`` segundos a leitura falha (e o supervisor reconecta).
+    """
+
+    kind = 'socket'
+
+    def __init__(self, url, inactivity_timeout=30.0):
+        super().__init__()
+        parts = urlsplit(url)
+        self.address = (parts.hostname or '127.0.0.1', parts.port or 9999)
+        self.inactivity_timeout = inactivity_timeout
+        self._sock = None
+
+    def batches(self, last_message_id=None):
+        sock = socket.create_connection(self.address, timeout=self.inactivity_timeout)
+        self._sock = sock
+        try:
+            sock.sendall(json.dumps({'after': last_message_id}).encode('utf-8') + b'\n')
+            sock.settimeout(min(POLL_INTERVAL, self.inactivity_timeout))
+            pending = b''
+            last_data = time.monotonic()
+            while not self.closed:
+                try:
+                    data = sock.recv(65536)
+                except socket.timeout:
+                    if time.monotonic() - last_data >= self.inactivity_timeout:
+                        raise TimeoutError(f'nenhuma mensagem em {self.inactivity_timeout:g}s')
+                    yield []
+                    continue
+                if not data:
+                    return  # Conexão encerrada pelo servidor
+                last_data = time.monotonic()
+                lines = (pending + data).split(b'\n')
+                pending = lines.pop()
+                batch = []
+                for line in lines:
+                    if line.strip():
+                        item = json.loads(line)
+                        batch.append((item.get('id'), item.get('author') or 'Anônimo', item.get('message') or ''))
+                if batch:
+                    yield batch
+        finally:
+            sock.close()
+
+    def close(self):
+        super().close()
+        sock = self._sock
+        if sock is not None:
+            # Desbloqueia o leitor na hora
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class SimulatedChatSource(ChatSource):
+    """Chat sintético determinístico (mesma semente, mesmas mensagens).
+
+    Sem ``rate`` imita uma live pequena (uma mensagem a cada 0,5-3s, metade
+    votos). Com ``rate`` gera essa quantidade de mensagens por segundo, em
+    lotes, com ``authors`` autores distintos e ``vote_ratio`` de votos: os
+    lotes são montados com ``random.choices`` e ``zip``, sem laço por mensagem
+    em Python, o que passa de 100 mil mensagens/s.
+
+    ``poll(now)`` retorna as mensagens devidas até ``now`` sem dormir (usado
+    pelo tick das sessões); ``batches()`` dorme até o próximo lote. Com
+    ``active`` a geração pausa enquanto ``active()`` for falso.
+    """
+
+    kind = 'simulator'
+
+    def __init__(self, rate=None, authors=None, vote_ratio=0.5, seed=None, start_delay=2.0,
+                 batch_interval=0.05, active=None, sleep=time.sleep, clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.vote_ratio = vote_ratio
+        self.seed = seed
+        self.batch_interval = batch_interval
+        self.active = active
+        self._sleep = sleep
+        self._clock = clock
+        self.random = random.Random(seed)
+        if authors:
+            self.authors = [f"viewer{i}" for i in range(authors)]
+        else:
+            self.authors = list(SIMULATOR_USERNAMES)
+        # Votos e conversa em um único sorteio ponderado
+        self.texts = list(SIMULATOR_COMMANDS) + list(SIMULATOR_MESSAGES)
+        vote_weight = vote_ratio / len(SIMULATOR_COMMANDS)
+        chatter_weight = (1 - vote_ratio) / len(SIMULATOR_MESSAGES)
+        self._cum_weights = list(accumulate(
+            [vote_weight] * len(SIMULATOR_COMMANDS) + [chatter_weight] * len(SIMULATOR_MESSAGES)))
+        self.generated = 0
+        self._started = clock() + start_delay
+        self._next_at = self._started  # Próxima mensagem (ritmo de live pequena)
+
+    def poll(self, now=None):
+        """Mensagens devidas até ``now`` (lista vazia se nenhuma)."""
+        now = self._clock() if now is None else now
+        if now < self._started or (self.active is not None and not self.active()):
+            return []
+        if self.rate:
+            due = int((now - self._started) * self.rate) - self.generated
+            backlog = int(self.rate)  # No máximo um segundo de atraso: o resto é descartado
+            if due > backlog:
+                self.generated += due - backlog
+                due = backlog
+            return self.generate(due) if due > 0 else []
+        count = 0
+        while self._next_at <= now:
+            count += 1
+            self._next_at += self.random.uniform(0.5, 3)
+        return self.generate(count) if count else []
+
+    def generate(self, count):
+        """Gera ``count`` mensagens (sem id: o simulador não tem o que deduplicar)."""
+        self.generated += count
+        choices = self.random.choices
+        return list(zip(repeat(None, count), choices(self.authors, k=count),
+                        choices(self.texts, cum_weights=self._cum_weights, k=count)))
+
+    def next_due(self, now):
+        """Segundos até o próximo lote."""
+        if now < self._started:
+            return self._started - now
+        if self.rate:
+            return self.batch_interval
+        return max(0.0, min(self._next_at - now, POLL_INTERVAL))
+
+    def batches(self, last_message_id=None):
+        while not self.closed:
+            now = self._clock()
+            yield self.poll(now)
+            self._sleep(min(self.next_due(self._clock()), POLL_INTERVAL))
+
+
+class ReplayChatSource(ChatSource):
+    """Reprodução de uma gravação do ``chat_replay``, na velocidade do ``clock``.
+
+    Com velocidade fixa cada lote reúne as mensagens cujo horário já chegou;
+    no modo mais rápido possível os lotes têm até ``batch_size`` mensagens e
+    ``hold(offset)`` segura a entrega enquanto o quiz não alcançar o offset
+    (ex.: esperar a próxima fase começar).
+    """
+
+    kind = 'replay'
+    live = False
+    lossless = True  # Uma reprodução não deve perder mensagens
+
+    def __init__(self, path, clock=None, sleep=time.sleep, hold=None, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__()
+        self.path = path
+        self.clock = clock or ReplayClock(sleep=sleep)
+        self.hold = hold
+        self.batch_size = batch_size
+        self._sleep = sleep
+
+    def batches(self, last_message_id=None):
+        header, entries = read_recording(self.path)
+        speed = self.clock.speed
+        logger.info(f"Reproduzindo chat gravado de {header.get('source') or self.path} "
+                    f"({'máxima' if speed is None else f'{speed:g}x'})")
+        skipping = last_message_id is not None  # Retomar depois da última mensagem entregue
+        self.clock.start()
+        started_real = time.monotonic()
+        first_offset = None
+        batch = []
+        try:
+            for offset, author, text, message_id in entries:
+                if skipping:
+                    skipping = message_id != last_message_id
+                    continue
+                if first_offset is None:
+                    first_offset = offset
+                if speed is not None:
+                    # Prazo absoluto de cada mensagem: atrasos não se acumulam
+                    due = started_real + (offset - first_offset) / speed
+                    if batch and due > time.monotonic():
+                        yield batch
+                        batch = []
+                    while not self.closed and due > time.monotonic():
+                        self._sleep(min(due - time.monotonic(), POLL_INTERVAL))
+                        if due > time.monotonic():
+                            yield []
+                elif self.hold is not None and self.hold(offset):
+                    # Entregar o que já foi lido antes de esperar o quiz
+                    if batch:
+                        yield batch
+                        batch = []
+                    while not self.closed and self.hold(offset):
+                        self._sleep(0.001)
+                if self.closed:
+                    return
+                self.clock.advance(offset)
+                batch.append((message_id, author, text))
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            self.clock.finish()
+        logger.info(f"Reprodução encerrada em {time.monotonic() - started_real:.1f}s")
+
+
+def open_chat_source(url, inactivity_timeout=120.0, sleep=time.sleep, replay_clock=None, replay_hold=None,
+                     simulator_active=None):
+    """Cria a fonte de chat correspondente ao link."""
+    if url.startswith('tcp://'):
+        return SocketChatSource(url, inactivity_timeout=inactivity_timeout)
+    if url.startswith('simulator:'):
+        options = dict(parse_qsl(urlsplit(url).query))
+        return SimulatedChatSource(
+            rate=float(options['rate']) if options.get('rate') else None,
+            authors=int(options['authors']) if options.get('authors') else None,
+            vote_ratio=float(options.get('vote_ratio', 0.5)),
+            seed=int(options['seed']) if options.get('seed') else None,
+            start_delay=float(options.get('start_delay', 2.0)),
+            active=simulator_active,
+            sleep=sleep
+        )
+    if url.startswith('replay:'):
+        return ReplayChatSource(url[len('replay:'):], clock=replay_clock, sleep=sleep, hold=replay_hold)
+    return YouTubeChatSource(url, inactivity_timeout=inactivity_timeout)
+
+
+class FakeChatServer(socketserver.ThreadingTCPServer):
+    """Servidor de chat sintético por TCP, com quedas propositais."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, rate=50.0, drop_every=0, replay_on_resume=5, seed=None):
+        super().__init__(address, _FakeChatHandler)
+        self.rate = rate
+        self.drop_every = drop_every  # Derrubar a conexão a cada N mensagens (0 = nunca)
+        self.replay_on_resume = replay_on_resume  # Mensagens repetidas após reconectar (como o YouTube)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.history = []  # (id, autor, mensagem) de todas as mensagens geradas
+
+    def message(self, index):
+        """Mensagem de número ``index`` (1, 2, ...), gerada na primeira vez que é pedida."""
+        with self.lock:
+            while len(self.history) < index:
+                number = len(self.history) + 1
+                author = f"viewer{self.random.randrange(1000)}"
+                text = f"!{'abcd'[self.random.randrange(4)]}" if self.random.random() < 0.4 else f"mensagem {number}"
+                self.history.append((str(number), author, text))
+            return self.history[index - 1]
+
+
+class _FakeChatHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        try:
+            request = json.loads(self.rfile.readline() or b'{}')
+        except ValueError:
+            request = {}
+        after = request.get('after')
+        start = int(after) + 1 if after and str(after).isdigit() else 1
+        start = max(1, start - server.replay_on_resume) if after else start
+        sent = 0
+        interval = 1.0 / server.rate if server.rate > 0 else 0
+        index = start
+        while True:
+            message_id, author, text = server.message(index)
+            line = json.dumps({'id': message_id, 'author': author, 'message': text}, ensure_ascii=False)
+            try:
+                self.wfile.write(line.encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except OSError:
+                return
+            index += 1
+            sent += 1
+            if server.drop_every and sent >= server.drop_every:
+                return  # Queda proposital da conexão
+            if interval:
+                time.sleep(interval)
+
+
+def bench_simulator(rate, seconds, authors, seed):
+    """Mede quantas mensagens/s o simulador entrega (sem ingestão)."""
+    source = SimulatedChatSource(rate=rate, authors=authors, seed=seed, start_delay=0)
+    started = time.monotonic()
+    delivered = 0
+    for batch in source.batches():
+        delivered += len(batch)
+        if time.monotonic() - started >= seconds:
+            break
+    elapsed = time.monotonic() - started
+    return delivered, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ferramentas de teste das fontes de chat')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    server_parser = sub.add_parser('fake-server', help='Servir um chat sintético por TCP (NDJSON)')
+    server_parser.add_argument('--host', default='127.0.0.1')
+    server_parser.add_argument('--port', type=int, default=9999)
+    server_parser.add_argument('--rate', type=float, default=50, help='Mensagens por segundo por conexão')
+    server_parser.add_argument('--drop-every', type=int, default=0, help='Derrubar a conexão a cada N mensagens')
+    server_parser.add_argument('--seed', type=int, default=None)
+
+    bench_parser = sub.add_parser('bench', help='Medir a taxa do simulador')
+    bench_parser.add_argument('--rate', type=float, default=100000)
+    bench_parser.add_argument('--seconds', type=float, default=5)
+    bench_parser.add_argument('--authors', type=int, default=50000)
+    bench_parser.add_argument('--seed', type=int, default=1)
+
+    watch_parser = sub.add_parser('watch', help='Ler um chat supervisionado e mostrar o estado')
+    watch_parser.add_argument('url', help='tcp://host:porta, simulator://?rate=..., replay:arquivo ou link do YouTube')
+
+    args = parser.parse_args(argv)
+    if args.command == 'fake-server':
+        server = FakeChatServer((args.host, args.port), rate=args.rate, drop_every=args.drop_every, seed=args.seed)
+        print(f"Chat sintético em tcp://{args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == 'bench':
+        delivered, elapsed = bench_simulator(args.rate, args.seconds, args.authors, args.seed)
+        print(f"{delivered} mensagens em {elapsed:.1f}s ({delivered / elapsed:.0f} msg/s)")
+        return 0
+
+    from chat_supervisor import ChatSupervisor
+
+    supervisor = ChatSupervisor(open_chat_source, lambda batch, source: None,
+                                on_state=lambda state, detail: print(f"[{state}] {detail or ''}"))
+    supervisor.start(args.url)
+    try:
+        while supervisor.state != 'finished':
+            time.sleep(5)
+            print(json.dumps(supervisor.health(), ensure_ascii=False))
+    except KeyboardInterrupt:
+        supervisor.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    raise SystemExit(main())
@@ -0,0 +1,263 @@
+"""Supervisão da leitura do chat.
+
+O ``ChatSupervisor`` é dono de no máximo um leitor ativo (uma thread que
+itera os lotes de uma ``ChatSource``, veja ``chat_sources``). Trocar o link ou
+parar cancela o leitor atual: cada leitor tem o seu próprio
+``threading.Event``, a fonte é fechada e qualquer lote recebido depois do
+cancelamento é descartado. A entrega (descarte dos repetidos e ``on_batch``)
+acontece sob um lock que ``start``/``stop`` também tomam para cancelar, então
+depois que eles retornam nenhum lote do leitor antigo é entregue e duas fontes
+nunca entregam ao mesmo tempo. As fontes devolvem lotes vazios periodicamente,
+então o leitor percebe o cancelamento mesmo sem mensagens. Um leitor que
+ainda assim fique bloqueado é tratado como impossível de encerrar: ele é
+abandonado (contado em ``orphaned_readers``) e nada do que ele receber depois
+é entregue. As fontes não podem depender de timeouts que interrompem a
+thread principal (como os ``timeout``/``inactivity_timeout`` do
+chat-downloader, que usam ``_thread.interrupt_main``): a inatividade é
+detectada no próprio laço de leitura da fonte.
+
+Quando a conexão cai ou uma fonte ``live`` termina, o supervisor reconecta
+com espera exponencial com jitter (metade a 100% de ``base * 2^(tentativa-1)``,
+limitada a ``backoff_max``). Ao reconectar, a fonte recebe o id da última
+mensagem entregue e as mensagens já vistas (ids recentes) são descartadas,
+então o trecho repetido pelo YouTube após a reconexão não é processado de
+novo. ``health()`` informa o estado (``stopped``, ``connecting``,
+``connected``, ``reconnecting`` ou ``finished``), contadores e o último erro.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from log_setup import RateLimiter
+
+logger = logging.getLogger(__name__)
+# Erros repetidos no processamento dos lotes: no máximo um log a cada 10s
+error_log_limiter = RateLimiter(interval=10.0)
+
+STATES = ('stopped', 'connecting', 'connected', 'reconnecting', 'finished')
+SEEN_IDS_CAPACITY = 5000  # Ids recentes lembrados para descartar mensagens repetidas
+
+
+class ChatSupervisor:
+    """Mantém um único leitor de chat, com reconexão e relatório de saúde."""
+
+    def __init__(self, open_source, on_batch, name='chat', on_state=None,
+                 backoff_base=1.0, backoff_max=60.0, seen_capacity=SEEN_IDS_CAPACITY, rng=None):
+        self.open_source = open_source  # open_source(url) -> ChatSource
+        self.on_batch = on_batch  # on_batch([(message_id, autor, texto), ...], fonte)
+        self.on_state = on_state  # on_state(estado, detalhe) a cada mudança de estado
+        self.name = name
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._random = rng or random.Random()
+        self._lock = threading.Lock()
+        # Entrega dos lotes; start/stop o tomam ao cancelar (sempre depois de _lock)
+        self._deliver_lock = threading.RLock()
+        self._cancel = None  # Event do leitor atual
+        self._reader = None
+        self._readers = []  # Leitores já iniciados (os abandonados não podem ser interrompidos)
+        self._seen = set()
+        self._seen_order = deque(maxlen=seen_capacity)
+        self.source = None  # Fonte em leitura
+        self.url = None
+        self.state = 'stopped'
+        self.last_message_id = None
+        self.last_message_at = None
+        self.connected_since = None
+        self.messages = 0
+        self.batches = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.retry_at = None
+
+    @property
+    def running(self):
+        return self._cancel is not None and not self._cancel.is_set()
+
+    @property
+    def kind(self):
+        """Tipo da fonte em leitura (youtube, simulator, replay, socket) ou None."""
+        source = self.source
+        return source.kind if source is not None and self.running else None
+
+    def start(self, url):
+        """Passa a ler ``url``, cancelando o leitor anterior."""
+        with self._lock:
+            self._cancel_current()
+            if url != self.url:
+                # Outra transmissão: a posição e os ids vistos não valem mais
+                self.last_message_id = None
+                self._seen.clear()
+                self._seen_order.clear()
+            self.url = url
+            self.consecutive_failures = 0
+            self.last_error = None
+            cancel = threading.Event()
+            self._cancel = cancel
+            reader = threading.Thread(target=self._run, args=(url, cancel), name=f'{self.name}-reader')
+            reader.daemon = True
+            self._reader = reader
+            self._readers = [thread for thread in self._readers if thread.is_alive()]
+            self._readers.append(reader)
+        reader.start()
+        return reader
+
+    def stop(self):
+        """Cancela o leitor atual (não espera por ele)."""
+        with self._lock:
+            if self._cancel is None or self._cancel.is_set():
+                return False
+            self._cancel_current()
+        self._set_state(None, 'stopped')
+        return True
+
+    def _cancel_current(self):
+        if self._cancel is not None:
+            # Espera o lote em entrega, se houver: depois disso o leitor não entrega mais
+            with self._deliver_lock:
+                self._cancel.set()
+        source = self.source
+        if source is not None:
+            try:
+                source.close()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar a fonte do chat {self.name}: {e}")
+
+    def health(self):
+        """Estado atual da leitura do chat."""
+        retry_at = self.retry_at
+        with self._lock:
+            orphaned = sum(1 for thread in self._readers if thread.is_alive() and thread is not self._reader)
+        return {
+            'state': self.state,
+            'url': self.url,
+            'source': self.kind,
+            'connected_since': self.connected_since,
+            'last_message_at': self.last_message_at,
+            'last_message_id': self.last_message_id,
+            'messages': self.messages,
+            'batches': self.batches,
+            'duplicates': self.duplicates,
+            'errors': self.errors,
+            'reconnects': self.reconnects,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'retry_in': round(max(0.0, retry_at - time.monotonic()), 1)
+            if retry_at is not None and self.state == 'reconnecting' else None,
+            'orphaned_readers': orphaned
+        }
+
+    def backoff(self, attempt):
+        """Espera antes da tentativa ``attempt`` (1, 2, ...), com jitter."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return self._random.uniform(delay / 2, delay)
+
+    def _set_state(self, cancel, state, detail=None):
+        # Um leitor cancelado não altera mais o estado
+        if cancel is not None and cancel.is_set():
+            return
+        if state == self.state and detail is None:
+            return
+        self.state = state
+        if state == 'connected':
+            self.connected_since = time.time()
+        else:
+            self.connected_since = None
+        if self.on_state is not None:
+            try:
+                self.on_state(state, detail)
+            except Exception as e:
+                logger.error(f"Erro ao notificar estado do chat ({self.name}): {e}")
+
+    def _fresh(self, batch):
+        """Remove do lote as mensagens já entregues (ids vistos recentemente)."""
+        seen, order = self._seen, self._seen_order
+        fresh = []
+        for message in batch:
+            message_id = message[0]
+            if message_id is not None:
+                if message_id in seen:
+                    continue
+                if len(order) == order.maxlen:
+                    seen.discard(order[0])
+                order.append(message_id)
+                seen.add(message_id)
+                self.last_message_id = message_id
+            fresh.append(message)
+        return fresh
+
+    def _run(self, url, cancel):
+        attempt = 0
+        while not cancel.is_set():
+            self._set_state(cancel, 'connecting' if attempt == 0 else 'reconnecting')
+            source = None
+            error = None
+            try:
+                source = self.open_source(url)
+                with self._lock:
+                    if cancel.is_set():
+                        break
+                    self.source = source
+                connected = False
+                for batch in source.batches(self.last_message_id):
+                    if cancel.is_set():
+                        break
+                    if not connected:
+                        connected = True
+                        self._set_state(cancel, 'connected')
+                    if not batch:
+                        continue
+                    with self._deliver_lock:
+                        # Cancelado enquanto o lote chegava: descartar
+                        if cancel.is_set():
+                            break
+                        fresh = self._fresh(batch)
+                        self.duplicates += len(batch) - len(fresh)
+                        if not fresh:
+                            continue
+                        # Recebendo mensagens: a próxima queda recomeça a espera do início
+                        attempt = 0
+                        self.consecutive_failures = 0
+                        self.messages += len(fresh)
+                        self.batches += 1
+                        self.last_message_at = time.time()
+                        try:
+                            self.on_batch(fresh, source)
+                        except Exception as e:
+                            # Falha ao processar um lote não derruba a conexão
+                            self.errors += 1
+                            error_log_limiter.log(logger, logging.ERROR, ('chat_batch', self.name),
+                                                  f"Erro ao processar lote do chat {self.name}: {e}")
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+            finally:
+                if source is not None:
+                    source.close()
+            if cancel.is_set():
+                break
+            if error is None and not source.live:
+                # Fonte finita (reprodução): terminou, não há o que reconectar
+                logger.info(f"Chat {self.name}: fonte encerrada ({url})")
+                self._set_state(cancel, 'finished')
+                with self._lock:
+                    if self._cancel is cancel:
+                        cancel.set()
+                break
+
+            attempt += 1
+            self.reconnects += 1
+            self.consecutive_failures += 1
+            self.last_error = error or 'o chat foi encerrado pela fonte'
+            delay = self.backoff(attempt)
+            self.retry_at = time.monotonic() + delay
+            logger.warning(f"Chat {self.name}: {self.last_error}; reconectando em {delay:.1f}s "
+                           f"(tentativa {attempt})")
+            self._set_state(cancel, 'reconnecting', f"{self.last_error}; nova tentativa em {delay:.0f}s")
+            # Acorda na hora se o leitor for cancelado durante a espera
+            cancel.wait(delay)
+        logger.info(f"Leitor do chat {self.name} encerrado ({url})")
@@ -0,0 +1,287 @@
+"""Modo multi-processo: eleição de líder, broker local e estado compartilhado.
+
+Com ``QUIZ_CLUSTER=1``, em várias instâncias
+do gunicorn com um worker cada atrás de um balanceador com afinidade:
+
+- apenas um processo, o líder, executa o ``quiz_loop`` e a leitura do chat. A
+  eleição usa ``flock`` em ``data/cluster/leader.lock``; se o líder morrer o
+  lock é liberado pelo sistema operacional e outro worker assume;
+- os eventos Socket.IO passam por um gerenciador de fila de mensagens. Se
+  ``SOCKETIO_MESSAGE_QUEUE`` estiver definida (ex.: ``redis://``), ela é usada;
+  caso contrário é usado um broker local baseado em arquivo (``FileQueueManager``);
+- o líder publica um snapshot do estado em ``data/cluster/state.json`` e os
+  demais workers o aplicam para responder às APIs de leitura;
+- comandos de controle recebidos por um seguidor (iniciar/parar quiz,
+  recarregar configurações, etc.) são encaminhados ao líder por um canal em
+  arquivo.
+"""
+import base64
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+import socketio
+
+from socket_transport import encode_once
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_MAX_BYTES = 8 * 1024 * 1024  # Tamanho máximo antes de rotacionar um canal
+
+
+def cluster_enabled():
+    """Indica se o modo multi-processo está ativado."""
+    return os.environ.get('QUIZ_CLUSTER', '').lower() in ('1', 'true', 'yes')
+
+
+class FileChannel:
+    """Canal pub/sub em arquivo append-only, compartilhado entre processos.
+
+    Cada mensagem é uma linha JSON (nunca pickle: o arquivo é compartilhado e
+    quem escreve nele não deve conseguir executar código nos workers). Tuplas
+    e bytes, usados pelo Socket.IO para vários argumentos e anexos binários,
+    são marcados para voltar com o mesmo tipo. Os escritores usam um lock em
+    arquivo separado; os leitores acompanham o fim do arquivo e trocam para o
+    novo arquivo quando ele é rotacionado.
+    """
+
+    def __init__(self, path, max_bytes=CHANNEL_MAX_BYTES, poll_interval=0.02):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self._lock_path = path + '.lock'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def publish(self, obj):
+        line = json.dumps(_pack(obj), separators=(',', ':')).encode('utf-8') + b'\n'
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    if os.path.getsize(self.path) > self.max_bytes:
+                        os.replace(self.path, self.path + '.1')
+                except FileNotFoundError:
+                    pass
+                with open(self.path, 'ab') as f:
+                    f.write(line)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def listen(self):
+        """Gera as mensagens publicadas a partir de agora (bloqueante)."""
+        f = self._open(at_end=True)
+        buffer = b''
+        while True:
+            chunk = f.readline()
+            if chunk:
+                buffer += chunk
+                if buffer.endswith(b'\n'):
+                    yield from self._decode(buffer)
+                    buffer = b''
+                continue
+            # Fim do arquivo: verificar se houve rotação
+            try:
+                rotated = os.stat(self.path).st_ino != os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                rotated = False
+            if rotated:
+                # Ler o que foi escrito no arquivo antigo entre o último EOF e a
+                # rotação (depois dela ninguém mais escreve nele)
+                for chunk in iter(f.readline, b''):
+                    buffer += chunk
+                    if buffer.endswith(b'\n'):
+                        yield from self._decode(buffer)
+                        buffer = b''
+                if buffer:
+                    logger.error(f"Mensagem incompleta descartada na rotação do canal {self.path}")
+                f.close()
+                f = self._open(at_end=False)
+                buffer = b''
+                continue
+            time.sleep(self.poll_interval)
+
+    def _decode(self, line):
+        try:
+            yield _unpack(json.loads(line))
+        except Exception as e:
+            logger.error(f"Mensagem inválida no canal {self.path}: {e}")
+
+    def _open(self, at_end):
+        f = open(self.path, 'ab+')
+        f.seek(0, os.SEEK_END if at_end else os.SEEK_SET)
+        return f
+
+
+def _pack(obj):
+    """Converte tuplas e bytes em objetos JSON marcados."""
+    if isinstance(obj, tuple):
+        return {'__tuple__': [_pack(item) for item in obj]}
+    if isinstance(obj, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(obj).decode('ascii')}
+    if isinstance(obj, list):
+        return [_pack(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: _pack(value) for key, value in obj.items()}
+    return obj
+
+
+def _unpack(obj):
+    """Inverso de ``_pack``."""
+    if isinstance(obj, list):
+        return [_unpack(item) for item in obj]
+    if isinstance(obj, dict):
+        if len(obj) == 1:
+            if '__tuple__' in obj:
+                return tuple(_unpack(item) for item in obj['__tuple__'])
+            if '__bytes__' in obj:
+                return base64.b64decode(obj['__bytes__'])
+        return {key: _unpack(value) for key, value in obj.items()}
+    return obj
+
+
+class FileQueueManager(socketio.PubSubManager):
+    """Gerenciador Socket.IO que distribui eventos entre workers via ``FileChannel``."""
+
+    name = 'file'
+
+    def __init__(self, path, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._channel_file = FileChannel(path)
+
+    def _publish(self, data):
+        self._channel_file.publish(data)
+
+    def _listen(self):
+        yield from self._channel_file.listen()
+
+
+class LeaderElection:
+    """Eleição de líder por ``flock`` exclusivo em um arquivo de lock."""
+
+    def __init__(self, lock_path, retry_interval=2.0):
+        self.lock_path = lock_path
+        self.retry_interval = retry_interval
+        self._file = None
+        self.is_leader = False
+        os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+
+    def try_acquire(self):
+        if self.is_leader:
+            return True
+        f = open(self.lock_path, 'a+')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        # Manter o arquivo aberto: o lock dura enquanto o processo viver
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        self.is_leader = True
+        logger.info(f"Processo {os.getpid()} eleito líder do quiz")
+        return True
+
+    def wait_for_leadership(self, on_elected):
+        """Tenta assumir a liderança periodicamente em uma thread de fundo."""
+        def run():
+            while not self.try_acquire():
+                time.sleep(self.retry_interval)
+            on_elected()
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+class SharedState:
+    """Snapshot do estado do quiz publicado pelo líder para os seguidores."""
+
+    def __init__(self, path, poll_interval=0.1):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._last_mtime = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def publish(self, state):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def read(self):
+        """Retorna o último snapshot publicado ou None."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read_if_changed(self):
+        """Retorna o snapshot se o arquivo mudou desde a última leitura, senão None."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._last_mtime:
+            return None
+        state = self.read()
+        if state is not None:
+            self._last_mtime = mtime
+        return state
+
+    def follow(self, apply, should_stop):
+        """Aplica cada novo snapshot até ``should_stop()`` retornar True."""
+        while not should_stop():
+            try:
+                state = self.read_if_changed()
+                if state is not None:
+                    apply(state)
+            except Exception as e:
+                logger.error(f"Erro ao aplicar estado compartilhado: {e}")
+            time.sleep(self.poll_interval)
+
+
+class Cluster:
+    """Agrupa eleição, canais e estado compartilhado de um diretório de dados."""
+
+    def __init__(self, data_dir):
+        self.dir = os.path.join(data_dir, 'cluster')
+        self.election = LeaderElection(os.path.join(self.dir, 'leader.lock'))
+        self.commands = FileChannel(os.path.join(self.dir, 'commands.queue'))
+        self.state = SharedState(os.path.join(self.dir, 'state.json'))
+
+    @property
+    def is_leader(self):
+        return self.election.is_leader
+
+    def create_client_manager(self):
+        """Retorna o gerenciador de fila de mensagens para o Socket.IO."""
+        url = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+        if url:
+            if url.startswith('redis://') or url.startswith('rediss://'):
+                return encode_once(socketio.RedisManager)(url)
+            return encode_once(socketio.KombuManager)(url)
+        return encode_once(FileQueueManager)(os.path.join(self.dir, 'socketio.queue'))
+
+    def send_command(self, command, **params):
+        """Encaminha um comando de controle para o líder."""
+        self.commands.publish({'command': command, 'params': params})
+
+    def serve_commands(self, handler):
+        """Executa ``handler(command, params)`` para cada comando recebido (líder)."""
+        def run():
+            for message in self.commands.listen():
+                try:
+                    handler(message['command'], message.get('params', {}))
+                except Exception as e:
+                    logger.error(f"Erro ao executar comando do cluster {message}: {e}")
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
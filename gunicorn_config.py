@@ -1,3 +1,25 @@
+import os
+
+# Um worker por instância: o polling do Socket.IO exige que todas as
+# requisições de uma sessão caiam no mesmo processo, e o gunicorn distribui as
+# conexões entre os seus workers sem afinidade. Para escalar, rode várias
+# instâncias com QUIZ_CLUSTER=1 atrás de um balanceador com afinidade.
 workers = 1
 bind = '0.0.0.0:$PORT'
 timeout = 120
+
+# Modo assíncrono: eventlet/gevent atendem milhares de conexões por processo
+async_mode = os.environ.get('QUIZ_ASYNC_MODE', 'threading').lower()
+if async_mode in ('eventlet', 'gevent'):
+    worker_class = async_mode
+    # Com gevent o WebSocket requer o worker do gevent-websocket (opcional:
+    # sem ele o worker gevent comum atende só o long-polling)
+    if async_mode == 'gevent' and os.environ.get('QUIZ_SOCKETIO_TRANSPORTS', 'websocket').lower() != 'polling':
+        try:
+            import geventwebsocket  # noqa: F401
+            worker_class = 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker'
+        except ImportError:
+            pass
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 2000))
+else:
+    threads = 100  # Requisições de long-polling ficam abertas até haver mudança no estado
@@ -0,0 +1,193 @@
+"""Pipeline de ingestão do chat desacoplado da leitura.
+
+A thread que lê o chat (qualquer ``ChatSource``) apenas chama ``submit_batch``
+com o lote lido, que descarta mensagens repetidas, classifica o lote inteiro
+de uma vez (voto ou não, e em qual opção), coloca as mensagens em uma fila
+limitada e retorna imediatamente. Workers separados consomem a fila em lotes e
+chamam o processamento (votos, histórico e broadcast) já com a opção votada,
+sem classificar de novo. Assim um emit ou log lento não atrasa a leitura do
+chat.
+
+Backpressure: votos têm prioridade e esperam um pouco por espaço na fila;
+mensagens comuns são descartadas (``drop``) ou amostradas (``sample``) quando
+a fila passa do limite de ocupação.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from log_setup import RateLimiter
+
+logger = logging.getLogger(__name__)
+# Um erro por mensagem viraria uma enxurrada de logs sob carga
+error_log_limiter = RateLimiter(interval=10.0)
+
+OVERLOAD_POLICIES = ('drop', 'sample')
+
+
+class ChatPipeline:
+    """Fila limitada entre o leitor do chat e os workers de processamento."""
+
+    def __init__(self, handler, classify_batch, maxsize=10000, workers=1, batch_size=100,
+                 high_watermark=0.8, overload_policy='sample', sample_every=10,
+                 vote_put_timeout=0.5, dedupe_size=5000, batch_handler=None):
+        self.handler = handler  # handler(author, text, vote_index) processa uma mensagem
+        # batch_handler([(author, text, vote_index), ...]) processa um lote
+        self.batch_handler = batch_handler
+        # classify_batch([text, ...]) -> [vote_index ou None, ...], chamado uma vez por lote lido
+        self.classify_batch = classify_batch
+        self.maxsize = maxsize
+        self.workers = workers
+        self.batch_size = batch_size
+        self.high_watermark = high_watermark
+        self.overload_policy = overload_policy
+        self.sample_every = max(1, sample_every)
+        self.vote_put_timeout = vote_put_timeout
+        self.dedupe_size = dedupe_size
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._seen_ids = OrderedDict()  # Ids de mensagens recentes (deduplicação)
+        self._threads = []
+        self._overload_counter = 0
+        self._stats = dict.fromkeys((
+            'enqueued', 'processed', 'errors', 'duplicates',
+            'dropped_chatter', 'sampled_out', 'dropped_votes'
+        ), 0)
+        self._max_depth = 0
+        self._last_latency = 0.0
+
+    def set_policy(self, overload_policy):
+        if overload_policy in OVERLOAD_POLICIES:
+            self.overload_policy = overload_policy
+
+    def submit(self, author, text, message_id=None, block=False):
+        """Enfileira uma mensagem bruta. Retorna False se ela foi descartada."""
+        return self.submit_batch(((message_id, author, text),), block=block) == 1
+
+    def submit_batch(self, messages, block=False):
+        """Enfileira um lote ``[(message_id, autor, texto), ...]``.
+
+        Retorna quantas mensagens entraram na fila. Com ``block`` a chamada
+        espera por espaço na fila em vez de descartar (usado na reprodução de
+        chats gravados, que não deve perder mensagens).
+        """
+        self._ensure_started()
+        messages = self._drop_duplicates(messages)
+        if not messages:
+            return 0
+        vote_indexes = self.classify_batch([text for _, _, text in messages])
+        enqueued_at = time.monotonic()
+        put = self._queue.put
+        accepted = 0
+        for (_, author, text), vote_index in zip(messages, vote_indexes):
+            item = (author, text, vote_index, enqueued_at)
+            if block:
+                put(item)
+            elif vote_index is not None:
+                # Votos esperam um pouco por espaço: perder voto é pior que atrasar a leitura
+                try:
+                    put(item, timeout=self.vote_put_timeout)
+                except queue.Full:
+                    self._count('dropped_votes')
+                    continue
+            else:
+                if self._queue.qsize() >= self.maxsize * self.high_watermark and not self._admit_chatter():
+                    continue
+                try:
+                    put(item, block=False)
+                except queue.Full:
+                    self._count('dropped_chatter')
+                    continue
+            accepted += 1
+        if accepted:
+            with self._lock:
+                self._stats['enqueued'] += accepted
+                depth = self._queue.qsize()
+                if depth > self._max_depth:
+                    self._max_depth = depth
+        return accepted
+
+    def _admit_chatter(self):
+        """Decide se uma mensagem comum entra na fila sobrecarregada."""
+        if self.overload_policy == 'sample':
+            with self._lock:
+                self._overload_counter += 1
+                if self._overload_counter % self.sample_every == 0:
+                    return True
+                self._stats['sampled_out'] += 1
+            return False
+        self._count('dropped_chatter')
+        return False
+
+    def _drop_duplicates(self, messages):
+        """Remove do lote as mensagens com id já visto (um único lock por lote)."""
+        fresh = []
+        with self._lock:
+            seen = self._seen_ids
+            for message in messages:
+                message_id = message[0]
+                if message_id is not None:
+                    if message_id in seen:
+                        self._stats['duplicates'] += 1
+                        continue
+                    seen[message_id] = None
+                    if len(seen) > self.dedupe_size:
+                        seen.popitem(last=False)
+                fresh.append(message)
+        return fresh
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        """Métricas da fila: profundidade atual/máxima, contadores e latência."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['max_depth'] = self._max_depth
+            stats['last_latency_ms'] = round(self._last_latency * 1000, 2)
+        stats['depth'] = self._queue.qsize()
+        stats['capacity'] = self.maxsize
+        stats['overload_policy'] = self.overload_policy
+        return stats
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'chat-ingest-{i}')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Pipeline de ingestão do chat iniciado ({self.workers} worker(s), fila de {self.maxsize})")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Drenar o que já estiver na fila para processar em lote
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if self.batch_handler is not None:
+                try:
+                    self.batch_handler([item[:3] for item in batch])
+                except Exception as e:
+                    self._count('errors')
+                    error_log_limiter.log(logger, logging.ERROR, 'batch', f"Erro ao processar lote do chat: {e}")
+            else:
+                for author, text, vote_index, _ in batch:
+                    try:
+                        self.handler(author, text, vote_index)
+                    except Exception as e:
+                        self._count('errors')
+                        error_log_limiter.log(logger, logging.ERROR, 'message', f"Erro ao processar mensagem do chat: {e}")
+            with self._lock:
+                self._stats['processed'] += len(batch)
+                self._last_latency = time.monotonic() - batch[-1][3]
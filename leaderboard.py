@@ -0,0 +1,167 @@
+"""Índice incremental do ranking.
+
+Mantém as pontuações em um dicionário e, em paralelo, as chaves
+``(-pontuação, nome)`` em ordem. Uma lista ordenada simples custaria O(n) por
+atualização (``insort`` e ``del`` deslocam a lista inteira), então as chaves
+ficam em uma lista de blocos ordenados de até ``2 * BUCKET_LOAD`` itens, como
+a ``SortedList`` do sortedcontainers: atualizar custa O(log n + BUCKET_LOAD),
+o top-N lê só os primeiros blocos e a posição de um usuário custa
+O(n / BUCKET_LOAD + log n), sem ordenar o ranking inteiro.
+"""
+import bisect
+import threading
+
+BUCKET_LOAD = 500  # Tamanho de referência dos blocos (divididos ao dobrar)
+
+
+class _SortedKeys:
+    """Lista ordenada em blocos: inserção e remoção sem deslocar a lista inteira."""
+
+    def __init__(self, keys=(), load=BUCKET_LOAD):
+        self._load = load
+        ordered = sorted(keys)
+        self._buckets = [ordered[i:i + load] for i in range(0, len(ordered), load)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(ordered)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        buckets, maxes = self._buckets, self._maxes
+        if not buckets:
+            buckets.append([key])
+            maxes.append(key)
+        else:
+            i = bisect.bisect_left(maxes, key)
+            if i == len(maxes):
+                i -= 1
+            bucket = buckets[i]
+            bisect.insort(bucket, key)
+            maxes[i] = bucket[-1]
+            if len(bucket) > 2 * self._load:
+                # Dividir o bloco cheio ao meio
+                half = bucket[self._load:]
+                del bucket[self._load:]
+                maxes[i] = bucket[-1]
+                buckets.insert(i + 1, half)
+                maxes.insert(i + 1, half[-1])
+        self._len += 1
+
+    def remove(self, key):
+        maxes = self._maxes
+        i = bisect.bisect_left(maxes, key)
+        if i == len(maxes):
+            raise ValueError(f'{key!r} não está na lista')
+        bucket = self._buckets[i]
+        j = bisect.bisect_left(bucket, key)
+        if bucket[j] != key:
+            raise ValueError(f'{key!r} não está na lista')
+        del bucket[j]
+        if bucket:
+            maxes[i] = bucket[-1]
+        else:
+            del self._buckets[i]
+            del maxes[i]
+        self._len -= 1
+
+    def bisect_left(self, key):
+        """Quantas chaves são menores que ``key``."""
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return self._len
+        return sum(len(bucket) for bucket in self._buckets[:i]) + bisect.bisect_left(self._buckets[i], key)
+
+    def head(self, n):
+        """As ``n`` primeiras chaves."""
+        result = []
+        for bucket in self._buckets:
+            if len(result) >= n:
+                break
+            result.extend(bucket[:n - len(result)])
+        return result
+
+
+class Leaderboard:
+    """Ranking de pontuações com top-N e posição por usuário sem ordenação completa."""
+
+    def __init__(self, scores=None):
+        self._lock = threading.RLock()
+        self._scores = {}
+        self._order = _SortedKeys()  # (-pontuação, nome) em ordem
+        self._version = 0
+        self._top_cache = {}  # n -> (versão, lista)
+        if scores:
+            self.load(scores)
+
+    def load(self, scores):
+        """Substitui todo o ranking (usado ao carregar do disco)."""
+        with self._lock:
+            self._scores = {name: int(score) for name, score in scores.items()}
+            self._order = _SortedKeys((-score, name) for name, score in self._scores.items())
+            self._version += 1
+            self._top_cache.clear()
+
+    def add_points(self, name, points=1):
+        """Soma pontos a um usuário (criando-o se necessário) e retorna o total."""
+        with self._lock:
+            old_score = self._scores.get(name)
+            if old_score is None:
+                new_score = points
+                self._order.add((-new_score, name))
+            else:
+                if points == 0:
+                    return old_score
+                new_score = old_score + points
+                self._order.remove((-old_score, name))
+                self._order.add((-new_score, name))
+            self._scores[name] = new_score
+            self._version += 1
+            return new_score
+
+    def set_score(self, name, score):
+        """Define a pontuação absoluta de um usuário."""
+        with self._lock:
+            return self.add_points(name, score - self._scores.get(name, 0))
+
+    def get(self, name, default=0):
+        return self._scores.get(name, default)
+
+    def rank(self, name):
+        """Retorna a posição (1-based) do usuário ou None se ele não pontuou."""
+        with self._lock:
+            score = self._scores.get(name)
+            if score is None:
+                return None
+            # Usuários empatados compartilham a melhor posição do grupo
+            return self._order.bisect_left((-score,)) + 1
+
+    def top(self, n=10):
+        """Retorna os N primeiros como lista de {'name', 'score'}."""
+        with self._lock:
+            cached = self._top_cache.get(n)
+            if cached is not None and cached[0] == self._version:
+                return cached[1]
+            result = [{"name": name, "score": -neg_score} for neg_score, name in self._order.head(n)]
+            self._top_cache[n] = (self._version, result)
+            return result
+
+    @property
+    def version(self):
+        return self._version
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self._scores)
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __contains__(self, name):
+        return name in self._scores
+
+    def __getitem__(self, name):
+        return self._scores[name]
+
+    def __len__(self):
+        return len(self._scores)
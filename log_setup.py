@@ -0,0 +1,104 @@
+"""Configuração de logging sem bloqueio para o app.
+
+Os registros vão para uma fila (``QueueHandler``) e uma thread separada
+(``QueueListener``) formata e escreve no destino final. Assim a thread do
+chat ou do quiz só paga o custo de enfileirar, não o de formatar e escrever.
+
+Variáveis de ambiente:
+
+- ``QUIZ_LOG_LEVEL``: nível mínimo (padrão ``INFO``);
+- ``QUIZ_LOG_FORMAT``: ``text`` (padrão) ou ``json`` (um objeto por linha,
+  com os campos passados em ``extra=``).
+
+``RateLimiter`` limita logs repetitivos (ex.: erros por mensagem do chat) a
+um por intervalo, informando quantos foram suprimidos.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Atributos padrão de LogRecord; o resto veio de ``extra=`` e vai para o JSON
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como um objeto JSON em uma linha."""
+
+    def format(self, record):
+        data = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RateLimiter:
+    """Permite um log por chave a cada ``interval`` segundos."""
+
+    def __init__(self, interval=10.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last = {}  # chave -> (último envio, suprimidos desde então)
+
+    def allow(self, key):
+        """Retorna (deve logar, quantos foram suprimidos desde o último)."""
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._last.get(key, (None, 0))
+            if last is None or now - last >= self.interval:
+                self._last[key] = (now, 0)
+                return True, suppressed
+            self._last[key] = (last, suppressed + 1)
+            return False, suppressed + 1
+
+    def log(self, logger, level, key, message, *args, **kwargs):
+        """Loga ``message`` se a chave não foi logada no intervalo."""
+        if not logger.isEnabledFor(level):
+            return
+        allowed, suppressed = self.allow(key)
+        if allowed:
+            if suppressed:
+                message = f"{message} ({suppressed} ocorrências suprimidas)"
+            logger.log(level, message, *args, **kwargs)
+
+
+def setup_logging(level=None, log_format=None, stream=None):
+    """Configura o logger raiz com fila e thread de escrita. Idempotente."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = (level or os.environ.get('QUIZ_LOG_LEVEL', 'INFO')).upper()
+    log_format = (log_format or os.environ.get('QUIZ_LOG_FORMAT', 'text')).lower()
+
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, target, respect_handler_level=True)
+    _listener.start()
+    # Escrever o que ainda estiver na fila ao encerrar
+    atexit.register(_listener.stop)
+    return _listener
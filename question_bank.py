@@ -0,0 +1,364 @@
+"""Perguntas normalizadas com payloads pré-montados.
+
+As perguntas chegam em formatos variados: opções em lista ou em dicionário
+A–D, e resposta em ``correct`` ou ``correct_answer`` (índice ou letra). Elas
+são validadas e normalizadas uma única vez, ao carregar do armazenamento ou
+ao receber um POST em ``/api/questions``. O ``PreparedQuestion`` resultante já
+traz o corpo da pergunta do evento ``next_question`` e o JSON (em bytes) da
+pergunta para os endpoints HTTP, então servir a pergunta atual é só uma
+consulta.
+
+O banco de perguntas fica em um ``QuestionBank`` (tudo em memória) ou em um
+``WindowedQuestionBank`` (só o índice e a janela de próximas perguntas em
+memória, o resto lido do armazenamento por páginas). Os dois oferecem a
+listagem paginada por cursor, com busca e projeção de campos.
+"""
+import json
+import threading
+
+OPTION_LETTERS = ('A', 'B', 'C', 'D')
+DEFAULT_EXPLANATION = 'Sem explicação disponível.'
+
+# Campos que podem ser pedidos na listagem (``fields=``); ``position`` sempre vem
+QUESTION_FIELDS = ('id', 'question', 'options', 'correct_answer', 'explanation')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+SCAN_PAGE_SIZE = 500  # Perguntas lidas do armazenamento por vez durante uma busca
+
+
+class QuestionError(ValueError):
+    """Pergunta em formato inválido."""
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _normalize_options(options, option_count):
+    """Retorna a tupla de opções com exatamente ``option_count`` itens."""
+    if isinstance(options, dict):
+        options = [options.get(letter, '') for letter in OPTION_LETTERS[:option_count]]
+    elif isinstance(options, (list, tuple)):
+        if len(options) > option_count:
+            raise QuestionError(f"no máximo {option_count} opções são suportadas")
+        options = list(options) + [''] * (option_count - len(options))
+    else:
+        raise QuestionError("'options' deve ser uma lista ou um dicionário A–D")
+    if any(not isinstance(option, str) for option in options):
+        raise QuestionError("as opções devem ser texto")
+    if sum(1 for option in options if option.strip()) < 2:
+        raise QuestionError("a pergunta precisa de pelo menos 2 opções")
+    return tuple(options)
+
+
+def _normalize_correct(raw, options):
+    """Retorna o índice da resposta correta (aceita índice ou letra)."""
+    correct = raw.get('correct', raw.get('correct_answer'))
+    if isinstance(correct, str) and correct.strip().upper() in OPTION_LETTERS:
+        correct = OPTION_LETTERS.index(correct.strip().upper())
+    if isinstance(correct, bool) or not isinstance(correct, int):
+        raise QuestionError("'correct' deve ser o índice (0–3) ou a letra da resposta")
+    if not 0 <= correct < len(options) or not options[correct].strip():
+        raise QuestionError(f"a resposta correta ({correct}) não é uma opção preenchida")
+    return correct
+
+
+class PreparedQuestion:
+    """Pergunta validada, imutável, com os payloads para os clientes."""
+
+    __slots__ = ('index', 'id', 'text', 'options', 'correct', 'correct_letter',
+                 'explanation', 'socket_question', 'http_question_prefix')
+
+    def __init__(self, raw, index, option_count=len(OPTION_LETTERS)):
+        if not isinstance(raw, dict):
+            raise QuestionError("a pergunta deve ser um objeto")
+        text = raw.get('question')
+        if not isinstance(text, str) or not text.strip():
+            raise QuestionError("'question' deve ser um texto não vazio")
+        self.index = index
+        self.id = raw.get('id', index)
+        self.text = text
+        self.options = _normalize_options(raw.get('options'), option_count)
+        self.correct = _normalize_correct(raw, self.options)
+        self.correct_letter = OPTION_LETTERS[self.correct]
+        self.explanation = raw.get('explanation') or DEFAULT_EXPLANATION
+        # Corpo da pergunta no evento Socket.IO next_question (compartilhado, não alterar)
+        self.socket_question = {
+            'question': self.text,
+            'options': dict(zip(OPTION_LETTERS, self.options)),
+            'correct': self.correct
+        }
+        # JSON da pergunta para o HTTP sem o '}' final: o tempo de resposta vem da configuração
+        self.http_question_prefix = _dumps({
+            'id': self.id,
+            'text': self.text,
+            'options': list(self.options)
+        })[:-1]
+
+    def http_body(self, answer_time, state):
+        """Corpo JSON da pergunta atual para o HTTP, com o estado da fase em ``state``."""
+        return b''.join((
+            b'{"success":true,"question":', self.http_question_prefix,
+            b',"time":', _dumps(answer_time), b'},', _dumps(state)[1:]
+        ))
+
+
+def prepare_questions(raw_questions, skip_invalid=False, on_invalid=None):
+    """Normaliza a lista de perguntas.
+
+    Com ``skip_invalid`` cada pergunta inválida vira ``None`` na sua posição
+    (e é passada para ``on_invalid(posição, erro)``), então a lista continua
+    alinhada com a original; sem ele a primeira inválida levanta
+    ``QuestionError`` com a posição no texto.
+    """
+    if not isinstance(raw_questions, list):
+        raise QuestionError("'questions' deve ser uma lista")
+    prepared = []
+    for position, raw in enumerate(raw_questions):
+        try:
+            prepared.append(PreparedQuestion(raw, position))
+        except QuestionError as e:
+            if not skip_invalid:
+                raise QuestionError(f"pergunta {position + 1}: {e}") from None
+            if on_invalid is not None:
+                on_invalid(position, e)
+            prepared.append(None)
+    return prepared
+
+
+def encode_cursor(position):
+    return str(position)
+
+
+def decode_cursor(cursor):
+    """Posição inicial da página; o cursor é a posição do primeiro item."""
+    if cursor in (None, ''):
+        return 0
+    try:
+        position = int(cursor)
+    except (TypeError, ValueError):
+        position = -1
+    if position < 0:
+        raise QuestionError(f"cursor inválido: {cursor}")
+    return position
+
+
+def parse_fields(fields):
+    """Converte ``fields=question,options`` na tupla de campos (None = todos)."""
+    if not fields:
+        return None
+    names = tuple(name.strip() for name in fields.split(',') if name.strip())
+    unknown = [name for name in names if name not in QUESTION_FIELDS and name != 'position']
+    if unknown:
+        raise QuestionError(f"campos desconhecidos: {', '.join(unknown)} (use {', '.join(QUESTION_FIELDS)})")
+    return names
+
+
+def _answer_index(raw):
+    """Índice da resposta de uma pergunta salva, sem validar (None se ausente)."""
+    correct = raw.get('correct', raw.get('correct_answer'))
+    if isinstance(correct, str) and correct.strip().upper() in OPTION_LETTERS:
+        return OPTION_LETTERS.index(correct.strip().upper())
+    return correct if isinstance(correct, int) and not isinstance(correct, bool) else None
+
+
+def _matches(raw, query, correct):
+    if not isinstance(raw, dict):
+        return False
+    if correct is not None and _answer_index(raw) != correct:
+        return False
+    if query:
+        options = raw.get('options')
+        options = options.values() if isinstance(options, dict) else options or []
+        texts = [raw.get('question')] + list(options)
+        return any(isinstance(text, str) and query in text.lower() for text in texts)
+    return True
+
+
+def project_question(position, raw, fields=None):
+    """Item da listagem: a posição e os campos pedidos da pergunta salva."""
+    if fields is None:
+        return {'position': position, **raw}
+    item = {'position': position}
+    for name in fields:
+        if name == 'correct_answer':
+            item[name] = _answer_index(raw)
+        elif name != 'position':
+            item[name] = raw.get(name)
+    return item
+
+
+class QuestionBank:
+    """Banco de perguntas inteiro em memória: originais e normalizadas, alinhadas por posição.
+
+    Perguntas salvas inválidas continuam em ``questions`` (e são gravadas de
+    volta como estão) e aparecem como ``None`` em ``prepared``, como no
+    ``WindowedQuestionBank``; o quiz as pula.
+    """
+
+    windowed = False
+
+    def __init__(self, questions=(), prepared=()):
+        self.questions = list(questions)  # Como foram salvas
+        self.prepared = list(prepared)  # PreparedQuestion de cada posição
+
+    @classmethod
+    def from_raw(cls, raw_questions, skip_invalid=False, on_invalid=None):
+        """Normaliza a lista; com ``skip_invalid`` as inválidas ficam como ``None``."""
+        prepared = prepare_questions(raw_questions, skip_invalid=skip_invalid, on_invalid=on_invalid)
+        return cls(raw_questions, prepared)
+
+    def __len__(self):
+        return len(self.prepared)
+
+    def __getitem__(self, index):
+        return self.prepared[index]
+
+    def raw(self, position):
+        return self.questions[position]
+
+    def all_raw(self):
+        return self.questions
+
+    def id_positions(self):
+        """Índice ``str(id) -> posição`` usado no upsert."""
+        return {str(q['id']): i for i, q in enumerate(self.questions)
+                if isinstance(q, dict) and q.get('id') is not None}
+
+    def iter_raw(self, start=0, query=None):
+        """Gera (posição, pergunta salva) a partir de ``start``."""
+        for position in range(start, len(self.questions)):
+            yield position, self.questions[position]
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE, query=None, correct=None, fields=None):
+        """Página da listagem a partir do cursor, com busca por texto e filtro pela resposta."""
+        start = decode_cursor(cursor)
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        query = (query or '').strip().lower() or None
+        if correct not in (None, ''):
+            correct = _answer_index({'correct': int(correct) if str(correct).isdigit() else correct})
+            if correct is None:
+                raise QuestionError("filtro 'correct' deve ser o índice (0–3) ou a letra da resposta")
+        else:
+            correct = None
+        items = []
+        next_cursor = None
+        for position, raw in self.iter_raw(start, query):
+            if not _matches(raw, query, correct):
+                continue
+            if len(items) == limit:
+                next_cursor = encode_cursor(position)
+                break
+            items.append(project_question(position, raw, fields))
+        return {'questions': items, 'next_cursor': next_cursor, 'total': len(self)}
+
+    def apply_import(self, importer, storage):
+        """Grava as mudanças de um ``QuestionImporter`` e retorna o novo banco."""
+        if importer.mode == 'replace':
+            questions, prepared = [], []
+        else:
+            questions, prepared = list(self.questions), list(self.prepared)
+        for position in sorted(importer.changes):
+            question, item = importer.changes[position]
+            if position == len(questions):
+                questions.append(question)
+                prepared.append(item)
+            else:
+                questions[position] = question
+                prepared[position] = item
+        if importer.mode == 'replace':
+            storage.save_questions(questions)
+        else:
+            storage.update_questions(questions, importer.changes.keys())
+        return QuestionBank(questions, prepared)
+
+    def delete(self, position, storage):
+        """Remove a pergunta da posição (as seguintes sobem uma posição)."""
+        questions = self.questions[:position] + self.questions[position + 1:]
+        bank = QuestionBank.from_raw(questions, skip_invalid=True)
+        storage.save_questions(bank.questions)
+        return bank
+
+
+class WindowedQuestionBank(QuestionBank):
+    """Banco lido do armazenamento por páginas (requer ``load_questions_page``).
+
+    Em memória ficam só o índice (total e posição de cada ``id``) e a janela de
+    ``window`` perguntas a partir da última acessada. O quiz avança em ordem,
+    então cada leitura do armazenamento serve ``window`` perguntas. Perguntas
+    salvas inválidas aparecem como ``None`` e são puladas pelo quiz.
+    """
+
+    windowed = True
+
+    def __init__(self, storage, window=200, on_invalid=None):
+        self.storage = storage
+        self.window = max(1, window)
+        self.on_invalid = on_invalid
+        self._count = storage.count_questions()
+        self._ids = storage.question_id_positions()
+        self._lock = threading.Lock()
+        self._start = 0
+        self._items = []
+
+    @property
+    def questions(self):
+        return self.storage.load_questions() or []
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        with self._lock:
+            offset = index - self._start
+            if not 0 <= offset < len(self._items):
+                self._load_window(index)
+                offset = 0
+            return self._items[offset]
+
+    def _load_window(self, start):
+        items = []
+        for position, raw in enumerate(self.storage.load_questions_page(start, self.window), start):
+            try:
+                items.append(PreparedQuestion(raw, position))
+            except QuestionError as e:
+                items.append(None)
+                if self.on_invalid is not None:
+                    self.on_invalid(position, e)
+        self._start, self._items = start, items
+
+    def raw(self, position):
+        rows = self.storage.load_questions_page(position, 1) if position >= 0 else []
+        if not rows:
+            raise IndexError(position)
+        return rows[0]
+
+    def all_raw(self):
+        return self.questions
+
+    def id_positions(self):
+        return dict(self._ids)
+
+    def iter_raw(self, start=0, query=None):
+        # A busca é pré-filtrada no armazenamento; o filtro exato é feito em page()
+        while True:
+            rows = self.storage.search_questions_page(start, SCAN_PAGE_SIZE, query)
+            if not rows:
+                return
+            yield from rows
+            start = rows[-1][0] + 1
+
+    def apply_import(self, importer, storage):
+        if importer.mode == 'replace':
+            storage.save_questions([importer.changes[p][0] for p in sorted(importer.changes)])
+        else:
+            storage.upsert_questions({p: change[0] for p, change in importer.changes.items()}, importer.count)
+        return WindowedQuestionBank(storage, self.window, self.on_invalid)
+
+    def delete(self, position, storage):
+        storage.delete_question(position)
+        return WindowedQuestionBank(storage, self.window, self.on_invalid)
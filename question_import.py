@@ -0,0 +1,189 @@
+"""Importação de perguntas em massa, linha a linha.
+
+O arquivo é lido em streaming (NDJSON, CSV ou um array JSON) e cada item é
+validado e normalizado assim que chega, com os erros reportados por linha. Um
+item inválido é descartado sem afetar os demais. Os modos são:
+
+- ``replace``: as perguntas importadas substituem o banco inteiro;
+- ``append``: as perguntas são adicionadas ao final;
+- ``upsert``: perguntas com ``id`` igual a uma existente a substituem na mesma
+  posição; as demais são adicionadas ao final.
+
+Colunas do CSV: ``question``, ``option_a`` a ``option_d`` (ou ``a`` a ``d``),
+``correct`` (índice 0–3 ou letra), ``explanation`` e ``id`` (opcionais).
+"""
+import csv
+import json
+
+from question_bank import PreparedQuestion, QuestionError
+
+IMPORT_MODES = ('replace', 'append', 'upsert')
+IMPORT_FORMATS = ('ndjson', 'csv', 'json')
+MAX_REPORTED_ERRORS = 100  # Erros listados na resposta; os demais só entram na contagem
+
+
+def detect_format(content_type=None, filename=None):
+    """Deduz o formato pelo Content-Type ou pela extensão do arquivo."""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    filename = (filename or '').lower()
+    if content_type in ('text/csv', 'application/csv') or filename.endswith('.csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines') \
+            or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if content_type == 'application/json' or filename.endswith('.json'):
+        return 'json'
+    return 'ndjson'
+
+
+def iter_ndjson(lines):
+    """Gera (número da linha, item ou QuestionError) para cada linha não vazia."""
+    for row, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, QuestionError(f"JSON inválido: {e}")
+
+
+def _csv_value(record, *names):
+    for name in names:
+        value = record.get(name)
+        if value is not None and value != '':
+            return value
+    return None
+
+
+def iter_csv(lines):
+    """Gera (número da linha, item ou QuestionError) a partir de um CSV com cabeçalho."""
+    reader = csv.DictReader(lines)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for record in reader:
+        row = reader.line_num
+        if not any((value or '').strip() for value in record.values() if isinstance(value, str)):
+            continue
+        options = [_csv_value(record, f'option_{letter}', letter) or '' for letter in 'abcd']
+        while options and not options[-1]:
+            options.pop()
+        correct = _csv_value(record, 'correct', 'correct_answer')
+        if isinstance(correct, str) and correct.strip().isdigit():
+            correct = int(correct)
+        item = {'question': _csv_value(record, 'question'), 'options': options, 'correct': correct}
+        for key in ('explanation', 'id'):
+            value = _csv_value(record, key)
+            if value is not None:
+                item[key] = value
+        yield row, item
+
+
+def iter_json_array(stream):
+    """Gera (posição, item) de um array JSON (o arquivo é lido inteiro)."""
+    data = json.load(stream)
+    if isinstance(data, dict) and 'questions' in data:
+        data = data['questions']
+    if not isinstance(data, list):
+        raise QuestionError("o JSON deve ser um array de perguntas")
+    for row, item in enumerate(data, 1):
+        yield row, item
+
+
+def iter_items(stream, import_format):
+    """Itera os itens de um stream de texto no formato indicado."""
+    if import_format == 'csv':
+        return iter_csv(stream)
+    if import_format == 'json':
+        return iter_json_array(stream)
+    return iter_ndjson(stream)
+
+
+def canonical_question(raw, prepared):
+    """Forma gravada no armazenamento: opções em lista e resposta por índice."""
+    question = {}
+    if 'id' in raw:
+        question['id'] = raw['id']
+    question['question'] = prepared.text
+    question['options'] = list(prepared.options)
+    question['correct_answer'] = prepared.correct
+    if raw.get('explanation'):
+        question['explanation'] = raw['explanation']
+    return question
+
+
+class QuestionImporter:
+    """Valida itens importados e calcula a posição de cada um no banco atual.
+
+    As mudanças ficam em ``changes`` (posição -> (pergunta, PreparedQuestion))
+    e são aplicadas de uma vez por ``QuestionBank.apply_import``.
+    """
+
+    def __init__(self, bank, mode='append'):
+        if mode not in IMPORT_MODES:
+            raise QuestionError(f"modo de importação inválido: {mode} (use {', '.join(IMPORT_MODES)})")
+        self.mode = mode
+        self.count = 0 if mode == 'replace' else len(bank)  # Total após as mudanças
+        # id -> posição, para o upsert
+        self._positions = {} if mode == 'replace' else bank.id_positions()
+        # No modo janela as perguntas normalizadas não ficam em memória
+        self._keep_prepared = not bank.windowed
+        self.changes = {}
+        self.received = 0
+        self.added = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add(self, row, raw, position=None):
+        """Valida e aplica um item; erros são registrados com o número da linha.
+
+        Com ``position`` o item substitui a pergunta dessa posição.
+        """
+        self.received += 1
+        try:
+            if isinstance(raw, Exception):
+                raise raw
+            if position is not None and not 0 <= position < self.count:
+                raise QuestionError(f"posição {position} não existe")
+            if position is None and self.mode == 'upsert' and isinstance(raw, dict) and raw.get('id') is not None:
+                position = self._positions.get(str(raw['id']))
+            index = self.count if position is None else position
+            prepared = PreparedQuestion(raw, index)
+        except QuestionError as e:
+            self.error_count += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({'row': row, 'message': str(e)})
+            return False
+        question = canonical_question(raw, prepared)
+        if position is None:
+            position = self.count
+            self.count += 1
+            self.added += 1
+        else:
+            self.updated += 1
+        if question.get('id') is not None:
+            self._positions[str(question['id'])] = position
+        self.changes[position] = (question, prepared if self._keep_prepared else None)
+        return True
+
+    def run(self, items):
+        for row, raw in items:
+            self.add(row, raw)
+        return self
+
+    @property
+    def imported(self):
+        return self.added + self.updated
+
+    def summary(self):
+        return {
+            'success': self.imported > 0 or self.error_count == 0,
+            'mode': self.mode,
+            'received': self.received,
+            'imported': self.imported,
+            'added': self.added,
+            'updated': self.updated,
+            'total': self.count,
+            'error_count': self.error_count,
+            'errors': self.errors
+        }
@@ -0,0 +1,175 @@
+"""Persistência do ranking com journal append-only.
+
+A cada pergunta apenas os pontos alterados são gravados em uma linha do
+journal (``ranking.json.journal``). Periodicamente o ranking completo é
+compactado em um snapshot (``ranking.json``) em uma thread separada, usando
+escrita em arquivo temporário + ``os.replace``. Na inicialização o snapshot é
+carregado e as entradas do journal com sequência maior são reaplicadas.
+
+Formato do snapshot::
+
+    {"format": "ranking-snapshot/1", "seq": 42, "scores": {"nome": 10}}
+
+Um ``ranking.json`` antigo (dicionário simples nome -> pontos) é aceito como
+snapshot de sequência 0.
+"""
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 'ranking-snapshot/1'
+
+
+class RankingJournal:
+    """Journal de deltas de pontuação com snapshots compactados."""
+
+    def __init__(self, snapshot_path, journal_path=None, compact_every=50):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or snapshot_path + '.journal'
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._file = None
+        self._seq = 0
+        self._entries_since_snapshot = 0
+        self._compact_thread = None
+
+    @property
+    def _old_journal_path(self):
+        return self.journal_path + '.old'
+
+    def load(self):
+        """Carrega o snapshot e reaplica o journal. Retorna o dicionário de pontuações."""
+        with self._lock:
+            scores, base_seq = self._read_snapshot()
+            seq = base_seq
+            replayed = 0
+            for path in (self._old_journal_path, self.journal_path):
+                for entry in self._read_entries(path):
+                    if entry['s'] <= base_seq:
+                        continue
+                    for name, points in entry['d'].items():
+                        scores[name] = scores.get(name, 0) + points
+                    seq = max(seq, entry['s'])
+                    replayed += 1
+            self._seq = seq
+            self._entries_since_snapshot = replayed
+            if replayed:
+                logger.info(f"Journal do ranking: {replayed} entradas reaplicadas sobre o snapshot")
+            return scores
+
+    def append(self, deltas):
+        """Grava uma linha com os pontos alterados.
+
+        Retorna True quando já há entradas suficientes para compactar.
+        """
+        if not deltas:
+            return False
+        with self._lock:
+            self._seq += 1
+            line = json.dumps({'s': self._seq, 'd': deltas}, ensure_ascii=False, separators=(',', ':'))
+            journal = self._open_journal()
+            journal.write(line + '\n')
+            journal.flush()
+            self._entries_since_snapshot += 1
+            return self._entries_since_snapshot >= self.compact_every
+
+    def compact_async(self, scores):
+        """Gera um snapshot em segundo plano.
+
+        ``scores`` deve ser uma cópia do ranking consistente com a última
+        entrada gravada (ou seja, obtida logo após ``append``).
+        """
+        with self._lock:
+            if self._compact_thread and self._compact_thread.is_alive():
+                return False  # Compactação anterior ainda em andamento
+            seq = self._rotate_journal()
+        self._compact_thread = threading.Thread(target=self._write_snapshot, args=(scores, seq))
+        self._compact_thread.daemon = True
+        self._compact_thread.start()
+        return True
+
+    def compact(self, scores):
+        """Gera um snapshot de forma síncrona (inicialização e encerramento)."""
+        if self._compact_thread and self._compact_thread.is_alive():
+            self._compact_thread.join()
+        with self._lock:
+            seq = self._rotate_journal()
+        self._write_snapshot(scores, seq)
+
+    @property
+    def pending(self):
+        """Número de entradas do journal ainda não compactadas."""
+        return self._entries_since_snapshot
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _open_journal(self):
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        return self._file
+
+    def _rotate_journal(self):
+        # Move o journal atual para .old; novas entradas vão para um arquivo novo
+        if self._file:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self._old_journal_path):
+                # Sobra de uma compactação interrompida: juntar ao .old
+                with open(self._old_journal_path, 'a', encoding='utf-8') as old, \
+                        open(self.journal_path, 'r', encoding='utf-8') as current:
+                    old.write(current.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self._old_journal_path)
+        self._entries_since_snapshot = 0
+        return self._seq
+
+    def _write_snapshot(self, scores, seq):
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': SNAPSHOT_FORMAT, 'seq': seq, 'scores': scores},
+                          f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # O snapshot já contém tudo até ``seq``; o journal antigo pode ser removido
+            if os.path.exists(self._old_journal_path):
+                os.remove(self._old_journal_path)
+            logger.info(f"Snapshot do ranking salvo ({len(scores)} usuários, seq {seq})")
+        except Exception as e:
+            logger.error(f"Erro ao salvar snapshot do ranking: {e}")
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return {}, 0
+        with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get('format') == SNAPSHOT_FORMAT:
+            return dict(data.get('scores', {})), int(data.get('seq', 0))
+        # Formato antigo: dicionário simples nome -> pontos
+        return dict(data), 0
+
+    def _read_entries(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Linha incompleta (queda durante a escrita): ignorar
+                    logger.warning(f"Entrada inválida ignorada no journal do ranking: {path}")
+                    continue
+                yield entry
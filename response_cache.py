@@ -0,0 +1,55 @@
+"""Cache de respostas JSON com ETag para as APIs somente leitura.
+
+Cada entrada é identificada por uma chave e pela geração do estado de que ela
+depende (as versões do ``StateTracker``). Enquanto a geração não muda, o corpo
+já serializado e o ETag são reaproveitados; clientes que enviam
+``If-None-Match`` com o mesmo ETag recebem ``304 Not Modified`` sem corpo.
+"""
+import hashlib
+import json
+import threading
+
+from flask import Response, request
+
+
+class ResponseCache:
+    """Corpos JSON pré-serializados por (chave, geração)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # chave -> (geração, corpo, etag)
+
+    def get_or_build(self, key, generation, builder):
+        """Retorna (corpo, etag), serializando apenas quando a geração mudou.
+
+        O ``builder`` pode retornar dados para serializar ou o corpo já em bytes.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == generation:
+            return entry[1], entry[2]
+        body = builder()
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        with self._lock:
+            self._entries[key] = (generation, body, etag)
+        return body, etag
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def response(self, key, generation, builder):
+        """Monta a resposta Flask com ETag forte e suporte a ``If-None-Match``."""
+        body, etag = self.get_or_build(key, generation, builder)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Permitir cache no cliente, mas sempre revalidar com o servidor
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
@@ -0,0 +1,91 @@
+"""Linha do tempo das fases do quiz com prazos absolutos.
+
+Cada fase (pergunta, contagem de votos, resultados) termina em um prazo
+calculado sobre ``time.monotonic()``. A fase seguinte começa no prazo da
+anterior, e não no momento em que o loop terminou o trabalho entre as fases
+(fechar a rodada, salvar e ordenar o ranking, emitir eventos). Assim o trabalho
+lento consome o tempo da própria fase em vez de atrasar todo o ciclo, e o tempo
+restante informado aos clientes é sempre o real.
+"""
+import threading
+import time
+
+
+class PhaseClock:
+    """Prazo absoluto da fase atual do quiz."""
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, on_overrun=None):
+        self._clock = clock
+        self._sleep = sleep
+        self.on_overrun = on_overrun  # on_overrun(fase, segundos além do prazo) ao fim de cada fase
+        self._lock = threading.Lock()
+        self.phase = None
+        self.duration = 0
+        self._deadline = None
+
+    def begin(self, phase, duration, chained=True):
+        """Inicia uma fase e retorna o seu prazo (em ``clock()``).
+
+        Com ``chained`` a fase começa no prazo da anterior. Se o atraso
+        acumulado for maior que a própria fase (ex.: quiz pausado), a linha do
+        tempo recomeça a partir de agora.
+        """
+        now = self._clock()
+        with self._lock:
+            previous_phase, previous_deadline = self.phase, self._deadline
+            start = now
+            if chained and self._deadline is not None and now - self._deadline < duration:
+                start = self._deadline
+            self.phase = phase
+            self.duration = duration
+            self._deadline = start + duration
+            deadline = self._deadline
+        # Quanto a fase anterior passou do prazo (trabalho lento entre as fases)
+        if self.on_overrun is not None and previous_deadline is not None:
+            self.on_overrun(previous_phase, max(0.0, now - previous_deadline))
+        return deadline
+
+    def reset(self):
+        with self._lock:
+            self.phase = None
+            self.duration = 0
+            self._deadline = None
+
+    def sync(self, phase, remaining, duration=None):
+        """Ajusta a fase a partir do tempo restante informado por outro processo."""
+        with self._lock:
+            self.phase = phase
+            self.duration = remaining if duration is None else duration
+            self._deadline = None if remaining is None else self._clock() + remaining
+
+    @property
+    def deadline(self):
+        """Prazo da fase atual em ``clock()`` (None se não há fase)."""
+        return self._deadline
+
+    def remaining(self):
+        """Tempo restante da fase atual em segundos (0 se já terminou)."""
+        deadline = self._deadline
+        if deadline is None:
+            return 0.0
+        return max(0.0, deadline - self._clock())
+
+    def remaining_seconds(self):
+        """Tempo restante arredondado para cima, como exibido no cronômetro."""
+        remaining = self.remaining()
+        whole = int(remaining)
+        return whole + 1 if remaining > whole else whole
+
+    def deadline_epoch(self):
+        """Prazo da fase atual convertido para o relógio de parede (epoch)."""
+        if self._deadline is None:
+            return None
+        return time.time() + self.remaining()
+
+    def wait(self):
+        """Aguarda até o prazo da fase atual, mesmo que o sono acorde antes."""
+        while True:
+            remaining = self.remaining()
+            if remaining <= 0:
+                return
+            self._sleep(remaining)
@@ -0,0 +1,586 @@
+"""Sessões de quiz simultâneas no mesmo processo.
+
+Cada sessão tem as suas próprias configurações (link do YouTube, tempos,
+comandos de voto), o seu cursor no banco de perguntas compartilhado, a sua
+rodada de votos, a sua fonte de chat e o seu ranking, gravado em
+``data/sessions/<id>/``. Os eventos Socket.IO são emitidos para a sala do
+tópico na sessão (``<id>:<tópico>``, veja ``topics``) no namespace
+``/sessions``, com os mesmos nomes do quiz principal.
+
+Todas as sessões são conduzidas por uma única thread (``SessionManager``):
+a cada tick ela avança as fases cujo prazo venceu, consulta o simulador
+(``SimulatedChatSource.poll``) e emite os lotes de votos e chat de cada sessão. Só a leitura do
+chat real do YouTube usa uma thread por sessão, porque ela bloqueia; ela é
+mantida por um ``ChatSupervisor`` (reconexão com espera e sem duplicar
+mensagens, veja ``chat_supervisor``). A gravação do ranking também sai dessa
+thread: os pontos de cada pergunta vão para uma fila consumida por uma thread
+de escrita, para que um disco lento não atrase as fases das outras sessões.
+
+Uma sessão parada guarda apenas as configurações e a posição na fila de
+perguntas; rodada, histórico do chat e ranking são criados ao iniciar e
+liberados ao parar. O armazenamento é aberto uma vez por sessão (também para
+consultar o ranking com ela parada) e fechado ao parar, remover ou encerrar.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+from broadcast import BroadcastAggregator
+from chat_sources import SimulatedChatSource
+from chat_supervisor import ChatSupervisor
+from chat_history import ChatHistory
+from leaderboard import Leaderboard
+from log_setup import RateLimiter
+from scheduler import PhaseClock
+from storage import DEFAULT_DB_NAME, create_storage
+from topics import TOPICS, event_room, topic_room
+from vote_parser import VoteClassifier
+from votes import ACCEPTED, VoteRound
+
+logger = logging.getLogger(__name__)
+
+error_log_limiter = RateLimiter(interval=10.0)
+
+SESSION_ID_PATTERN = re.compile(r'^[a-z0-9_-]{1,40}$')
+SESSION_FILE = 'session.json'
+NAMESPACE = '/sessions'
+OPTION_COUNT = 4
+
+# Configurações próprias de cada sessão (o restante vem do quiz principal)
+SESSION_DEFAULTS = {
+    'name': '',
+    'youtube_url': '',
+    'answer_time': 20,
+    'vote_count_time': 8,
+    'result_display_time': 5,
+    'enable_chat_simulator': True,
+    'chat_history_size': 100,
+    'vote_aliases': {},
+    'accept_bare_letters': False
+}
+DURATION_KEYS = ('answer_time', 'vote_count_time', 'result_display_time')
+
+
+class SessionError(ValueError):
+    """Operação inválida em uma sessão (id, configuração ou estado)."""
+
+
+def validate_session_config(values, base=None):
+    """Retorna a configuração ``base`` atualizada com ``values`` validados."""
+    if not isinstance(values, dict):
+        raise SessionError("a configuração deve ser um objeto JSON")
+    config = dict(base or SESSION_DEFAULTS)
+    for key, value in values.items():
+        if key not in SESSION_DEFAULTS:
+            continue
+        if key in DURATION_KEYS or key == 'chat_history_size':
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise SessionError(f"{key} deve ser um número inteiro")
+            if value < 1:
+                raise SessionError(f"{key} deve ser maior que zero")
+        elif key == 'vote_aliases':
+            if not isinstance(value, dict):
+                raise SessionError("vote_aliases deve ser um objeto")
+            try:
+                VoteClassifier(OPTION_COUNT, aliases=value)
+            except ValueError as e:
+                raise SessionError(f"vote_aliases: {e}")
+        elif key in ('enable_chat_simulator', 'accept_bare_letters'):
+            value = bool(value)
+        else:
+            value = str(value or '').strip()
+        config[key] = value
+    return config
+
+
+class QuizSession:
+    """Estado de uma sessão; os campos da rodada só existem enquanto ela roda."""
+
+    __slots__ = ('id', 'config', 'directory', 'question_index', 'running', 'phase', 'clock',
+                 'current_question', 'round', 'classifier', 'chat_history', 'ranking',
+                 'storage', 'broadcaster', 'last_results', 'simulator', 'chat',
+                 'next_flush', 'lock')
+
+    def __init__(self, session_id, directory, config=None, question_index=0):
+        self.id = session_id
+        self.config = validate_session_config(config or {})
+        self.directory = directory
+        self.question_index = question_index
+        self.running = False
+        self.phase = 'idle'
+        self.clock = None
+        self.current_question = None
+        self.round = None
+        self.classifier = None
+        self.chat_history = None
+        self.ranking = None
+        self.storage = None
+        self.broadcaster = None
+        self.last_results = None
+        self.simulator = None  # SimulatedChatSource, consultado a cada tick
+        self.chat = None  # ChatSupervisor do chat do YouTube, enquanto a sessão roda
+        self.next_flush = 0.0
+        self.lock = threading.RLock()
+
+    def save(self):
+        """Grava as configurações e a posição na fila de perguntas."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, SESSION_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'config': self.config, 'question_index': self.question_index},
+                      f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+
+    def open_storage(self):
+        """Armazenamento do ranking da sessão (JSON ou SQLite, como o principal).
+
+        É aberto na primeira chamada e reaproveitado até ``close_storage``.
+        """
+        with self.lock:
+            if self.storage is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.storage = create_storage(self.directory,
+                                              db_path=os.path.join(self.directory, DEFAULT_DB_NAME))
+            return self.storage
+
+    def close_storage(self):
+        """Fecha o armazenamento aberto; retorna o objeto fechado ou None."""
+        with self.lock:
+            storage, self.storage = self.storage, None
+        if storage is not None:
+            storage.close()
+        return storage
+
+    def load_ranking(self):
+        """Lê o ranking gravado (usado também com a sessão parada)."""
+        return Leaderboard(self.open_storage().load_ranking() or {})
+
+    def top_ranking(self, n=10):
+        ranking = self.ranking
+        if ranking is None:
+            ranking = self.load_ranking()
+        return ranking.top(n)
+
+    def votes(self):
+        counts = self.round.counts() if self.round is not None else [0] * OPTION_COUNT
+        return {letter: counts[i] for i, letter in enumerate('ABCD')}
+
+    def phase_timing(self):
+        clock = self.clock
+        if clock is None:
+            return {'remaining_time': 0, 'deadline': None}
+        return {'remaining_time': clock.remaining_seconds(), 'deadline': clock.deadline_epoch()}
+
+    def summary(self):
+        question = self.current_question
+        return {
+            'id': self.id,
+            'config': self.config,
+            'quiz_running': self.running,
+            'phase': self.phase,
+            'question_num': question.index + 1 if question is not None else None,
+            'chat_source': 'simulator' if self.simulator is not None else (self.chat.kind if self.chat is not None else None),
+            'chat': self.chat.health() if self.chat is not None else None,
+            **self.phase_timing()
+        }
+
+
+class SessionManager:
+    """Cria, persiste e conduz as sessões de quiz com uma única thread."""
+
+    def __init__(self, socketio, data_dir, question_bank, open_source=None, normalize_url=None,
+                 tick=0.2):
+        self.socketio = socketio
+        self.directory = os.path.join(data_dir, 'sessions')
+        self.question_bank = question_bank  # Função que retorna o banco de perguntas atual
+        self.open_source = open_source  # open_source(url) -> ChatSource do chat ao vivo
+        self.normalize_url = normalize_url
+        self.tick = tick
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._writes = queue.Queue()  # (sessão, função, argumentos) para a thread de escrita
+        self._writer = None
+        self.load()
+
+    # Cadastro
+    def load(self):
+        """Carrega as sessões gravadas (apenas as configurações)."""
+        if not os.path.isdir(self.directory):
+            return
+        for session_id in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, session_id, SESSION_FILE)
+            if not SESSION_ID_PATTERN.match(session_id) or not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._sessions[session_id] = QuizSession(
+                    session_id, os.path.dirname(path), data.get('config'), data.get('question_index', 0)
+                )
+            except (OSError, ValueError) as e:
+                logger.error(f"Erro ao carregar a sessão {session_id}: {e}")
+        if self._sessions:
+            logger.info(f"{len(self._sessions)} sessão(ões) carregada(s)")
+
+    def get(self, session_id):
+        return self._sessions.get(session_id)
+
+    def list(self):
+        return [session.summary() for session in list(self._sessions.values())]
+
+    def active_count(self):
+        return sum(1 for session in list(self._sessions.values()) if session.running)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, session_id, config=None):
+        session_id = str(session_id or '').strip().lower()
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise SessionError("id inválido: use até 40 letras minúsculas, números, '-' ou '_'")
+        with self._lock:
+            if session_id in self._sessions:
+                raise SessionError(f"a sessão {session_id} já existe")
+            session = QuizSession(session_id, os.path.join(self.directory, session_id),
+                                  validate_session_config(config or {}))
+            session.save()
+            self._sessions[session_id] = session
+        logger.info(f"Sessão {session_id} criada")
+        return session
+
+    def update_config(self, session, values):
+        with session.lock:
+            session.config = validate_session_config(values, session.config)
+            session.save()
+            if session.running:
+                # Comandos de voto e histórico valem a partir de agora; a fonte de chat é reaberta
+                session.classifier = self._build_classifier(session.config)
+                session.chat_history.resize(session.config['chat_history_size'])
+                self._open_chat(session)
+        return session
+
+    def delete(self, session):
+        self.stop(session)
+        session.close_storage()
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        shutil.rmtree(session.directory, ignore_errors=True)
+        logger.info(f"Sessão {session.id} removida")
+
+    # Execução
+    def start(self, session):
+        with session.lock:
+            if session.running:
+                raise SessionError("o quiz desta sessão já está em execução")
+            if not self.question_bank():
+                raise SessionError("nenhuma pergunta cadastrada")
+            # Um stop recente pode ainda ter gravações na fila
+            self._writes.join()
+            session.ranking = Leaderboard(session.open_storage().load_ranking() or {})
+            session.classifier = self._build_classifier(session.config)
+            history = session.chat_history = ChatHistory(session.config['chat_history_size'])
+            session.broadcaster = BroadcastAggregator(
+                self.socketio, session.votes, room_for=lambda event: event_room(event, session.id),
+                namespace=NAMESPACE, autostart=False, chat_epoch=lambda: history.epoch
+            )
+            session.clock = PhaseClock()
+            session.phase = None
+            session.last_results = None
+            session.running = True
+            self._open_chat(session)
+        self._emit(session, 'status', {'quiz_running': True})
+        logger.info(f"Sessão {session.id} iniciada")
+        self._ensure_started()
+        self._wakeup.set()
+
+    def stop(self, session):
+        with session.lock:
+            if not session.running:
+                return False
+            session.running = False
+            self._close_chat(session)
+            session.broadcaster.stop()
+            try:
+                session.save()
+            except Exception as e:
+                logger.error(f"Erro ao gravar a sessão {session.id}: {e}")
+            # Compactar e fechar depois dos pontos que ainda estão na fila de escrita
+            storage = session.storage
+            self._persist(session, storage.checkpoint, session.ranking.to_dict)
+            self._persist(session, storage.close)
+            # Liberar tudo o que só é usado com o quiz rodando
+            session.phase = 'idle'
+            session.clock = None
+            session.current_question = None
+            session.round = None
+            session.classifier = None
+            session.chat_history = None
+            session.ranking = None
+            session.storage = None
+            session.broadcaster = None
+            session.last_results = None
+            session.simulator = None
+        self._writes.join()
+        self._emit(session, 'status', {'quiz_running': False})
+        logger.info(f"Sessão {session.id} parada")
+        return True
+
+    def shutdown(self):
+        """Grava o ranking das sessões em execução e fecha o armazenamento (chamado ao encerrar)."""
+        for session in list(self._sessions.values()):
+            self.stop(session)
+            session.close_storage()
+
+    def rooms(self, session, topics=TOPICS):
+        """Salas da sessão para os tópicos assinados."""
+        return [topic_room(topic, session.id) for topic in topics]
+
+    def initial_events(self, session, topics=TOPICS):
+        """Eventos enviados a um cliente que acabou de assinar tópicos da sessão."""
+        events = [('status', {'quiz_running': session.running})]
+        if 'ranking' in topics:
+            events.append(('update_ranking', {'ranking': session.top_ranking(10)}))
+        with session.lock:
+            if 'quiz' in topics and session.running and session.current_question is not None:
+                events.append(('next_question', self._next_question_event(session)))
+                if session.phase == 'results' and session.last_results:
+                    events.append(('show_results', {**session.last_results, **session.phase_timing()}))
+        return events
+
+    # Chat
+    def _build_classifier(self, config):
+        try:
+            return VoteClassifier(OPTION_COUNT, aliases=config.get('vote_aliases') or {},
+                                  accept_bare_letters=config.get('accept_bare_letters', False))
+        except Exception as e:
+            logger.error(f"Configuração de votos inválida, usando o padrão: {e}")
+            return VoteClassifier(OPTION_COUNT)
+
+    def _open_chat(self, session):
+        """Conecta a sessão ao chat do YouTube ou ao simulador."""
+        self._close_chat(session)
+        if session.config['enable_chat_simulator'] or self.open_source is None:
+            session.simulator = SimulatedChatSource()
+            return
+        url = session.config['youtube_url']
+        normalized_url = self.normalize_url(url) if self.normalize_url and url else url
+        if not normalized_url:
+            self._system_message(session, f'Erro: URL do YouTube inválida ou não configurada: {url}')
+            session.simulator = SimulatedChatSource()
+            return
+        logger.info(f"Sessão {session.id}: conectando ao chat do YouTube: {normalized_url}")
+        # Quedas do chat são reconectadas pelo supervisor, sem trocar para o simulador
+        session.chat = ChatSupervisor(
+            self.open_source,
+            lambda batch, source: self.handle_batch(session, batch),
+            name=f'session-{session.id}',
+            on_state=lambda state, detail: self._chat_state_changed(session, state, detail)
+        )
+        session.chat.start(normalized_url)
+
+    def _close_chat(self, session):
+        # O leitor cancelado não entrega mais mensagens, mesmo se estiver bloqueado
+        session.simulator = None
+        if session.chat is not None:
+            session.chat.stop()
+            session.chat = None
+
+    def _chat_state_changed(self, session, state, detail):
+        if state == 'connected':
+            self._system_message(session, 'Conexão com chat estabelecida com sucesso!')
+        elif state == 'reconnecting' and detail:
+            self._system_message(session, f'Chat desconectado: {detail}')
+
+    def handle_batch(self, session, messages):
+        """Registra votos e mensagens de um lote ``[(message_id, autor, texto), ...]``."""
+        # Referências locais: a sessão pode ser parada por outra thread
+        classifier, vote_round = session.classifier, session.round
+        history, broadcaster = session.chat_history, session.broadcaster
+        if classifier is None or history is None or broadcaster is None:
+            return
+        vote_indexes = classifier.classify_batch([text for _, _, text in messages])
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for (_, author, text), vote_index in zip(messages, vote_indexes):
+            if (vote_index is not None and vote_round is not None
+                    and vote_round.register(author, vote_index) == ACCEPTED):
+                if debug:
+                    logger.debug(f"Sessão {session.id}: {author} votou na opção !{classifier.letter(vote_index)}")
+                broadcaster.add_vote(vote_index)
+            record = history.append(author, text)
+            broadcaster.add_chat(author, text, record['timestamp'], record['id'])
+
+    def _system_message(self, session, message):
+        self._emit(session, 'chat_message', {'author': 'Sistema', 'message': message})
+
+    # Fases
+    def _emit(self, session, event, data):
+        self.socketio.emit(event, data, to=event_room(event, session.id), namespace=NAMESPACE)
+
+    def _next_question_event(self, session):
+        return {
+            'question': session.current_question.socket_question,
+            'question_num': session.question_index + 1,
+            'total_questions': len(self.question_bank()),
+            'answer_time': session.config['answer_time'],
+            **session.phase_timing()
+        }
+
+    def _begin_question(self, session):
+        bank = self.question_bank()
+        if not bank:
+            return False
+        # Pular perguntas salvas inválidas (modo janela)
+        for _ in range(len(bank)):
+            session.question_index %= len(bank)
+            question = bank[session.question_index]
+            if question is not None:
+                break
+            session.question_index += 1
+        else:
+            return False
+        session.current_question = question
+        session.round = VoteRound(session.question_index)
+        session.broadcaster.reset_votes()
+        session.clock.begin('question', session.config['answer_time'])
+        session.phase = 'question'
+        session.last_results = None
+        logger.info(f"Sessão {session.id}: pergunta {session.question_index + 1}/{len(bank)}: {question.text}",
+                    extra={'session': session.id, 'question_num': session.question_index + 1})
+        self._emit(session, 'next_question', self._next_question_event(session))
+        return True
+
+    def _begin_counting(self, session):
+        session.clock.begin('counting', session.config['vote_count_time'])
+        session.phase = 'counting'
+        self._emit(session, 'show_counting_votes', {
+            'time': session.config['vote_count_time'],
+            **session.phase_timing()
+        })
+
+    def _begin_results(self, session):
+        session.clock.begin('results', session.config['result_display_time'])
+        question = session.current_question
+        vote_snapshot = session.round.close()
+
+        # Pontuar quem acertou e gravar só o que mudou nesta pergunta
+        ranking = session.ranking
+        deltas = {}
+        for user, vote in vote_snapshot.user_votes.items():
+            if vote == question.correct:
+                ranking.add_points(user, 1)
+                deltas[user] = 1
+            elif user not in ranking:
+                ranking.add_points(user, 0)
+                deltas[user] = 0
+        self._persist(session, session.storage.append_ranking_deltas, deltas, ranking.to_dict)
+
+        votes = session.votes()
+        logger.info(f"Sessão {session.id}: resposta correta={question.correct_letter}, votos={votes}",
+                    extra={'session': session.id, 'question_num': session.question_index + 1,
+                           'correct': question.correct_letter, 'voters': len(vote_snapshot.user_votes)})
+        session.last_results = {
+            'correct_answer': question.correct_letter,
+            'explanation': question.explanation,
+            'votes': votes
+        }
+        session.phase = 'results'
+        self._emit(session, 'show_results', {**session.last_results, **session.phase_timing()})
+        self._emit(session, 'update_ranking', {'ranking': ranking.top(10)})
+
+    def _advance(self, session):
+        """Passa para a próxima fase se o prazo da atual venceu."""
+        if session.phase is None:
+            if not self._begin_question(session):
+                return
+        while session.running and session.clock.remaining() <= 0:
+            if session.phase == 'question':
+                self._begin_counting(session)
+            elif session.phase == 'counting':
+                self._begin_results(session)
+            else:
+                session.question_index += 1
+                if not self._begin_question(session):
+                    return
+
+    def _tick(self, session, now):
+        """Processa uma sessão e retorna o próximo instante em que ela precisa da thread."""
+        with session.lock:
+            if not session.running:
+                return None
+            self._advance(session)
+            simulator = session.simulator
+            if simulator is not None:
+                batch = simulator.poll(now)
+                if batch:
+                    self.handle_batch(session, batch)
+            if now >= session.next_flush:
+                session.broadcaster.flush()
+                session.next_flush = now + self.tick
+            due = session.next_flush
+            if session.clock.deadline is not None:
+                due = min(due, session.clock.deadline)
+            if simulator is not None:
+                due = min(due, now + simulator.next_due(now))
+            return due
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            # Com eventlet/gevent o threading é substituído por green threads (monkey patching)
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+            self._writer = threading.Thread(target=self._write_loop)
+            self._writer.daemon = True
+            self._writer.start()
+
+    def _persist(self, session, func, *args):
+        """Agenda uma gravação do armazenamento da sessão na thread de escrita."""
+        self._writes.put((session, func, args))
+
+    def _write_loop(self):
+        while True:
+            session, func, args = self._writes.get()
+            try:
+                func(*args)
+            except Exception as e:
+                error_log_limiter.log(logger, logging.ERROR, ('write', session.id),
+                                      f"Sessão {session.id}: erro ao gravar o ranking: {e}")
+            finally:
+                self._writes.task_done()
+
+    def _run(self):
+        logger.info("Agendador de sessões iniciado")
+        while True:
+            active = [session for session in list(self._sessions.values()) if session.running]
+            if not active:
+                # Nenhuma sessão rodando: dormir até alguém iniciar uma
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            now = time.monotonic()
+            next_due = now + self.tick
+            for session in active:
+                try:
+                    due = self._tick(session, now)
+                except Exception as e:
+                    error_log_limiter.log(logger, logging.ERROR, ('tick', session.id),
+                                          f"Sessão {session.id}: erro no agendador: {e}")
+                    due = None
+                if due is not None:
+                    next_due = min(next_due, due)
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                self._wakeup.wait(delay)
+            self._wakeup.clear()
@@ -0,0 +1,186 @@
+"""Transporte e codificação dos eventos Socket.IO.
+
+- ``transport_options()``: opções do Engine.IO lidas do ambiente. Por padrão
+  o cliente começa em long-polling e migra para WebSocket assim que possível;
+  com ``QUIZ_SOCKETIO_TRANSPORTS=polling`` o upgrade é desativado (como antes),
+  e também no modo ``gevent`` sem o ``gevent-websocket`` instalado.
+  Intervalo e tolerância do ping, limite do buffer HTTP e compressão das
+  respostas do polling também são configuráveis.
+- ``EncodeOnceManager``: o python-socketio serializa o pacote de um evento uma
+  vez para cada destinatário; este gerenciador serializa uma única vez por
+  emissão e envia o mesmo texto a todos os clientes da sala.
+- ``compact_payload()``: formato curto (listas e chaves de uma letra) para os
+  eventos frequentes: ``update_votes``, ``chat_batch`` e ``update_ranking``
+  (também ``ranking_update``, a resposta ao ``get_ranking``).
+- ``CompactJson``: JSON sem escapar acentos (``ã`` ocupa 2 bytes em vez de 6).
+
+Variáveis de ambiente:
+
+- ``QUIZ_SOCKETIO_TRANSPORTS``: ``websocket`` (padrão) ou ``polling``;
+- ``QUIZ_PING_INTERVAL`` / ``QUIZ_PING_TIMEOUT``: em segundos (padrão 25/60);
+- ``QUIZ_MAX_HTTP_BUFFER``: maior mensagem aceita de um cliente (padrão 1 MB);
+- ``QUIZ_SOCKETIO_COMPRESSION``: ``0`` desativa a compressão do polling;
+- ``QUIZ_COMPRESSION_THRESHOLD``: tamanho mínimo comprimido (padrão 1024);
+- ``QUIZ_COMPACT_EVENTS``: ``0`` volta aos payloads com chaves completas;
+- ``QUIZ_SOCKETIO_ENCODE_ONCE``: ``0`` volta à serialização por cliente.
+"""
+import json
+import os
+
+import socketio
+from socketio import packet
+
+OPTION_LETTERS = ('A', 'B', 'C', 'D')
+
+
+def _env_flag(name, default=True):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def _env_number(name, default, cast=int):
+    try:
+        return cast(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def websocket_enabled(async_mode=None):
+    if os.environ.get('QUIZ_SOCKETIO_TRANSPORTS', 'websocket').strip().lower() == 'polling':
+        return False
+    if async_mode == 'gevent':
+        # O gevent só atende WebSocket com o gevent-websocket (dependência opcional)
+        try:
+            import geventwebsocket  # noqa: F401
+        except ImportError:
+            return False
+    return True
+
+
+def compact_events_enabled():
+    return _env_flag('QUIZ_COMPACT_EVENTS')
+
+
+def encode_once_enabled():
+    return _env_flag('QUIZ_SOCKETIO_ENCODE_ONCE')
+
+
+def transport_options(async_mode=None):
+    """Opções do ``SocketIO`` relativas a transporte, ping e compressão."""
+    return {
+        'allow_upgrades': websocket_enabled(async_mode),
+        'ping_interval': _env_number('QUIZ_PING_INTERVAL', 25, float),
+        'ping_timeout': _env_number('QUIZ_PING_TIMEOUT', 60, float),
+        'max_http_buffer_size': _env_number('QUIZ_MAX_HTTP_BUFFER', 1000000),
+        'http_compression': _env_flag('QUIZ_SOCKETIO_COMPRESSION'),
+        'compression_threshold': _env_number('QUIZ_COMPRESSION_THRESHOLD', 1024),
+        'json': CompactJson
+    }
+
+
+class CompactJson:
+    """Módulo JSON para o Socket.IO que mantém os caracteres não ASCII."""
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        kwargs.setdefault('ensure_ascii', False)
+        return json.dumps(obj, **kwargs)
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return json.loads(s, **kwargs)
+
+
+# Formatos curtos dos eventos frequentes
+def _compact_votes(data):
+    votes = data.get('votes') or {}
+    delta = data.get('delta') or {}
+    return {
+        'v': [votes.get(letter, 0) for letter in OPTION_LETTERS],
+        'd': [delta.get(letter, 0) for letter in OPTION_LETTERS]
+    }
+
+
+def _compact_chat(data):
+    compact = {'m': [
+        [m.get('id'), m.get('author'), m.get('message'),
+         round(m['timestamp'], 3) if m.get('timestamp') is not None else None]
+        for m in data.get('messages') or ()
+    ]}
+    if data.get('epoch') is not None:
+        compact['e'] = data['epoch']
+    return compact
+
+
+def _compact_ranking(data):
+    return {'r': [[entry['name'], entry['score']] for entry in data.get('ranking') or ()]}
+
+
+COMPACT_ENCODERS = {
+    'update_votes': _compact_votes,
+    'chat_batch': _compact_chat,
+    'update_ranking': _compact_ranking,
+    'ranking_update': _compact_ranking  # Resposta ao get_ranking, com o mesmo ranking
+}
+
+
+def compact_payload(event, data):
+    """Retorna o payload no formato curto, se o evento tiver um."""
+    encoder = COMPACT_ENCODERS.get(event)
+    if encoder is None or not isinstance(data, dict):
+        return data
+    return encoder(data)
+
+
+class _EncodedPacket:
+    """Pacote já serializado, reaproveitado para todos os destinatários."""
+
+    __slots__ = ('encoded',)
+
+    def __init__(self, pkt):
+        self.encoded = pkt.encode()
+
+    def encode(self):
+        return self.encoded
+
+
+class EncodeOnceManager(socketio.BaseManager):
+    """Gerenciador de clientes que serializa cada evento uma vez por emissão."""
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None, **kwargs):
+        # Com callback cada cliente recebe um id de ack próprio: caminho padrão
+        if callback is not None or self.server is None:
+            return super().emit(event, data, namespace, room=room, skip_sid=skip_sid,
+                                callback=callback, **kwargs)
+        if namespace not in self.rooms:
+            return
+        if not isinstance(skip_sid, list):
+            skip_sid = [skip_sid]
+        encoded = None
+        for sid, eio_sid in self.get_participants(namespace, room):
+            if sid in skip_sid:
+                continue
+            if encoded is None:
+                # Serializar só quando houver ao menos um destinatário
+                if isinstance(data, tuple):
+                    args = list(data)
+                elif data is not None:
+                    args = [data]
+                else:
+                    args = []
+                encoded = _EncodedPacket(self.server.packet_class(
+                    packet.EVENT, namespace=namespace, data=[event] + args))
+            self.server._send_packet(eio_sid, encoded)
+
+
+def encode_once(manager_class):
+    """Subclasse de um gerenciador com fila (Redis, Kombu...) que serializa uma vez.
+
+    ``EncodeOnceManager`` fica entre o gerenciador com fila e o ``BaseManager``,
+    então a entrega local das mensagens recebidas da fila usa o ``emit`` acima.
+    """
+    if not encode_once_enabled():
+        return manager_class
+    return type(f'EncodeOnce{manager_class.__name__}', (manager_class, EncodeOnceManager), {})
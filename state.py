@@ -0,0 +1,64 @@
+"""Versionamento do estado do quiz para long-polling.
+
+Cada parte do estado (status, pergunta, votos, chat, ranking, configurações e
+banco de perguntas) guarda a versão global em que mudou pela última vez. Clientes HTTP enviam a última versão que
+viram e recebem apenas as partes alteradas desde então; se nada mudou, a
+requisição fica aguardando até haver mudança ou o timeout expirar.
+"""
+import threading
+
+SECTIONS = ('status', 'question', 'votes', 'chat', 'ranking', 'config', 'questions')
+
+
+class StateTracker:
+    """Contador de versões por seção com espera bloqueante por mudanças."""
+
+    def __init__(self, sections=SECTIONS):
+        self._cond = threading.Condition()
+        # Começa na versão 1 para que um cliente novo (since=0) receba tudo
+        self._version = 1
+        self._section_versions = dict.fromkeys(sections, 1)
+
+    @property
+    def version(self):
+        return self._version
+
+    def section_version(self, section):
+        return self._section_versions[section]
+
+    def section_versions(self):
+        """Retorna uma cópia das versões de todas as seções."""
+        with self._cond:
+            return dict(self._section_versions)
+
+    def bump(self, *sections):
+        """Marca as seções como alteradas e acorda quem está aguardando."""
+        if not sections:
+            return self._version
+        with self._cond:
+            self._version += 1
+            for section in sections:
+                self._section_versions[section] = self._version
+            self._cond.notify_all()
+            return self._version
+
+    def changed_since(self, since):
+        """Retorna (versão atual, seções alteradas depois de ``since``)."""
+        with self._cond:
+            return self._version, self._changed(since)
+
+    def wait_for_change(self, since, timeout):
+        """Aguarda até haver mudança depois de ``since`` ou até o timeout.
+
+        Retorna (versão atual, seções alteradas). A lista fica vazia se o
+        timeout expirar sem mudanças.
+        """
+        with self._cond:
+            # Versão maior que a do servidor (ex.: servidor reiniciado): enviar tudo
+            if since > self._version:
+                return self._version, list(self._section_versions)
+            self._cond.wait_for(lambda: self._version > since, timeout)
+            return self._version, self._changed(since)
+
+    def _changed(self, since):
+        return [section for section, version in self._section_versions.items() if version > since]
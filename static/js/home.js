@@ -30,9 +30,14 @@ document.addEventListener('DOMContentLoaded', function() {
     const jsonImport = document.getElementById('jsonImport');
     const fileImport = document.getElementById('fileImport');
     const closeBtns = document.querySelectorAll('.close');
+    const questionSearch = document.getElementById('questionSearch');
+    const btnLoadMoreQuestions = document.getElementById('btnLoadMoreQuestions');
 
     // Variáveis globais
-    let questions = [];
+    let questions = [];  // Apenas as páginas já carregadas (cada item traz a sua posição)
+    let nextCursor = null;
+    let searchTimer = null;
+    const QUESTIONS_PAGE_SIZE = 50;
 
     // Carregar configurações
     function loadConfig() {
@@ -72,17 +77,25 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Carregar perguntas
-    function loadQuestions() {
+    // Carregar perguntas por páginas (append=true carrega a próxima página)
+    function loadQuestions(append = false) {
         // Verificar se o elemento questionsList existe
-        if (questionsList) {
+        if (questionsList && !append) {
             questionsList.innerHTML = '<div class="loading">Carregando perguntas...</div>';
         }
         
-        fetch('/api/questions')
+        const params = new URLSearchParams({ limit: QUESTIONS_PAGE_SIZE });
+        if (append && nextCursor) params.set('cursor', nextCursor);
+        if (questionSearch && questionSearch.value.trim()) params.set('q', questionSearch.value.trim());
+        
+        fetch('/api/questions?' + params.toString())
             .then(response => response.json())
             .then(data => {
-                questions = data;
+                questions = append ? questions.concat(data.questions) : data.questions;
+                nextCursor = data.next_cursor;
+                if (btnLoadMoreQuestions) {
+                    btnLoadMoreQuestions.style.display = nextCursor ? 'inline-block' : 'none';
+                }
                 // Só renderizar as perguntas se o elemento questionsList existir
                 if (questionsList) {
                     renderQuestions();
@@ -105,6 +118,11 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
+        if (questions.length === 0 && questionSearch && questionSearch.value.trim()) {
+            questionsList.innerHTML = '<div class="empty-list">Nenhuma pergunta encontrada.</div>';
+            return;
+        }
+        
         if (questions.length === 0) {
             questionsList.innerHTML = '<div class="empty-list">Nenhuma pergunta cadastrada. Clique em "Adicionar Pergunta" para começar.</div>';
             return;
@@ -122,7 +140,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         <button class="edit" title="Editar"><i class="fas fa-edit"></i></button>
                         <button class="delete" title="Excluir"><i class="fas fa-trash"></i></button>
                     </div>
-                    <h3>${index + 1}. ${question.question}</h3>
+                    <h3>${question.position + 1}. ${question.question}</h3>
                     <div class="question-options">
                         <div class="question-option ${correctOptionIndex === 0 ? 'correct' : ''}">
                             <strong>A:</strong> ${options[0]}
@@ -258,10 +276,22 @@ document.addEventListener('DOMContentLoaded', function() {
         questionModal.style.display = 'block';
     }
 
-    // Excluir pergunta
+    // Excluir pergunta (as seguintes mudam de posição, então a lista é recarregada)
     function deleteQuestion(index) {
-        questions.splice(index, 1);
-        saveQuestions();
+        fetch(`/api/questions/${questions[index].position}`, { method: 'DELETE' })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    showNotification('Pergunta excluída com sucesso!', 'success');
+                    loadQuestions();
+                } else {
+                    showNotification('Erro ao excluir pergunta: ' + (data.message || 'Erro desconhecido'), 'error');
+                }
+            })
+            .catch(error => {
+                console.error('Erro ao excluir pergunta:', error);
+                showNotification('Erro ao excluir pergunta', 'error');
+            });
     }
 
     // Salvar pergunta (nova ou editada)
@@ -281,34 +311,34 @@ document.addEventListener('DOMContentLoaded', function() {
             explanation: explanation.value
         };
 
-        if (index === -1) {
-            // Nova pergunta
-            questions.push(question);
-        } else {
-            // Editar pergunta existente
-            questions[index] = question;
-        }
-
-        saveQuestions();
-        questionModal.style.display = 'none';
-    }
+        // Nova pergunta vai para o final; a editada é gravada na sua posição
+        const request = index === -1
+            ? fetch('/api/questions/import?format=json&mode=append', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify([question])
+            })
+            : fetch(`/api/questions/${questions[index].position}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(question)
+            });
 
-    // Salvar todas as perguntas no servidor
-    function saveQuestions() {
-        fetch('/api/questions', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ questions: questions })
-        })
+        request
         .then(response => response.json())
         .then(data => {
-            if (data.success) {
+            if (data.success && !data.error_count) {
                 showNotification('Perguntas salvas com sucesso!', 'success');
-                renderQuestions();
+                questionModal.style.display = 'none';
+                if (index === -1) {
+                    loadQuestions();
+                } else {
+                    questions[index] = data.question;
+                    renderQuestions();
+                }
             } else {
-                showNotification('Erro ao salvar perguntas', 'error');
+                const message = data.message || (data.errors && data.errors.length ? data.errors[0].message : '');
+                showNotification('Erro ao salvar perguntas: ' + message, 'error');
             }
         })
         .catch(error => {
@@ -317,19 +347,14 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Exportar perguntas como JSON
+    // Exportar perguntas como JSON (o banco inteiro, não só as páginas carregadas)
     function exportQuestions() {
-        const jsonData = JSON.stringify(questions, null, 2);
-        const blob = new Blob([jsonData], { type: 'application/json' });
-        const url = URL.createObjectURL(blob);
-        
         const a = document.createElement('a');
-        a.href = url;
+        a.href = '/api/questions';
         a.download = 'quiz-perguntas.json';
         document.body.appendChild(a);
         a.click();
         document.body.removeChild(a);
-        URL.revokeObjectURL(url);
     }
 
     // Abrir modal de importação
@@ -338,47 +363,45 @@ document.addEventListener('DOMContentLoaded', function() {
         importModal.style.display = 'block';
     }
 
-    // Importar perguntas do JSON
+    // Importar perguntas do JSON (o servidor valida cada pergunta e grava só o que mudou)
     function importQuestions() {
-        try {
-            const jsonData = jsonImport.value.trim();
-            if (!jsonData) {
-                showNotification('Por favor, insira um JSON válido', 'error');
-                return;
-            }
-            
-            const importedQuestions = JSON.parse(jsonData);
-            
-            // Validar formato das perguntas
-            if (!Array.isArray(importedQuestions)) {
-                throw new Error('O JSON deve ser um array de perguntas');
-            }
-            
-            importedQuestions.forEach(q => {
-                if (!q.question || !Array.isArray(q.options) || q.options.length !== 4 || 
-                    typeof q.correct_answer !== 'number' || !q.explanation) {
-                    throw new Error('Formato de pergunta inválido');
+        const jsonData = jsonImport.value.trim();
+        if (!jsonData) {
+            showNotification('Por favor, insira um JSON válido', 'error');
+            return;
+        }
+        
+        // Confirmar substituição ou adição
+        const action = confirm('Deseja substituir todas as perguntas existentes? Clique em OK para substituir ou Cancelar para adicionar às perguntas existentes.');
+        
+        fetch('/api/questions/import?format=json&mode=' + (action ? 'replace' : 'append'), {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: jsonData
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                let message = `${data.imported} pergunta(s) importada(s)`;
+                if (data.error_count) {
+                    message += `; ${data.error_count} com erro (linha ${data.errors[0].row}: ${data.errors[0].message})`;
                 }
-            });
-            
-            // Confirmar substituição ou adição
-            const action = confirm('Deseja substituir todas as perguntas existentes? Clique em OK para substituir ou Cancelar para adicionar às perguntas existentes.');
-            
-            if (action) {
-                // Substituir
-                questions = importedQuestions;
+                showNotification(message, 'success');
+                importModal.style.display = 'none';
+                loadQuestions();
             } else {
-                // Adicionar
-                questions = questions.concat(importedQuestions);
+                const firstError = data.errors && data.errors.length
+                    ? ` (linha ${data.errors[0].row}: ${data.errors[0].message})`
+                    : '';
+                showNotification('Erro ao importar: ' + (data.message || 'nenhuma pergunta válida') + firstError, 'error');
             }
-            
-            saveQuestions();
-            importModal.style.display = 'none';
-            
-        } catch (error) {
+        })
+        .catch(error => {
             console.error('Erro ao importar perguntas:', error);
             showNotification('Erro ao importar: ' + error.message, 'error');
-        }
+        });
     }
 
     // Importar de arquivo
@@ -409,6 +432,14 @@ document.addEventListener('DOMContentLoaded', function() {
     if (btnConfirmImport) btnConfirmImport.addEventListener('click', importQuestions);
     if (btnCancelImport) btnCancelImport.addEventListener('click', () => importModal.style.display = 'none');
     if (fileImport) fileImport.addEventListener('change', handleFileImport);
+    if (btnLoadMoreQuestions) btnLoadMoreQuestions.addEventListener('click', () => loadQuestions(true));
+    if (questionSearch) {
+        // Busca no servidor, depois de uma pausa na digitação
+        questionSearch.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => loadQuestions(), 300);
+        });
+    }
     
     // Event listeners para os presets de cores
     if (colorPresets && colorPresets.length > 0) {
@@ -454,6 +485,9 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // Recarregar a lista depois de importações feitas por import.js
+    window.loadQuestions = () => loadQuestions();
+
     // Inicialização
     loadConfig();
     loadQuestions();
@@ -26,123 +26,49 @@ document.addEventListener('DOMContentLoaded', function() {
         const file = event.target.files[0];
         if (!file) return;
         
-        const reader = new FileReader();
-        reader.onload = function(e) {
-            try {
-                const jsonData = e.target.result;
-                const importedQuestions = JSON.parse(jsonData);
-                
-                // Validar formato das perguntas
-                if (!Array.isArray(importedQuestions)) {
-                    throw new Error('O JSON deve ser um array de perguntas');
-                }
-                
-                // Processar as perguntas importadas
-                processImportedQuestions(importedQuestions);
-            } catch (error) {
-                showNotification('Erro ao importar: ' + error.message, 'error');
-            }
-        };
-        reader.onerror = function() {
-            showNotification('Erro ao ler o arquivo', 'error');
-        };
-        reader.readAsText(file);
+        // Confirmar substituição ou adição
+        const replace = confirm('Deseja substituir todas as perguntas existentes? Clique em OK para substituir ou Cancelar para adicionar às perguntas existentes (perguntas com o mesmo id são atualizadas).');
+        importQuestionsFile(file, replace ? 'replace' : 'upsert');
         
         // Limpar o valor do input para permitir selecionar o mesmo arquivo novamente
         fileImport.value = '';
     }
     
-    // Processar as perguntas importadas
-    function processImportedQuestions(importedQuestions) {
-        try {
-            console.log('Perguntas recebidas:', JSON.stringify(importedQuestions));
-            
-            // Converter perguntas para o formato correto
-            const convertedQuestions = importedQuestions.map(q => {
-                // Criar uma cópia da pergunta para não modificar o original
-                const question = { ...q };
-                
-                // Verificar se a pergunta tem os campos necessários
-                if (!question.question) {
-                    throw new Error('Pergunta sem texto');
-                }
-                
-                // Verificar e converter options se necessário
-                if (Array.isArray(question.options)) {
-                    // Converter de array para objeto
-                    question.options = {
-                        'A': question.options[0],
-                        'B': question.options[1],
-                        'C': question.options[2],
-                        'D': question.options[3]
-                    };
-                } else if (!question.options || typeof question.options !== 'object') {
-                    throw new Error('Formato de opções inválido');
-                }
-                
-                // Verificar e converter correct_answer para correct se necessário
-                if (question.correct_answer !== undefined && question.correct === undefined) {
-                    question.correct = question.correct_answer;
-                    delete question.correct_answer;
-                }
-                
-                // Verificar se correct é válido
-                if (typeof question.correct !== 'number' || question.correct < 0 || question.correct > 3) {
-                    throw new Error('Resposta correta inválida: ' + question.correct);
-                }
-                
-                return question;
-            });
-            
-            // Confirmar substituição ou adição
-            const action = confirm('Deseja substituir todas as perguntas existentes? Clique em OK para substituir ou Cancelar para adicionar às perguntas existentes.');
-            
-            // Obter perguntas atuais
-            fetch('/api/questions')
-                .then(response => response.json())
-                .then(currentQuestions => {
-                    let newQuestions;
-                    
-                    if (action) {
-                        // Substituir todas as perguntas
-                        newQuestions = convertedQuestions;
-                    } else {
-                        // Adicionar às perguntas existentes
-                        newQuestions = currentQuestions.concat(convertedQuestions);
-                    }
-                    
-                    // Salvar no servidor
-                    return fetch('/api/questions', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json'
-                        },
-                        body: JSON.stringify(newQuestions)
-                    });
-                })
-                .then(response => {
-                    if (!response.ok) {
-                        throw new Error(`Erro HTTP: ${response.status}`);
+    // Enviar o arquivo direto para o servidor (JSON, NDJSON ou CSV), que valida cada linha
+    function importQuestionsFile(file, mode) {
+        const params = new URLSearchParams({ mode: mode, filename: file.name });
+        
+        showNotification('Importando perguntas...', 'info');
+        fetch('/api/questions/import?' + params.toString(), {
+            method: 'POST',
+            headers: {
+                'Content-Type': file.type || 'application/octet-stream'
+            },
+            body: file
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    let message = `${data.imported} pergunta(s) importada(s) (${data.added} nova(s), ${data.updated} atualizada(s)).`;
+                    if (data.error_count) {
+                        message += ` ${data.error_count} linha(s) com erro.`;
+                        console.warn('Erros na importação:', data.errors);
                     }
-                    return response.json();
-                })
-                .then(data => {
-                    if (data.success) {
-                        showNotification('Perguntas importadas com sucesso!', 'success');
-                        // Recarregar perguntas
-                        if (typeof window.loadQuestions === 'function') {
-                            window.loadQuestions();
-                        }
-                    } else {
-                        showNotification('Erro ao salvar perguntas: ' + (data.message || 'Erro desconhecido'), 'error');
+                    showNotification(message, data.error_count ? 'warning' : 'success');
+                    // Recarregar perguntas
+                    if (typeof window.loadQuestions === 'function') {
+                        window.loadQuestions();
                     }
-                })
-                .catch(error => {
-                    showNotification('Erro ao salvar perguntas: ' + error.message, 'error');
-                });
-        } catch (error) {
-            showNotification('Erro ao processar perguntas: ' + error.message, 'error');
-        }
+                } else {
+                    const firstError = data.errors && data.errors.length
+                        ? ` (linha ${data.errors[0].row}: ${data.errors[0].message})`
+                        : '';
+                    showNotification('Erro ao importar perguntas: ' + (data.message || 'nenhuma pergunta válida') + firstError, 'error');
+                }
+            })
+            .catch(error => {
+                showNotification('Erro ao importar perguntas: ' + error.message, 'error');
+            });
     }
     
     // Exportar perguntas para JSON
@@ -33,10 +33,21 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentTime = 0;
     let socketConnected = false;
     let usingFallback = false;
-    let lastChatTimestamp = 0;
+    let lastChatId = 0;  // Id sequencial da última mensagem do chat recebida
+    let chatEpoch = '';  // Epoch do histórico do servidor que numerou lastChatId
     let fallbackPollingInterval = null;
+    let stateVersion = 0;         // Última versão do estado recebida via long-polling
+    let statePollingActive = false;
     let reconnectAttempts = 0;
     const MAX_RECONNECT_ATTEMPTS = 15;  // Aumentado para dar mais chances à conexão WebSocket
+    // Sessão exibida (/quiz?session=<id>); sem ela, o quiz principal
+    const SESSION_ID = new URLSearchParams(window.location.search).get('session');
+    // Tópicos recebidos (/quiz?role=overlay ou ?topics=quiz,votes); sem eles, todos
+    const PAGE_PARAMS = new URLSearchParams(window.location.search);
+    const SUBSCRIPTION = {};
+    if (PAGE_PARAMS.get('role')) SUBSCRIPTION.role = PAGE_PARAMS.get('role');
+    if (PAGE_PARAMS.get('topics')) SUBSCRIPTION.topics = PAGE_PARAMS.get('topics');
+    const SESSION_PAYLOAD = SESSION_ID ? { session: SESSION_ID, ...SUBSCRIPTION } : {};
 
     // Inicializar
     init();
@@ -58,18 +69,22 @@ document.addEventListener('DOMContentLoaded', function() {
     function connectSocket() {
         try {
             // Tentar conectar via Socket.IO
-            socket = io({
-                transports: ['polling'],  // Usar apenas polling, já que WebSockets estão falhando no Render
-                upgrade: false,           // Não tentar upgrade para websocket
+            const socketOptions = {
+                // Começa em polling e migra para WebSocket quando o servidor permite
+                transports: ['polling', 'websocket'],
+                upgrade: true,
                 reconnectionAttempts: MAX_RECONNECT_ATTEMPTS,
                 reconnectionDelay: 1000,
                 timeout: 60000,
                 forceNew: true,
                 path: '/socket.io/',
                 query: {
-                    t: new Date().getTime()
+                    t: new Date().getTime(),
+                    ...SUBSCRIPTION
                 }
-            });
+            };
+            // As sessões usam o namespace /sessions, com uma sala por sessão
+            socket = SESSION_ID ? io('/sessions', socketOptions) : io(socketOptions);
             
             // Configurar socket listeners
             setupSocketListeners();
@@ -78,13 +93,9 @@ document.addEventListener('DOMContentLoaded', function() {
             socket.on('connect', function() {
                 console.log('Conectado usando transporte:', socket.io.engine.transport.name);
                 
-                if (socket.io.engine.transport.name === 'websocket') {
-                    console.log('Conexão WebSocket estabelecida com sucesso!');
-                    addSystemMessage('Conexão WebSocket estabelecida com sucesso!');
-                } else {
-                    console.warn('Não está usando WebSocket! Usando:', socket.io.engine.transport.name);
-                    addSystemMessage('Aviso: Não está usando WebSocket!');
-                }
+                socket.io.engine.once('upgrade', function(transport) {
+                    console.log('Transporte atualizado para:', transport.name);
+                });
             });
             
             // Verificar se a conexão foi estabelecida após um tempo
@@ -115,6 +126,12 @@ document.addEventListener('DOMContentLoaded', function() {
     function activateFallbackMode() {
         usingFallback = true;
         
+        // O estado das sessões só é enviado pelo Socket.IO
+        if (SESSION_ID) {
+            addSystemMessage('Não foi possível conectar ao servidor. Recarregue a página para tentar novamente.');
+            return;
+        }
+        
         // Adicionar notificação de fallback
         addFallbackNotice();
         
@@ -144,31 +161,76 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Iniciar polling para atualizações no modo fallback
+    // Iniciar long-polling do estado no modo fallback
     function startFallbackPolling() {
         // Parar polling anterior se existir
         if (fallbackPollingInterval) {
             clearInterval(fallbackPollingInterval);
+            fallbackPollingInterval = null;
         }
         
-        // Verificar status inicial
-        checkQuizStatus();
+        if (statePollingActive) return;
+        statePollingActive = true;
+        pollState();
+    }
+    
+    // Uma única requisição que aguarda mudanças e traz apenas o que mudou
+    function pollState() {
+        fetch(`/api/quiz/state-http?since=${stateVersion}&chat_after=${lastChatId}&chat_epoch=${chatEpoch}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    stateVersion = data.version;
+                    syncChatEpoch(data.chat_epoch);
+                    applyStateChanges(data.changes || {});
+                    pollState();
+                } else {
+                    // Resposta de erro volta na hora: esperar para não repetir em laço
+                    setTimeout(pollState, 3000);
+                }
+            })
+            .catch(error => {
+                console.error('Erro no long-polling do estado:', error);
+                // Aguardar antes de tentar novamente para não sobrecarregar o servidor
+                setTimeout(pollState, 3000);
+            });
+    }
+    
+    // Aplicar as partes do estado que mudaram
+    function applyStateChanges(changes) {
+        if (changes.status) {
+            quizRunning = changes.status.quiz_running;
+            updateUI();
+        }
         
-        // Configurar polling a cada 2 segundos
-        fallbackPollingInterval = setInterval(function() {
-            checkQuizStatus();
-            
-            if (quizRunning) {
-                getCurrentQuestion();
-                getVotes();
-                getChatMessages();
+        if (changes.question) {
+            const state = changes.question;
+            if (state.phase === 'question') {
+                hideCountingVotes();
+                hideResults();
+                showQuestion(state.question, state.question_num, state.total_questions);
+                startTimer(state.remaining_time);
+            } else if (state.phase === 'counting') {
+                showCountingVotes();
+            } else if (state.phase === 'results' && state.results) {
+                hideCountingVotes();
+                showResults(state.results.correct_answer, state.results.explanation, state.results.votes);
             }
-        }, 2000);
+        }
         
-        // Carregar ranking a cada 5 segundos
-        setInterval(function() {
-            getRanking();
-        }, 5000);
+        if (changes.votes) {
+            updateAllVotes(changes.votes);
+        }
+        
+        if (changes.chat) {
+            changes.chat.forEach(msg => {
+                receiveChatMessage(msg);
+            });
+        }
+        
+        if (changes.ranking) {
+            updateRanking(changes.ranking);
+        }
     }
     
     // Verificar status do quiz via HTTP
@@ -198,10 +260,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     const question = data.question;
                     showQuestion(question, data.question_num, data.total_questions);
                     
-                    // Atualizar timer apenas se for diferente do atual
+                    // Sincronizar o timer com o tempo restante informado pelo servidor
                     if (currentTime !== data.remaining_time) {
-                        updateTimer(data.remaining_time);
-                        currentTime = data.remaining_time;
+                        startTimer(data.remaining_time);
                     }
                 }
             })
@@ -227,18 +288,12 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Obter mensagens do chat via HTTP
     function getChatMessages() {
-        fetch(`/api/quiz/chat-http?since=${lastChatTimestamp}`)
+        fetch(`/api/quiz/chat-http?after_id=${lastChatId}&epoch=${chatEpoch}`)
             .then(response => response.json())
             .then(data => {
+                if (data.success) syncChatEpoch(data.epoch);
                 if (data.success && data.messages && data.messages.length > 0) {
-                    data.messages.forEach(msg => {
-                        addChatMessage(msg.author, msg.message);
-                        
-                        // Atualizar o timestamp da última mensagem
-                        if (msg.timestamp > lastChatTimestamp) {
-                            lastChatTimestamp = msg.timestamp;
-                        }
-                    });
+                    data.messages.forEach(receiveChatMessage);
                 }
             })
             .catch(error => console.error('Erro ao obter mensagens do chat:', error));
@@ -246,7 +301,8 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Obter ranking via HTTP
     function getRanking() {
-        fetch('/api/ranking-http')
+        const url = SESSION_ID ? `/api/sessions/${encodeURIComponent(SESSION_ID)}/ranking` : '/api/ranking-http';
+        fetch(url)
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
@@ -297,17 +353,17 @@ document.addEventListener('DOMContentLoaded', function() {
             updateTimer(data.time);
         });
         
-        // Atualizar ranking
+        // Atualizar ranking (formato curto: {r: [[nome, pontos], ...]})
         socket.on('update_ranking', function(data) {
-            console.log('Ranking atualizado:', data);
-            updateRanking(data.ranking);
+            updateRanking(decodeRanking(data));
         });
         
-        // Adicionar listener para o evento ranking_update
+        // Resposta ao get_ranking (mesmo formato curto do update_ranking)
         socket.on('ranking_update', function(data) {
             console.log('Ranking recebido via ranking_update:', data);
-            if (data && data.success && data.ranking) {
-                updateRanking(data.ranking);
+            const ranking = decodeRanking(data);
+            if (ranking) {
+                updateRanking(ranking);
             }
         });
         
@@ -315,16 +371,27 @@ document.addEventListener('DOMContentLoaded', function() {
         socket.on('chat_message', function(data) {
             console.log('Mensagem de chat recebida:', data);
             addChatMessage(data.author, data.message);
-            
-            // Atualizar o timestamp da última mensagem para o modo fallback
-            if (data.timestamp) {
-                lastChatTimestamp = data.timestamp;
+        });
+        
+        // Receber lote de mensagens de chat (enviado a cada tick do servidor)
+        socket.on('chat_batch', function(data) {
+            if (!data) return;
+            syncChatEpoch(data.e || data.epoch);
+            // Formato curto: {e: epoch, m: [[id, autor, mensagem, timestamp], ...]}
+            if (data.m) {
+                data.m.forEach(m => receiveChatMessage({ id: m[0], author: m[1], message: m[2], timestamp: m[3] }));
+                return;
             }
+            if (data.messages) data.messages.forEach(receiveChatMessage);
         });
         
         // Atualizar votos
         socket.on('update_votes', function(data) {
-            console.log('Votos atualizados:', data);
+            // Formato curto: {v: [A, B, C, D], d: [delta...]}
+            if (data && data.v) {
+                updateAllVotes({ A: data.v[0], B: data.v[1], C: data.v[2], D: data.v[3] });
+                return;
+            }
             updateAllVotes(data.votes);
         });
 
@@ -350,7 +417,7 @@ document.addEventListener('DOMContentLoaded', function() {
             console.log('Próxima pergunta:', data);
             hideResults();
             showQuestion(data.question, data.question_num, data.total_questions);
-            startTimer(data.answer_time);
+            startTimer(data.remaining_time !== undefined ? data.remaining_time : data.answer_time);
         });
         
         // Evento de erro
@@ -363,6 +430,14 @@ document.addEventListener('DOMContentLoaded', function() {
         socket.on('connect', function() {
             console.log('Conectado ao servidor');
             socketConnected = true;
+            
+            // Entrar na sala da sessão (também após reconectar)
+            if (SESSION_ID) {
+                socket.emit('join_session', SESSION_PAYLOAD);
+            } else {
+                // Buscar o que chegou durante a desconexão
+                getChatMessages();
+            }
         });
         
         // Evento de desconexão
@@ -400,7 +475,7 @@ document.addEventListener('DOMContentLoaded', function() {
         console.log('Carregando ranking...');
         
         if (socketConnected) {
-            socket.emit('get_ranking', {});
+            socket.emit('get_ranking', SESSION_PAYLOAD);
         } else {
             getRanking();
         }
@@ -410,10 +485,10 @@ document.addEventListener('DOMContentLoaded', function() {
     function startQuiz() {
         if (!quizRunning) {
             if (socketConnected) {
-                socket.emit('start_quiz', {});
+                socket.emit('start_quiz', SESSION_PAYLOAD);
                 console.log('Solicitação para iniciar quiz enviada via Socket.IO');
             } else {
-                fetch('/api/quiz/start-http', {
+                fetch(SESSION_ID ? `/api/sessions/${encodeURIComponent(SESSION_ID)}/start` : '/api/quiz/start-http', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
@@ -441,10 +516,10 @@ document.addEventListener('DOMContentLoaded', function() {
     function stopQuiz() {
         if (quizRunning) {
             if (socketConnected) {
-                socket.emit('stop_quiz', {});
+                socket.emit('stop_quiz', SESSION_PAYLOAD);
                 console.log('Solicitação para parar quiz enviada via Socket.IO');
             } else {
-                fetch('/api/quiz/stop-http', {
+                fetch(SESSION_ID ? `/api/sessions/${encodeURIComponent(SESSION_ID)}/stop` : '/api/quiz/stop-http', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
@@ -487,27 +562,31 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // Iniciar o timer
+    // Iniciar o timer a partir do tempo restante informado pelo servidor
     function startTimer(seconds) {
         // Parar timer anterior se existir
         if (countdownInterval) {
             clearInterval(countdownInterval);
         }
         
-        // Definir tempo inicial
+        // Prazo local: a contagem é recalculada a partir dele e não acumula atraso
+        const deadline = Date.now() + seconds * 1000;
         currentTime = seconds;
         updateTimer(currentTime);
         
         // Iniciar contagem regressiva
         countdownInterval = setInterval(function() {
-            currentTime--;
-            updateTimer(currentTime);
+            const remaining = Math.max(0, Math.ceil((deadline - Date.now()) / 1000));
+            if (remaining !== currentTime) {
+                currentTime = remaining;
+                updateTimer(currentTime);
+            }
             
             if (currentTime <= 0) {
                 clearInterval(countdownInterval);
                 countdownInterval = null;
             }
-        }, 1000);
+        }, 250);
     }
 
     // Atualizar o timer na interface
@@ -524,6 +603,23 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Outro histórico no servidor (reiniciado ou sessão recarregada): os ids recomeçaram
+    function syncChatEpoch(epoch) {
+        if (epoch && epoch !== chatEpoch) {
+            chatEpoch = epoch;
+            lastChatId = 0;
+        }
+    }
+
+    // Exibir uma mensagem do histórico, ignorando as que já foram recebidas
+    function receiveChatMessage(msg) {
+        if (msg.id) {
+            if (msg.id <= lastChatId) return;
+            lastChatId = msg.id;
+        }
+        addChatMessage(msg.author, msg.message);
+    }
+
     // Adicionar mensagem ao chat
     function addChatMessage(author, message) {
         if (!chatContainer) return;
@@ -589,13 +685,18 @@ document.addEventListener('DOMContentLoaded', function() {
     function updateAllVotes(votesData) {
         if (!votesData) return;
         
-        const totalVotes = (votesData.a || 0) + (votesData.b || 0) + (votesData.c || 0) + (votesData.d || 0);
+        // Aceitar chaves minúsculas (HTTP) e maiúsculas (Socket.IO)
+        const a = votesData.a || votesData.A || 0;
+        const b = votesData.b || votesData.B || 0;
+        const c = votesData.c || votesData.C || 0;
+        const d = votesData.d || votesData.D || 0;
+        const totalVotes = a + b + c + d;
         
         // Atualizar cada opção
-        updateVotes('A', votesData.a || 0, totalVotes);
-        updateVotes('B', votesData.b || 0, totalVotes);
-        updateVotes('C', votesData.c || 0, totalVotes);
-        updateVotes('D', votesData.d || 0, totalVotes);
+        updateVotes('A', a, totalVotes);
+        updateVotes('B', b, totalVotes);
+        updateVotes('C', c, totalVotes);
+        updateVotes('D', d, totalVotes);
     }
 
     // Mostrar a mensagem "Contabilizando votos..."
@@ -673,6 +774,13 @@ document.addEventListener('DOMContentLoaded', function() {
         if (resultContainer) resultContainer.classList.remove('active');
     }
 
+    // Ranking de um update_ranking/ranking_update, no formato curto ou completo
+    function decodeRanking(data) {
+        if (!data) return null;
+        if (data.r) return data.r.map(entry => ({ name: entry[0], score: entry[1] }));
+        return data.ranking || null;
+    }
+
     // Atualizar ranking
     function updateRanking(ranking) {
         if (!rankList) return;
@@ -0,0 +1,323 @@
+"""Backends de armazenamento para perguntas, ranking e configurações.
+
+Dois backends estão disponíveis:
+
+- ``JsonStorage``: os arquivos ``data/*.json`` de sempre, agora gravados com
+  arquivo temporário + ``os.replace`` e com o ranking em journal append-only.
+- ``SqliteStorage``: banco SQLite embutido em modo WAL. O ranking é
+  atualizado com upserts em lote dentro de uma única transação e as
+  perguntas podem ser lidas por página.
+
+O backend é escolhido pela variável de ambiente ``QUIZ_STORAGE`` (``json`` ou
+``sqlite``). Para importar os arquivos JSON existentes para o SQLite::
+
+    python storage.py migrate --data-dir data --db data/quiz.db
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from ranking_journal import RankingJournal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_NAME = 'quiz.db'
+
+# Acima disso questions.json é gravado sem indentação (o encoder em C só é usado sem indent)
+JSON_INDENT_MAX_QUESTIONS = 1000
+
+
+def _write_json_atomic(path, data, indent=4):
+    """Grava JSON em um arquivo temporário e substitui o destino atomicamente."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
+
+
+class JsonStorage:
+    """Armazenamento em arquivos JSON no diretório de dados."""
+
+    name = 'json'
+
+    def __init__(self, data_dir, ranking_snapshot_every=50):
+        self.data_dir = data_dir
+        self.questions_file = os.path.join(data_dir, 'questions.json')
+        self.ranking_file = os.path.join(data_dir, 'ranking.json')
+        self.config_file = os.path.join(data_dir, 'config.json')
+        self.ranking_journal = RankingJournal(self.ranking_file, compact_every=ranking_snapshot_every)
+
+    # Configurações
+    def load_config(self):
+        """Retorna o dicionário de configurações ou None se não houver."""
+        if not os.path.exists(self.config_file):
+            return None
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_config(self, config):
+        _write_json_atomic(self.config_file, config)
+
+    # Perguntas
+    def load_questions(self):
+        """Retorna a lista de perguntas ou None se não houver banco de perguntas."""
+        if not os.path.exists(self.questions_file):
+            return None
+        with open(self.questions_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_questions(self, questions):
+        indent = 4 if len(questions) <= JSON_INDENT_MAX_QUESTIONS else None
+        _write_json_atomic(self.questions_file, questions, indent=indent)
+
+    def update_questions(self, questions, positions):
+        """Grava a lista após uma importação; o arquivo JSON é sempre reescrito inteiro."""
+        self.save_questions(questions)
+
+    def count_questions(self):
+        return len(self.load_questions() or [])
+
+    def load_questions_page(self, offset, limit):
+        return (self.load_questions() or [])[offset:offset + limit]
+
+    # Ranking
+    def load_ranking(self):
+        """Retorna o dicionário de pontuações ou None se não houver ranking salvo."""
+        if not (os.path.exists(self.ranking_file) or os.path.exists(self.ranking_journal.journal_path)):
+            return None
+        return self.ranking_journal.load()
+
+    def save_ranking(self, scores):
+        """Grava o ranking completo (snapshot compactado)."""
+        self.ranking_journal.compact(scores)
+
+    def append_ranking_deltas(self, deltas, scores_provider):
+        """Grava apenas os pontos alterados; compacta em segundo plano quando necessário."""
+        if self.ranking_journal.append(deltas):
+            self.ranking_journal.compact_async(scores_provider())
+
+    def checkpoint(self, scores_provider):
+        """Compacta o journal pendente (chamado ao encerrar)."""
+        if self.ranking_journal.pending:
+            self.ranking_journal.compact(scores_provider())
+        self.ranking_journal.close()
+
+    def close(self):
+        """Fecha o journal aberto para escrita."""
+        self.ranking_journal.close()
+
+
+def _py_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+class SqliteStorage:
+    """Armazenamento em SQLite (modo WAL)."""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS questions (
+            position INTEGER PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS ranking (
+            name TEXT PRIMARY KEY,
+            score INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS config (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        # lower() do SQLite só trata ASCII: a busca usa o do Python, como o banco em memória
+        self._conn.create_function('py_lower', 1, _py_lower, deterministic=True)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _transaction(self, statements):
+        """Executa uma lista de (sql, params|[params]) em uma única transação."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('BEGIN')
+            try:
+                for sql, params, many in statements:
+                    if many:
+                        cursor.executemany(sql, params)
+                    else:
+                        cursor.execute(sql, params)
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+
+    # Configurações
+    def load_config(self):
+        rows = self._query('SELECT key, value FROM config')
+        if not rows:
+            return None
+        return {key: json.loads(value) for key, value in rows}
+
+    def save_config(self, config):
+        self._transaction([
+            ('DELETE FROM config', (), False),
+            ('INSERT INTO config (key, value) VALUES (?, ?)',
+             [(key, json.dumps(value, ensure_ascii=False)) for key, value in config.items()], True)
+        ])
+
+    # Perguntas
+    def load_questions(self):
+        rows = self._query('SELECT data FROM questions ORDER BY position')
+        if not rows:
+            return None
+        return [json.loads(data) for (data,) in rows]
+
+    def save_questions(self, questions):
+        self._transaction([
+            ('DELETE FROM questions', (), False),
+            ('INSERT INTO questions (position, data) VALUES (?, ?)',
+             [(i, json.dumps(q, ensure_ascii=False)) for i, q in enumerate(questions)], True)
+        ])
+
+    def update_questions(self, questions, positions):
+        """Grava apenas as posições incluídas ou alteradas por uma importação."""
+        self.upsert_questions({i: questions[i] for i in positions}, len(questions))
+
+    def upsert_questions(self, changes, count):
+        """Grava ``changes`` (posição -> pergunta) e remove as posições a partir de ``count``."""
+        self._transaction([
+            ('DELETE FROM questions WHERE position >= ?', (count,), False),
+            ('INSERT OR REPLACE INTO questions (position, data) VALUES (?, ?)',
+             [(i, json.dumps(changes[i], ensure_ascii=False)) for i in sorted(changes)], True)
+        ])
+
+    def delete_question(self, position):
+        """Remove uma pergunta; as seguintes sobem uma posição."""
+        self._transaction([
+            ('DELETE FROM questions WHERE position = ?', (position,), False),
+            # Em dois passos para não violar a chave primária no meio da renumeração
+            ('UPDATE questions SET position = -position WHERE position > ?', (position,), False),
+            ('UPDATE questions SET position = -position - 1 WHERE position < 0', (), False)
+        ])
+
+    def question_id_positions(self):
+        """Índice ``str(id) -> posição`` das perguntas que têm ``id``."""
+        rows = self._query("SELECT position, json_extract(data, '$.id') FROM questions "
+                           "WHERE json_extract(data, '$.id') IS NOT NULL")
+        return {str(question_id): position for position, question_id in rows}
+
+    def search_questions_page(self, start, limit, query=None):
+        """Retorna [(posição, pergunta)] a partir de ``start``; ``query`` pré-filtra por texto."""
+        sql = 'SELECT position, data FROM questions WHERE position >= ?'
+        params = [start]
+        if query:
+            query = query.lower()
+            sql += (" AND (instr(py_lower(json_extract(data, '$.question')), ?) > 0"
+                    " OR instr(py_lower(json_extract(data, '$.options')), ?) > 0)")
+            params += [query, query]
+        rows = self._query(sql + ' ORDER BY position LIMIT ?', params + [limit])
+        return [(position, json.loads(data)) for position, data in rows]
+
+    def count_questions(self):
+        return self._query('SELECT COUNT(*) FROM questions')[0][0]
+
+    def load_questions_page(self, offset, limit):
+        rows = self._query('SELECT data FROM questions ORDER BY position LIMIT ? OFFSET ?', (limit, offset))
+        return [json.loads(data) for (data,) in rows]
+
+    # Ranking
+    def load_ranking(self):
+        rows = self._query('SELECT name, score FROM ranking')
+        return {name: score for name, score in rows}
+
+    def save_ranking(self, scores):
+        self._transaction([
+            ('DELETE FROM ranking', (), False),
+            ('INSERT INTO ranking (name, score) VALUES (?, ?)', list(scores.items()), True)
+        ])
+
+    def append_ranking_deltas(self, deltas, scores_provider=None):
+        """Aplica os pontos da pergunta em um único upsert em lote."""
+        if not deltas:
+            return
+        self._transaction([
+            ('INSERT INTO ranking (name, score) VALUES (?, ?) '
+             'ON CONFLICT(name) DO UPDATE SET score = score + excluded.score',
+             list(deltas.items()), True)
+        ])
+
+    def checkpoint(self, scores_provider=None):
+        with self._lock:
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        """Fecha a conexão; o objeto não pode mais ser usado depois disso."""
+        with self._lock:
+            self._conn.close()
+
+
+def create_storage(data_dir, backend=None, ranking_snapshot_every=50, db_path=None):
+    """Cria o backend configurado em ``QUIZ_STORAGE`` (padrão: json)."""
+    backend = (backend or os.environ.get('QUIZ_STORAGE', 'json')).lower()
+    if backend == 'sqlite':
+        db_path = db_path or os.environ.get('QUIZ_DB_PATH', os.path.join(data_dir, DEFAULT_DB_NAME))
+        logger.info(f"Usando armazenamento SQLite: {db_path}")
+        return SqliteStorage(db_path)
+    if backend != 'json':
+        logger.warning(f"Backend de armazenamento desconhecido '{backend}', usando JSON")
+    return JsonStorage(data_dir, ranking_snapshot_every=ranking_snapshot_every)
+
+
+def migrate_json_to_sqlite(data_dir, db_path):
+    """Importa config.json, questions.json e ranking.json (+ journal) para o SQLite."""
+    source = JsonStorage(data_dir)
+    target = SqliteStorage(db_path)
+    config = source.load_config()
+    questions = source.load_questions()
+    scores = source.load_ranking()
+    if config is not None:
+        target.save_config(config)
+    if questions is not None:
+        target.save_questions(questions)
+    if scores is not None:
+        target.save_ranking(scores)
+    target.checkpoint()
+    return {
+        'config': len(config or {}),
+        'questions': len(questions or []),
+        'ranking': len(scores or {})
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ferramentas de armazenamento do quiz')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help='Importa os arquivos data/*.json para o SQLite')
+    migrate.add_argument('--data-dir', default='data')
+    migrate.add_argument('--db', default=None, help='Caminho do banco (padrão: <data-dir>/quiz.db)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        db_path = args.db or os.path.join(args.data_dir, DEFAULT_DB_NAME)
+        counts = migrate_json_to_sqlite(args.data_dir, db_path)
+        print(f"Migração concluída para {db_path}: "
+              f"{counts['questions']} perguntas, {counts['ranking']} usuários no ranking, "
+              f"{counts['config']} configurações")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
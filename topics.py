@@ -0,0 +1,81 @@
+"""Tópicos de assinatura dos eventos Socket.IO.
+
+Cada evento emitido pelo servidor pertence a um tópico e é enviado apenas à
+sala desse tópico, então um overlay que não mostra o chat não recebe (nem
+custa a serialização de) cada lote de mensagens. Os clientes escolhem os
+tópicos ao conectar (``?topics=quiz,votes`` ou ``?role=overlay``) ou depois,
+com os eventos ``subscribe``/``unsubscribe``. Sem nenhuma escolha o cliente
+assina todos os tópicos, como antes.
+
+Tópicos:
+
+- ``status``: início/fim do quiz e avisos de controle (``status``,
+  ``quiz_status``, ``clear_chat``);
+- ``quiz``: fases da pergunta (``next_question``, ``show_counting_votes``,
+  ``show_results``);
+- ``votes``: contagem de votos (``update_votes``);
+- ``chat``: mensagens do chat (``chat_message``, ``chat_batch``);
+- ``ranking``: ranking atualizado (``update_ranking``).
+
+Eventos sem tópico continuam indo para todos os clientes.
+"""
+
+TOPICS = ('status', 'quiz', 'votes', 'chat', 'ranking')
+
+EVENT_TOPICS = {
+    'status': 'status',
+    'quiz_status': 'status',
+    'clear_chat': 'status',
+    'next_question': 'quiz',
+    'show_counting_votes': 'quiz',
+    'show_results': 'quiz',
+    'update_timer': 'quiz',
+    'update_votes': 'votes',
+    'chat_message': 'chat',
+    'chat_batch': 'chat',
+    'update_ranking': 'ranking',
+    'ranking_update': 'ranking'
+}
+
+# Conjuntos de tópicos por tipo de cliente
+ROLE_TOPICS = {
+    'overlay': ('status', 'quiz', 'votes', 'ranking'),
+    'chat': ('status', 'chat'),
+    'admin': ('status',),
+    'ranking': ('ranking',),
+    'full': TOPICS
+}
+
+
+def parse_topics(topics=None, role=None, fallback=TOPICS):
+    """Tópicos pedidos por lista/texto separado por vírgulas e/ou papel.
+
+    Nomes e papéis desconhecidos são ignorados. Se nada válido foi escolhido
+    (inclusive sem tópicos nem papel), retorna ``fallback``: todos os tópicos,
+    para que um papel digitado errado não deixe o cliente sem eventos.
+    """
+    if isinstance(topics, str):
+        topics = [topic for topic in topics.split(',') if topic.strip()]
+    selected = []
+    for topic in ROLE_TOPICS.get((role or '').strip().lower(), ()):
+        selected.append(topic)
+    for topic in topics or ():
+        topic = str(topic).strip().lower()
+        if topic in TOPICS and topic not in selected:
+            selected.append(topic)
+    if not selected:
+        return tuple(fallback)
+    return tuple(selected)
+
+
+def topic_room(topic, scope=None):
+    """Nome da sala de um tópico (``scope`` separa as salas de cada sessão)."""
+    return f'{scope}:{topic}' if scope else f'topic:{topic}'
+
+
+def event_room(event, scope=None):
+    """Sala de destino de um evento (``scope`` se o evento não tiver tópico)."""
+    topic = EVENT_TOPICS.get(event)
+    if topic is None:
+        return scope
+    return topic_room(topic, scope)
@@ -0,0 +1,95 @@
+"""Classificação de votos no chat.
+
+Todos os comandos aceitos (``!a``, ``!1``, apelidos configurados, emojis e,
+opcionalmente, a letra sozinha) são expandidos uma única vez em uma tabela
+``comando normalizado -> índice da opção``. Classificar uma mensagem é então
+um ``strip``/``casefold`` seguido de uma consulta ao dicionário, e um lote
+inteiro é classificado com ``map`` sem nenhuma expressão regular. O comando
+pode vir seguido de um comentário separado por espaço (``!a talvez``), como no
+parser antigo; já ``!abc`` não conta como voto, e a letra sozinha (com
+``accept_bare_letters``) só vale como a mensagem inteira, para que "a casa"
+não vire voto.
+"""
+import string
+
+# Emojis de letras e números aceitos por padrão
+DEFAULT_EMOJI = {
+    0: ('🅰', '🅰️', '1️⃣'),
+    1: ('🅱', '🅱️', '2️⃣'),
+    2: ('3️⃣',),
+    3: ('4️⃣',),
+}
+
+
+class VoteClassifier:
+    """Tabela de comandos de voto para um número configurável de opções."""
+
+    def __init__(self, option_count=4, aliases=None, accept_bare_letters=False,
+                 prefixes=('!',), emoji=DEFAULT_EMOJI):
+        if not 1 <= option_count <= 26:
+            raise ValueError("option_count deve estar entre 1 e 26")
+        self.option_count = option_count
+        self.letters = string.ascii_uppercase[:option_count]
+        table = {}
+        for index, letter in enumerate(self.letters):
+            for prefix in prefixes:
+                table[prefix + letter.casefold()] = index
+                table[prefix + str(index + 1)] = index
+            if accept_bare_letters:
+                table[letter.casefold()] = index
+        for index, symbols in (emoji or {}).items():
+            if index < option_count:
+                for symbol in symbols:
+                    table[symbol.casefold()] = index
+        # Comandos que valem seguidos de comentário: todos menos a letra sozinha
+        leading = dict(table)
+        if accept_bare_letters:
+            for letter in self.letters:
+                del leading[letter.casefold()]
+        # Apelidos configurados: comando -> letra ('A') ou índice (0)
+        for alias, option in (aliases or {}).items():
+            index = self._alias_index(option)
+            command = str(alias).strip().casefold()
+            if not command:
+                raise ValueError("apelido de voto vazio")
+            table[command] = index
+            if len(command.split()) == 1:
+                leading[command] = index
+        self._table = table
+        self._leading = leading
+        self._leading_starts = frozenset(command[0] for command in leading)
+        self._max_length = max(len(command) for command in table)
+
+    def _alias_index(self, option):
+        """Índice da opção de um apelido: uma letra ('A') ou o índice (0)."""
+        if isinstance(option, str):
+            option = option.strip().upper()
+            if len(option) != 1 or option not in self.letters:
+                raise ValueError(f"opção de apelido inválida: {option!r} (use uma letra de A a {self.letters[-1]})")
+            return self.letters.index(option)
+        if isinstance(option, int) and not isinstance(option, bool) and 0 <= option < self.option_count:
+            return option
+        raise ValueError(f"opção de apelido inválida: {option!r}")
+
+    def classify(self, text):
+        """Retorna o índice da opção votada ou None se a mensagem não é um voto."""
+        if not text:
+            return None
+        if len(text) <= self._max_length + 8:
+            index = self._table.get(text.strip().casefold())
+            if index is not None:
+                return index
+        if text[0].casefold() not in self._leading_starts:
+            return None
+        # Comando seguido de comentário ("!a talvez"): vale o primeiro termo
+        return self._leading.get(text[:self._max_length + 1].split(None, 1)[0].casefold())
+
+    def classify_batch(self, texts):
+        """Classifica uma sequência de mensagens; retorna a lista de índices (ou None)."""
+        return list(map(self.classify, texts))
+
+    def is_vote(self, text):
+        return self.classify(text) is not None
+
+    def letter(self, index):
+        return self.letters[index]
@@ -0,0 +1,125 @@
+"""Contagem de votos por pergunta.
+
+Cada pergunta tem o seu próprio ``VoteRound``, que concentra os contadores,
+o conjunto de usuários que já votaram e a resposta de cada usuário. Os votos
+são distribuídos em shards pelo hash do autor, de modo que várias threads
+produtoras raramente disputam o mesmo lock. Ao fechar a rodada, o estado é
+congelado em um ``VoteSnapshot`` imutável usado para a pontuação.
+"""
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+DEFAULT_SHARDS = 16
+
+# Resultados de ``VoteRound.register``
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'  # O autor já votou nesta pergunta
+CLOSED = 'closed'  # A rodada já foi fechada (fora do prazo)
+INVALID = 'invalid'  # Opção fora do intervalo
+
+# Resultado imutável de uma rodada fechada
+VoteSnapshot = namedtuple('VoteSnapshot', ['question_index', 'counts', 'user_votes'])
+
+
+class _Shard:
+    __slots__ = ('lock', 'counts', 'user_votes')
+
+    def __init__(self, option_count):
+        self.lock = threading.Lock()
+        self.counts = [0] * option_count
+        self.user_votes = {}  # autor -> índice da opção votada
+
+
+class VoteRound:
+    """Estado de votação de uma única pergunta."""
+
+    def __init__(self, question_index=None, option_count=4, shards=DEFAULT_SHARDS):
+        self.question_index = question_index
+        self.option_count = option_count
+        self._shards = [_Shard(option_count) for _ in range(shards)]
+        self._closed = False
+        self._snapshot = None
+        self._close_lock = threading.Lock()
+
+    @classmethod
+    def from_counts(cls, question_index, counts):
+        """Cria uma rodada fechada apenas com as contagens (réplica somente leitura)."""
+        vote_round = cls(question_index, option_count=len(counts), shards=1)
+        vote_round._closed = True
+        vote_round._snapshot = VoteSnapshot(question_index, tuple(counts), MappingProxyType({}))
+        return vote_round
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _shard_for(self, author):
+        return self._shards[hash(author) % len(self._shards)]
+
+    def register(self, author, option_index):
+        """Registra o voto de um autor.
+
+        Retorna ``ACCEPTED`` ou o motivo da recusa: ``INVALID`` (opção fora do
+        intervalo), ``CLOSED`` (rodada já fechada) ou ``DUPLICATE`` (o autor
+        já votou nesta pergunta).
+        """
+        if not 0 <= option_index < self.option_count:
+            return INVALID
+        shard = self._shard_for(author)
+        with shard.lock:
+            if self._closed:
+                return CLOSED
+            if author in shard.user_votes:
+                return DUPLICATE
+            shard.user_votes[author] = option_index
+            shard.counts[option_index] += 1
+        return ACCEPTED
+
+    def has_voted(self, author):
+        shard = self._shard_for(author)
+        with shard.lock:
+            return author in shard.user_votes
+
+    def counts(self):
+        """Retorna a contagem atual de votos por opção."""
+        if self._snapshot is not None:
+            return list(self._snapshot.counts)
+        totals = [0] * self.option_count
+        for shard in self._shards:
+            for i, count in enumerate(shard.counts):
+                totals[i] += count
+        return totals
+
+    def total(self):
+        return sum(self.counts())
+
+    def close(self):
+        """Fecha a rodada e retorna o snapshot imutável dos votos.
+
+        Todos os locks dos shards são adquiridos antes de marcar a rodada como
+        fechada, então nenhum voto fica pela metade. Chamadas repetidas
+        retornam o mesmo snapshot.
+        """
+        with self._close_lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            for shard in self._shards:
+                shard.lock.acquire()
+            try:
+                self._closed = True
+                counts = [0] * self.option_count
+                user_votes = {}
+                for shard in self._shards:
+                    for i, count in enumerate(shard.counts):
+                        counts[i] += count
+                    user_votes.update(shard.user_votes)
+            finally:
+                for shard in self._shards:
+                    shard.lock.release()
+            self._snapshot = VoteSnapshot(
+                self.question_index,
+                tuple(counts),
+                MappingProxyType(user_votes)
+            )
+            return self._snapshot
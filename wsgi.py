@@ -1,5 +1,4 @@
-from app import app, socketio, auto_start_quiz, quiz_config, logger
-import threading
+from app import app, socketio, start_server_role, quiz_config, logger
 
 # Configurar uma URL de exemplo para testes se não houver uma configurada
 if not quiz_config['youtube_url']:
@@ -7,7 +6,8 @@ if not quiz_config['youtube_url']:
     logger.info("URL de exemplo configurada para testes")
 
 # Iniciar o quiz automaticamente após 2 segundos
-threading.Timer(2.0, auto_start_quiz).start()
+# (com QUIZ_CLUSTER=1, apenas o processo eleito líder executa o quiz)
+start_server_role(2.0)
 
 if __name__ == "__main__":
     socketio.run(app)